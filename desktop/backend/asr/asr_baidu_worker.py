@@ -3,26 +3,50 @@
 """
 Baidu Cloud ASR Worker - WebSocket Streaming Mode
 实现百度实时语音识别，支持“字随声出”流式反馈。
+
+低首字延迟：
+- 预连接池常驻已握手的连接，会话开始与 FINISH 后的轮换直接取用
+- access_token 按 expires_in 缓存到磁盘，重启后无需重新鉴权
+- 建连期间到达的音频先缓冲，连上后按序补发
+
+本地 VAD 门控（BAIDU_VAD_GATING）：静音超过拖尾窗口后不再上传（连接空闲时发 HEARTBEAT 保活），
+语音起点前保留一小段预录音频；is_speaking 只在状态切换时发送。
+
+熔断兜底：建连失败、服务端报错或连接异常断开累计超限时熔断，期间把音频转发给本地
+FunASR 子进程（完整 2-Pass 流式识别），后台定期探测百度恢复后自动切回；新建连接受令牌桶限速。
+
+长文件转写（batch_file）：独占一条实时连接按 BAIDU_BATCH_SPEED 倍速推送，逐句返回 batch_segment。
 """
 
 import asyncio
 import base64
+import hashlib
 import json
 import os
 import platform
 import sys
+import tempfile
 import time
+import traceback
 import uuid
 import wave
 import io
 import threading
 from dataclasses import dataclass, field
+from collections import deque
 from typing import Dict, List, Optional
 
+# 线程预算（见 cpu_affinity）：亲和性必须在导入 numpy 之前设置
+from cpu_affinity import apply_cpu_affinity
+
+CPU_AFFINITY = apply_cpu_affinity("[Baidu Worker]")
+
 import numpy as np
 import requests
 import websockets
 
+from cloud_resilience import CircuitBreaker, LocalFallbackWorker, TokenBucket, percentile, round_ms
+
 # ==============================================================================
 # IPC 通道重定向
 # ==============================================================================
@@ -32,10 +56,13 @@ ipc_channel = os.fdopen(ipc_fd, "w", buffering=1, encoding="utf-8")
 os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
 sys.stdout = sys.stderr
 
+_ipc_lock = threading.Lock()  # 本地兜底子进程的输出在读线程中转发
+
 def send_ipc_message(data: dict):
     try:
-        ipc_channel.write(json.dumps(data, ensure_ascii=False) + "\n")
-        ipc_channel.flush()
+        with _ipc_lock:
+            ipc_channel.write(json.dumps(data, ensure_ascii=False) + "\n")
+            ipc_channel.flush()
     except Exception as exc:
         sys.stderr.write(f"[IPC Error] {exc}\n")
         sys.stderr.flush()
@@ -51,125 +78,271 @@ if not BAIDU_APP_ID or not BAIDU_API_KEY or not BAIDU_SECRET_KEY:
     sys.stderr.write("[Baidu Worker] WARNING: BAIDU_APP_ID, BAIDU_API_KEY or BAIDU_SECRET_KEY not set in environment variables.\n")
     sys.stderr.flush()
 
-BAIDU_WS_URL = "wss://vop.baidu.com/realtime_asr"
+# 可指向本地模拟服务（scripts/mock-cloud-asr.py）做离线压测
+BAIDU_WS_URL = os.environ.get("BAIDU_WS_URL", "wss://vop.baidu.com/realtime_asr").strip()
+BAIDU_TOKEN_URL = os.environ.get("BAIDU_TOKEN_URL", "https://aip.baidubce.com/oauth/2.0/token").strip()
 SAMPLE_RATE = int(os.environ.get("ASR_SAMPLE_RATE", "16000"))
 
 # 能量检测阈值 (RMS)，用于给 UI 反馈“正在说话”
 # 300/32768 约等于 0.009
 SPEECH_THRESHOLD = float(os.environ.get("ASR_RMS_THRESHOLD", "0.009"))
 
+# 熔断 + 限流 + 本地兜底（与 SiliconFlow Worker 的 SF_BREAKER_* 含义一致）
+BREAKER_WINDOW_SEC = float(os.environ.get("BAIDU_BREAKER_WINDOW_SEC", "60"))
+BREAKER_MIN_SAMPLES = int(os.environ.get("BAIDU_BREAKER_MIN_SAMPLES", "5"))
+BREAKER_ERROR_RATE = float(os.environ.get("BAIDU_BREAKER_ERROR_RATE", "0.5"))
+BREAKER_CONSECUTIVE_FAILURES = int(os.environ.get("BAIDU_BREAKER_CONSECUTIVE_FAILURES", "3"))
+BREAKER_PROBE_SEC = float(os.environ.get("BAIDU_BREAKER_PROBE_SEC", "10"))
+CONNECT_RATE_LIMIT = float(os.environ.get("BAIDU_CONNECT_RATE_LIMIT", "2"))  # 每秒新建 WS 连接数，0 = 不限
+CONNECT_RATE_BURST = float(os.environ.get("BAIDU_CONNECT_RATE_BURST", "5"))
+LOCAL_FALLBACK = os.environ.get("BAIDU_LOCAL_FALLBACK", "1") in ("1", "true", "yes")
+FALLBACK_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "asr_funasr_worker.py")
+
+# 预连接池 + token 磁盘缓存
+POOL_SIZE = int(os.environ.get("BAIDU_POOL_SIZE", "1"))  # 常驻空闲连接数，0 = 关闭预连接
+POOL_IDLE_SEC = float(os.environ.get("BAIDU_POOL_IDLE_SEC", "20"))  # 空闲连接的最长保留时间（服务端会断开久未 START 的连接）
+CONNECT_TIMEOUT = float(os.environ.get("BAIDU_CONNECT_TIMEOUT", "10"))
+SESSION_CONNECT_MAX_WAIT = 1.0  # 池空时会话建连最多等多久的限速令牌
+RECONNECT_BACKOFF_SEC = 2.0  # 建连失败后这段时间内的音频直接走本地兜底
+FINISH_TIMEOUT = 10.0  # FINISH 后等待剩余 FIN_TEXT 的最长时间
+# 本地 VAD 门控
+VAD_GATING = os.environ.get("BAIDU_VAD_GATING", "1") in ("1", "true", "yes")
+HANGOVER_MS = float(os.environ.get("BAIDU_HANGOVER_MS", "1000"))  # 语音结束后继续上传的静音时长（百度靠尾部静音断句）
+PREROLL_MS = float(os.environ.get("BAIDU_PREROLL_MS", "400"))  # 语音起点前补发的音频时长
+KEEPALIVE_SEC = float(os.environ.get("BAIDU_KEEPALIVE_SEC", "5"))  # 连接上没有音频时的心跳间隔
+TOKEN_CACHE_PATH = os.environ.get("BAIDU_TOKEN_CACHE") or os.path.join(
+    os.environ.get("ASR_CACHE_DIR") or tempfile.gettempdir(), "baidu_token.json"
+)
+# 长文件转写（batch_file）：独占一条实时连接，按倍速推送 PCM
+BATCH_SPEED = float(os.environ.get("BAIDU_BATCH_SPEED", "4"))  # 相对实时的推送倍速，0 = 不限速
+BATCH_FRAME_MS = 160  # 百度实时识别建议的单帧时长
+STDIN_LINE_LIMIT = 16 * 1024 * 1024  # asyncio 读取 stdin 时单行上限
+
 def decode_audio_chunk(audio_b64: str) -> np.ndarray:
     audio_bytes = base64.b64decode(audio_b64)
     audio_int16 = np.frombuffer(audio_bytes, dtype=np.int16)
     return audio_int16.astype(np.float32)
 
-def float_to_int16(audio_f32: np.ndarray) -> bytes:
-    if np.max(np.abs(audio_f32)) <= 1.0:
-        return (audio_f32 * 32767).astype(np.int16).tobytes()
-    return audio_f32.astype(np.int16).tobytes()
+def _ws_is_open(ws) -> bool:
+    """兼容 websockets 旧版（.closed）与 14+ 新版（.state）连接对象"""
+    closed = getattr(ws, "closed", None)
+    if isinstance(closed, bool):
+        return not closed
+    return getattr(getattr(ws, "state", None), "name", "") == "OPEN"
 
-class BaiduSession:
-    def __init__(self, session_id: str, worker: 'BaiduWorker'):
-        self.session_id = session_id
+
+def _start_frame(token: str) -> str:
+    return json.dumps({
+        "type": "START",
+        "data": {
+            "appid": int(BAIDU_APP_ID or 0),
+            "appkey": BAIDU_API_KEY,
+            "appname": "livegal",  # 加入应用名称，对应控制台，解决 -3004 错误
+            "dev_pid": 1537,  # 普通话
+            "cuid": "livegal_desktop_client",
+            "format": "pcm",
+            "sample": SAMPLE_RATE,
+            "token": token,
+        },
+    })
+
+
+class PooledConnection:
+    """已完成握手（token 在 URL 中）的 WS 连接；START 帧在被会话取用时才发送，避免空闲期触发服务端超时"""
+
+    def __init__(self, ws, token: str, connect_ms: float):
+        self.ws = ws
+        self.token = token
+        self.connect_ms = connect_ms
+        self.created_at = time.time()
+
+
+class RateLimited(Exception):
+    pass
+
+
+class ConnectionPool:
+    """
+    预连接池：常驻 POOL_SIZE 条空闲连接，会话开始 / FINISH 后轮换时直接取用，
+    省掉 token + 握手的往返；空闲超过 POOL_IDLE_SEC 的连接关闭重建
+    """
+
+    def __init__(self, worker: "BaiduWorker", size: int, idle_sec: float):
         self.worker = worker
-        self.ws: Optional[websockets.WebSocketClientProtocol] = None
-        self.audio_queue = asyncio.Queue()
-        self.is_running = False
-        self.task_send: Optional[asyncio.Task] = None
-        self.task_recv: Optional[asyncio.Task] = None
-        self.last_final_text = ""
-        self.segment_seq = 0
+        self.size = size
+        self.idle_sec = idle_sec
+        self._ready: deque = deque()
+        self._fill_task: Optional[asyncio.Task] = None
+        self._maintain_task: Optional[asyncio.Task] = None
+        self.hits = 0
+        self.misses = 0
+        self.connects = 0
+        self.expired = 0
+        self._connect_ms: deque = deque(maxlen=200)
 
-    async def start(self):
-        if self.is_running:
-            return
-        self.is_running = True
+    def start(self):
+        if self.size > 0 and self._maintain_task is None:
+            self._maintain_task = asyncio.ensure_future(self._maintain_loop())
+        self.refill()
+
+    async def connect(self, max_wait: float) -> PooledConnection:
+        """新建一条连接（受建连限速）；token 获取失败或握手失败抛异常"""
+        if not await self.worker.connect_limiter.acquire(max_wait):
+            raise RateLimited("connect rate limited")
+        t0 = time.time()
         token = await self.worker.get_token_async()
         if not token:
-            sys.stderr.write(f"[{self.session_id}] Failed to get Baidu token\n")
-            self.is_running = False
-            return
+            raise RuntimeError("failed to get Baidu token")
+        sn = str(uuid.uuid4()).replace("-", "")
+        # 在 URL 握手阶段就带上 token (某些百度集群的要求)
+        ws = await asyncio.wait_for(websockets.connect(f"{BAIDU_WS_URL}?sn={sn}&token={token}"), timeout=CONNECT_TIMEOUT)
+        connect_ms = (time.time() - t0) * 1000
+        self.connects += 1
+        self._connect_ms.append(connect_ms)
+        return PooledConnection(ws, token, connect_ms)
+
+    async def acquire(self) -> PooledConnection:
+        """取一条可用连接：优先池中现成的，池空时当场建连"""
+        while self._ready:
+            conn = self._ready.popleft()
+            if _ws_is_open(conn.ws) and time.time() - conn.created_at < self.idle_sec:
+                self.hits += 1
+                self.refill()
+                return conn
+            self.expired += 1
+            asyncio.ensure_future(self._close(conn))
+        self.misses += 1
+        self.refill()
+        return await self.connect(max_wait=SESSION_CONNECT_MAX_WAIT)
+
+    def refill(self):
+        if self.size > 0 and (self._fill_task is None or self._fill_task.done()):
+            self._fill_task = asyncio.ensure_future(self._fill())
 
+    async def _fill(self):
+        backoff = 1.0
+        while len(self._ready) < self.size and self.worker.breaker.allow():
+            try:
+                self._ready.append(await self.connect(max_wait=5.0))
+                backoff = 1.0
+            except Exception as exc:
+                # 预连接失败不计入熔断（没有会话受影响），退避后重试
+                sys.stderr.write(f"[Baidu Worker] Pool connect failed: {exc}\n")
+                sys.stderr.flush()
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 30.0)
+
+    async def _maintain_loop(self):
+        """定期淘汰空闲过久或已被服务端关闭的连接并补齐"""
+        while True:
+            await asyncio.sleep(max(1.0, self.idle_sec / 2))
+            now = time.time()
+            for conn in list(self._ready):
+                if not _ws_is_open(conn.ws) or now - conn.created_at >= self.idle_sec:
+                    self._ready.remove(conn)
+                    self.expired += 1
+                    asyncio.ensure_future(self._close(conn))
+            self.refill()
+
+    @staticmethod
+    async def _close(conn: PooledConnection):
         try:
-            # 强化 1：使用规范的、不带特殊字符的 sn 和 cuid
-            sn = str(uuid.uuid4()).replace("-", "")
-            cuid = "livegal_desktop_client"
-            # 强化 2：在 URL 握手阶段就带上 token (某些百度集群的要求)
-            url = f"{BAIDU_WS_URL}?sn={sn}&token={token}"
-            
-            sys.stderr.write(f"[{self.session_id}] Connecting to Baidu WS (AppID: {BAIDU_APP_ID})...\n")
-            self.ws = await websockets.connect(url)
-            
-            # 1. 发送 START 帧
-            start_frame = {
-                "type": "START",
-                "data": {
-                    "appid": int(BAIDU_APP_ID),
-                    "appkey": BAIDU_API_KEY,
-                    "appname": "livegal",  # 强化 3：加入应用名称，对应控制台，解决 -3004 错误
-                    "dev_pid": 1537, # 普通话
-                    "cuid": cuid,
-                    "format": "pcm",
-                    "sample": SAMPLE_RATE,
-                    "token": token
-                }
-            }
-            await self.ws.send(json.dumps(start_frame))
-            
-            self.task_send = asyncio.create_task(self._send_loop())
-            self.task_recv = asyncio.create_task(self._recv_loop())
-            sys.stderr.write(f"[{self.session_id}] Baidu WS Connected & Started\n")
-        except Exception as e:
-            sys.stderr.write(f"[{self.session_id}] WS Connection error: {e}\n")
-            self.is_running = False
+            await conn.ws.close()
+        except Exception:
+            pass
 
-    async def stop(self):
-        self.is_running = False
-        if self.ws:
+    async def close(self):
+        for task in (self._maintain_task, self._fill_task):
+            if task is not None:
+                task.cancel()
+        while self._ready:
+            await self._close(self._ready.popleft())
+
+    def snapshot(self) -> dict:
+        return {
+            "size": self.size,
+            "ready": len(self._ready),
+            "hits": self.hits,
+            "misses": self.misses,
+            "connects": self.connects,
+            "expired": self.expired,
+            "connect_ms_p50": round_ms(percentile(list(self._connect_ms), 0.5)),
+        }
+
+
+class BaiduStream:
+    """会话在一条连接上的一次识别（START ... FINISH）；FINISH 后独立收尾，不阻塞会话的下一条连接"""
+
+    def __init__(self, session: "BaiduSession", conn: PooledConnection):
+        self.session = session
+        self.conn = conn
+        self.ws = conn.ws
+        self.failed = False  # 本次连接因错误结束（熔断统计已记录）
+        self.finishing = False
+        self.task_recv: Optional[asyncio.Task] = None
+
+    @property
+    def usable(self) -> bool:
+        return not self.finishing and not self.failed and _ws_is_open(self.ws)
+
+    async def start(self):
+        await self.ws.send(_start_frame(self.conn.token))
+        self.task_recv = asyncio.create_task(self._recv_loop())
+
+    async def send(self, chunk: bytes):
+        await self.ws.send(chunk)
+
+    async def finish(self):
+        """发送 FINISH；百度返回剩余的 FIN_TEXT 后关闭连接，recv_loop 负责收尾"""
+        if self.finishing:
+            return
+        self.finishing = True
+        try:
+            await self.ws.send(json.dumps({"type": "FINISH"}))
+        except Exception:
+            pass
+        asyncio.ensure_future(self._close_after(FINISH_TIMEOUT))
+
+    async def _close_after(self, timeout: float):
+        if self.task_recv is not None:
             try:
-                # 发送 FINISH 帧
-                await self.ws.send(json.dumps({"type": "FINISH"}))
-                await asyncio.sleep(0.5)
-                await self.ws.close()
-            except: pass
-        if self.task_send: self.task_send.cancel()
-        if self.task_recv: self.task_recv.cancel()
-        self.ws = None
-
-    async def _send_loop(self):
+                await asyncio.wait_for(asyncio.shield(self.task_recv), timeout=timeout)
+            except (asyncio.TimeoutError, asyncio.CancelledError):
+                pass
         try:
-            while self.is_running:
-                chunk = await self.audio_queue.get()
-                if chunk is None: break
-                if self.ws:
-                    await self.ws.send(chunk)
-        except asyncio.CancelledError: pass
-        except Exception as e:
-            # 这里的 1005 或 1006 错误通常是由于 FINISH 导致的正常关闭
-            if "1005" not in str(e) and "1006" not in str(e):
-                sys.stderr.write(f"[{self.session_id}] WS Send error: {e}\n")
-        finally:
-            self.is_running = False
+            await self.ws.close()
+        except Exception:
+            pass
+
+    def _mark_failed(self):
+        if not self.failed:
+            self.failed = True
+            self.session.worker.record_cloud_result(False)
 
     async def _recv_loop(self):
+        session = self.session
         try:
             async for message in self.ws:
                 resp = json.loads(message)
                 err_no = resp.get("err_no", 0)
                 if err_no != 0:
-                    sys.stderr.write(f"[{self.session_id}] Baidu Error: {resp.get('err_msg')} (code={err_no})\n")
+                    sys.stderr.write(f"[{session.session_id}] Baidu Error: {resp.get('err_msg')} (code={err_no})\n")
+                    self._mark_failed()
                     continue
-                
+
                 msg_type = resp.get("type")
                 text = resp.get("result")
-                if isinstance(text, list): text = "".join(text)
-                
-                if not text: continue
+                if isinstance(text, list):
+                    text = "".join(text)
+
+                if not text:
+                    continue
 
                 if msg_type == "MID_TEXT":
+                    session.on_partial()
                     # 流式中间结果
                     send_ipc_message({
-                        "session_id": self.session_id,
+                        "session_id": session.session_id,
                         "type": "partial_result",
                         "partialText": text,
                         "timestamp": int(time.time() * 1000),
@@ -177,29 +350,211 @@ class BaiduSession:
                     })
                 elif msg_type == "FIN_TEXT":
                     # 一句话最终结果
-                    self.segment_seq += 1
+                    session.segment_seq += 1
+                    session.worker.record_cloud_result(True)
                     send_ipc_message({
-                        "session_id": self.session_id,
+                        "session_id": session.session_id,
                         "type": "sentence_complete",
                         "text": text,
                         "timestamp": int(time.time() * 1000),
                         "status": "success",
                         "engine": "baidu",
                         "is_segment_end": True,  # 百度 FIN_TEXT 代表一句话结束，强制分句
-                        "segment_seq": self.segment_seq
+                        "segment_seq": session.segment_seq
                     })
-                    self.last_final_text = text
-        except asyncio.CancelledError: pass
+                    session.last_final_text = text
+        except asyncio.CancelledError:
+            pass
         except Exception as e:
+            # 1005 / 1006 通常是 FINISH 之后的正常关闭
             if "1005" not in str(e) and "1006" not in str(e):
-                sys.stderr.write(f"[{self.session_id}] WS Recv error: {e}\n")
+                sys.stderr.write(f"[{session.session_id}] WS Recv error: {e}\n")
+                self._mark_failed()
         finally:
-            self.is_running = False
-            sys.stderr.write(f"[{self.session_id}] Baidu WS Session closed\n")
+            if not self.finishing and not self.failed:
+                # 服务端在 FINISH 之前主动断开：下一块音频换一条连接
+                sys.stderr.write(f"[{session.session_id}] Baidu WS closed by server\n")
+            sys.stderr.flush()
+
+
+_FINISH = object()  # 音频队列中的 FINISH 标记：结束当前连接，后续音频换新连接
+
+
+class BaiduSession:
+    """
+    一个会话的音频泵：音频先入队（建连期间的音频不丢），由 pump 取出发往当前连接；
+    force_commit 在队列中插入 FINISH 标记，之后的音频直接换用连接池里的新连接
+    """
+
+    def __init__(self, session_id: str, worker: 'BaiduWorker'):
+        self.session_id = session_id
+        self.worker = worker
+        self.audio_queue: asyncio.Queue = asyncio.Queue()  # (pcm bytes, 原始 base64) 或 _FINISH
+        self.stream: Optional[BaiduStream] = None
+        self.last_final_text = ""
+        self.segment_seq = 0
+        self.retry_at = 0.0  # 建连失败后，在此之前的音频直接走本地兜底
+        self._pump_task: Optional[asyncio.Task] = None
+        self._first_audio_at: Optional[float] = None  # 新连接的第一块音频入队时间（统计首个 partial 延迟）
+        # VAD 门控状态
+        self.speaking = False
+        self.silence_ms = 0.0
+        self._preroll: deque = deque()  # 静音期间最近的 (pcm, base64, ms)
+        self._preroll_ms = 0.0
+
+    @property
+    def is_running(self) -> bool:
+        return self.stream is not None and self.stream.usable
+
+    def add_audio(self, audio_bytes: bytes, audio_b64: str):
+        if self._pump_task is None:
+            self._pump_task = asyncio.create_task(self._pump())
+        self.audio_queue.put_nowait((audio_bytes, audio_b64))
+
+    def finish(self):
+        if self._pump_task is not None:
+            self.audio_queue.put_nowait(_FINISH)
+
+    def gate(self, audio_bytes: bytes, audio_b64: str, has_voice: bool, chunk_ms: float) -> Optional[bool]:
+        """
+        VAD 门控：决定本块是否上传，返回 is_speaking 的新状态（无变化时返回 None）
+
+        语音块 -> 先补发预录缓冲再上传；语音结束后 HANGOVER_MS 内的静音照常上传，
+        之后的静音只进预录缓冲（门控关闭时静音也上传，但 is_speaking 同样只在切换时发送）
+        """
+        stats = self.worker.gating_stats
+        stats["chunks"] += 1
+        edge = None
+        if has_voice:
+            self.silence_ms = 0.0
+            if not self.speaking:
+                self.speaking = True
+                edge = True
+                while self._preroll:
+                    pcm, b64, _ = self._preroll.popleft()
+                    self._send(pcm, b64)
+                self._preroll_ms = 0.0
+            self._send(audio_bytes, audio_b64)
+            return edge
 
-    def add_audio(self, audio_bytes: bytes):
-        if self.is_running:
-            self.audio_queue.put_nowait(audio_bytes)
+        if self.speaking:
+            self.silence_ms += chunk_ms
+            if self.silence_ms >= HANGOVER_MS:
+                self.speaking = False
+                edge = False
+            self._send(audio_bytes, audio_b64)
+            return edge
+
+        if not VAD_GATING:
+            self._send(audio_bytes, audio_b64)
+            return None
+        stats["gated"] += 1
+        self._preroll.append((audio_bytes, audio_b64, chunk_ms))
+        self._preroll_ms += chunk_ms
+        while self._preroll and self._preroll_ms - self._preroll[0][2] >= PREROLL_MS:
+            self._preroll_ms -= self._preroll.popleft()[2]
+        return None
+
+    def _send(self, audio_bytes: bytes, audio_b64: str):
+        stats = self.worker.gating_stats
+        stats["sent"] += 1
+        stats["bytes_sent"] += len(audio_bytes)
+        self.add_audio(audio_bytes, audio_b64)
+
+    def on_partial(self):
+        if self._first_audio_at is not None:
+            self.worker.record_first_partial((time.time() - self._first_audio_at) * 1000)
+            self._first_audio_at = None
+
+    async def _pump(self):
+        try:
+            while True:
+                try:
+                    item = await asyncio.wait_for(self.audio_queue.get(), timeout=KEEPALIVE_SEC)
+                except asyncio.TimeoutError:
+                    # 门控期间连接上没有音频：发心跳帧，避免服务端因空闲断开
+                    if self.stream is not None and self.stream.usable:
+                        try:
+                            await self.stream.ws.send(json.dumps({"type": "HEARTBEAT"}))
+                            self.worker.gating_stats["heartbeats"] += 1
+                        except Exception:
+                            pass
+                    continue
+                if item is _FINISH:
+                    if self.stream is not None:
+                        sys.stderr.write(f"[{self.session_id}] FINISH, rotating connection\n")
+                        sys.stderr.flush()
+                        await self.stream.finish()
+                        self.stream = None
+                    continue
+                if self.stream is not None and not self.stream.usable:
+                    await self.stream.finish()
+                    self.stream = None
+                if self.stream is None:
+                    self._first_audio_at = time.time()
+                    # 建连期间新到的音频留在队列里，连上后按序发出
+                    reason = await self._open_stream()
+                    if reason is not None:
+                        self._divert(item, reason)
+                        continue
+                try:
+                    await self.stream.send(item[0])
+                except Exception as e:
+                    if "1005" not in str(e) and "1006" not in str(e):
+                        sys.stderr.write(f"[{self.session_id}] WS Send error: {e}\n")
+                    self.stream._mark_failed()
+        except asyncio.CancelledError:
+            pass
+
+    async def _open_stream(self) -> Optional[str]:
+        """从连接池取连接并发送 START；成功返回 None，失败返回原因"""
+        t0 = time.time()
+        try:
+            conn = await self.worker.pool.acquire()
+            stream = BaiduStream(self, conn)
+            await stream.start()
+        except RateLimited:
+            return "rate_limited"
+        except Exception as e:
+            sys.stderr.write(f"[{self.session_id}] WS Connection error: {e}\n")
+            sys.stderr.flush()
+            self.worker.record_cloud_result(False)
+            return "connect_failed"
+        waited_ms = (time.time() - t0) * 1000
+        self.stream = stream
+        self.worker.record_connect_wait(waited_ms)
+        sys.stderr.write(
+            f"[{self.session_id}] Baidu WS Started (waited {waited_ms:.0f}ms, buffered {self.audio_queue.qsize()} chunks)\n"
+        )
+        sys.stderr.flush()
+        if self.session_id in self.worker.local_sessions:
+            self.worker._leave_local(self.session_id)  # 百度重新连上
+        return None
+
+    def _divert(self, head, reason: str):
+        """建连失败：当前块与已缓冲的音频按序转给本地兜底（没有兜底时丢弃），一段时间内新音频也直接走本地"""
+        self.retry_at = time.time() + RECONNECT_BACKOFF_SEC
+        diverted = self.worker._use_local(self.session_id, reason)
+        items = [head]
+        while not self.audio_queue.empty():
+            items.append(self.audio_queue.get_nowait())
+        if not diverted:
+            sys.stderr.write(f"[{self.session_id}] Dropping {len(items)} buffered chunks ({reason})\n")
+            sys.stderr.flush()
+            return
+        for item in items:
+            if item is _FINISH:
+                self.worker.fallback.send({"type": "force_commit", "session_id": self.session_id})
+            else:
+                self.worker.fallback.send({"type": "streaming_chunk", "session_id": self.session_id, "audio_data": item[1]})
+
+    async def stop(self):
+        if self._pump_task is not None:
+            self._pump_task.cancel()
+            self._pump_task = None
+        if self.stream is not None:
+            await self.stream.finish()
+            self.stream = None
 
 class BaiduWorker:
     def __init__(self):
@@ -207,15 +562,176 @@ class BaiduWorker:
         self._token = None
         self._token_expires = 0
         self._token_lock = asyncio.Lock()
+        self.breaker = CircuitBreaker(
+            "[Baidu Worker]",
+            BREAKER_WINDOW_SEC,
+            BREAKER_MIN_SAMPLES,
+            BREAKER_ERROR_RATE,
+            float("inf"),  # 流式连接没有单次请求延迟可比，只按错误熔断
+            BREAKER_CONSECUTIVE_FAILURES,
+            BREAKER_PROBE_SEC,
+        )
+        self.connect_limiter = TokenBucket(CONNECT_RATE_LIMIT, CONNECT_RATE_BURST)
+        self.fallback = (
+            LocalFallbackWorker(FALLBACK_SCRIPT, "full", "[Baidu Worker]", on_message=self._on_fallback_message)
+            if LOCAL_FALLBACK
+            else None
+        )
+        self.local_sessions: Dict[str, str] = {}  # session_id -> 转本地的原因
+        self._failovers: Dict[str, int] = {}
+        self._probe_task: Optional[asyncio.Task] = None
+        self.pool = ConnectionPool(self, POOL_SIZE, POOL_IDLE_SEC)
+        self._connect_wait_ms: deque = deque(maxlen=200)
+        self._first_partial_ms: deque = deque(maxlen=200)
+        self.gating_stats = {"chunks": 0, "sent": 0, "gated": 0, "bytes_sent": 0, "heartbeats": 0, "is_speaking_events": 0}
         
         sys.stderr.write(f"[Baidu Worker] WebSocket Mode Initialized (Lightweight RMS VAD)\n")
+        sys.stderr.write(
+            f"[Baidu Worker] - Circuit breaker: error_rate>={BREAKER_ERROR_RATE} over {BREAKER_WINDOW_SEC:.0f}s, "
+            f"local fallback={'on' if self.fallback else 'off'}, connect_rate_limit={CONNECT_RATE_LIMIT}/s\n"
+        )
+        sys.stderr.write(f"[Baidu Worker] - Connection pool: size={POOL_SIZE}, idle={POOL_IDLE_SEC:.0f}s\n")
+        sys.stderr.write(
+            f"[Baidu Worker] - VAD gating: {'on' if VAD_GATING else 'off'} "
+            f"(hangover={HANGOVER_MS:.0f}ms, preroll={PREROLL_MS:.0f}ms)\n"
+        )
+
+    def record_connect_wait(self, ms: float):
+        self._connect_wait_ms.append(ms)
+
+    def record_first_partial(self, ms: float):
+        self._first_partial_ms.append(ms)
+
+    def record_cloud_result(self, ok: bool):
+        """建连失败 / 服务端错误 / 异常断开记失败，收到 FIN_TEXT 记成功"""
+        if self.breaker.record(ok):
+            # 熔断打开：预先拉起本地兜底（模型加载需要时间），并启动后台探测
+            if self.fallback:
+                self.fallback.ensure_started()
+            if self._probe_task is None or self._probe_task.done():
+                self._probe_task = asyncio.ensure_future(self._probe_loop())
+
+    async def _probe_loop(self):
+        """熔断期间按退避间隔试建一次连接（START + FINISH），成功即恢复"""
+        while not self.breaker.allow():
+            await asyncio.sleep(self.breaker.seconds_until_probe())
+            ok = False
+            try:
+                conn = await self.pool.connect(max_wait=5.0)
+                try:
+                    await conn.ws.send(_start_frame(conn.token))
+                    await conn.ws.send(json.dumps({"type": "FINISH"}))
+                    ok = True
+                    # 服务端在 FINISH 后若返回错误码，视为探测失败
+                    while True:
+                        resp = json.loads(await asyncio.wait_for(conn.ws.recv(), timeout=5))
+                        if resp.get("err_no", 0) != 0:
+                            ok = False
+                            break
+                except (asyncio.TimeoutError, websockets.ConnectionClosed):
+                    pass
+                finally:
+                    await conn.ws.close()
+            except Exception as exc:
+                sys.stderr.write(f"[Baidu Worker] Probe failed: {exc}\n")
+            self.breaker.probe_result(ok)
+        # 已转本地的会话：让本地识别提交当前句子，之后的音频回到百度
+        for session_id in list(self.local_sessions):
+            self._leave_local(session_id)
+        self.pool.refill()
+
+    def _on_fallback_message(self, msg: dict):
+        if msg.get("session_id") is None:
+            return
+        msg["fallback"] = "funasr"
+        send_ipc_message(msg)
+
+    def _use_local(self, session_id: str, reason: str) -> bool:
+        """当前音频块是否改走本地兜底"""
+        if not self.fallback or not self.fallback.available:
+            return False
+        if session_id not in self.local_sessions:
+            sys.stderr.write(f"[{session_id}] Switching to local FunASR ({reason})\n")
+            self.local_sessions[session_id] = reason
+            self._failovers[reason] = self._failovers.get(reason, 0) + 1
+        return True
+
+    def _leave_local(self, session_id: str):
+        if self.local_sessions.pop(session_id, None) is not None and self.fallback:
+            sys.stderr.write(f"[{session_id}] Switching back to Baidu\n")
+            self.fallback.send({"type": "force_commit", "session_id": session_id})
+
+    def get_metrics(self) -> dict:
+        return {
+            "engine": "baidu",
+            "sessions": len(self.sessions),
+            "breaker": self.breaker.snapshot(),
+            "rate_limit": self.connect_limiter.snapshot(),
+            "pool": self.pool.snapshot(),
+            "connect_wait_ms": {
+                "p50": round_ms(percentile(list(self._connect_wait_ms), 0.5)),
+                "p99": round_ms(percentile(list(self._connect_wait_ms), 0.99)),
+            },
+            "gating": self._gating_snapshot(),
+            "first_partial_ms": {
+                "p50": round_ms(percentile(list(self._first_partial_ms), 0.5)),
+                "p99": round_ms(percentile(list(self._first_partial_ms), 0.99)),
+            },
+            "fallback": {
+                **(self.fallback.snapshot() if self.fallback else {"state": "disabled"}),
+                "local_sessions": dict(self.local_sessions),
+                "failovers": dict(self._failovers),
+            },
+        }
+
+    def _gating_snapshot(self) -> dict:
+        stats = self.gating_stats
+        return {
+            "enabled": VAD_GATING,
+            **stats,
+            "upload_kbytes": round(stats["bytes_sent"] / 1024.0, 1),
+            "sent_ratio": round(stats["sent"] / stats["chunks"], 3) if stats["chunks"] else None,
+        }
+
+    @staticmethod
+    def _token_key() -> str:
+        # 缓存文件按 API Key 区分，换 Key 后自动失效；文件中不保存明文 Key
+        return hashlib.sha256(f"{BAIDU_API_KEY}:{BAIDU_TOKEN_URL}".encode("utf-8")).hexdigest()[:16]
+
+    def _load_cached_token(self) -> bool:
+        try:
+            with open(TOKEN_CACHE_PATH, "r", encoding="utf-8") as f:
+                cached = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if cached.get("key") != self._token_key() or time.time() >= float(cached.get("expires_at", 0)):
+            return False
+        self._token = cached.get("access_token")
+        self._token_expires = float(cached["expires_at"])
+        sys.stderr.write(
+            f"[Baidu Worker] Using cached token (expires in {(self._token_expires - time.time()) / 86400:.1f} days)\n"
+        )
+        return bool(self._token)
+
+    def _save_cached_token(self):
+        try:
+            os.makedirs(os.path.dirname(TOKEN_CACHE_PATH) or ".", exist_ok=True)
+            tmp_path = f"{TOKEN_CACHE_PATH}.{os.getpid()}.tmp"
+            fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump({"key": self._token_key(), "access_token": self._token, "expires_at": self._token_expires}, f)
+            os.replace(tmp_path, TOKEN_CACHE_PATH)
+        except OSError as exc:
+            sys.stderr.write(f"[Baidu Worker] Failed to cache token: {exc}\n")
 
     async def get_token_async(self):
         async with self._token_lock:
             if self._token and time.time() < self._token_expires:
                 return self._token
+            if self._load_cached_token():
+                return self._token
             
-            url = "https://aip.baidubce.com/oauth/2.0/token"
+            url = BAIDU_TOKEN_URL
             params = {
                 "grant_type": "client_credentials",
                 "client_id": BAIDU_API_KEY,
@@ -228,17 +744,19 @@ class BaiduWorker:
                 data = resp.json()
                 if "access_token" in data:
                     self._token = data["access_token"]
+                    # 提前 1 小时过期，避免连接时刚好失效
                     self._token_expires = time.time() + data.get("expires_in", 2592000) - 3600
+                    self._save_cached_token()
                     return self._token
             except Exception as e:
                 sys.stderr.write(f"[Baidu Worker] Token error: {e}\n")
             return None
 
     def _is_speech(self, chunk_f32: np.ndarray) -> bool:
-        # 使用简单的 RMS 能量检测
+        # 使用简单的 RMS 能量检测（输入为 int16 量程，阈值按 -1~1 归一化）
         if chunk_f32.size == 0:
             return False
-        rms = float(np.sqrt(np.mean(chunk_f32 ** 2)))
+        rms = float(np.sqrt(np.mean(chunk_f32 ** 2))) / 32768.0
         return rms >= SPEECH_THRESHOLD
 
     async def handle_streaming_chunk(self, data: dict):
@@ -250,25 +768,40 @@ class BaiduWorker:
             self.sessions[session_id] = BaiduSession(session_id, self)
         
         session = self.sessions[session_id]
-        if not session.is_running:
-            await session.start()
+        if not self.breaker.allow():
+            entering_local = session_id not in self.local_sessions
+            if self._use_local(session_id, "circuit_open"):
+                if entering_local:
+                    session.finish()  # 切到本地时结束一次百度会话，让其提交已送出的音频
+                self.fallback.send(data)
+                return
+        if session_id in self.local_sessions and time.time() < session.retry_at:
+            self.fallback.send(data)
+            return
         
         chunk_f32 = decode_audio_chunk(audio_b64)
+        if chunk_f32.size == 0:
+            return
         has_voice = self._is_speech(chunk_f32)
         
-        audio_bytes = float_to_int16(chunk_f32)
-        session.add_audio(audio_bytes)
+        # 不等待建连：需要上传的音频先入队，连接就绪后按序发出
+        audio_bytes = chunk_f32.astype(np.int16).tobytes()
+        edge = session.gate(audio_bytes, audio_b64, has_voice, chunk_f32.size * 1000.0 / SAMPLE_RATE)
         
-        # 通知 UI 说话状态 (is_speaking)
-        if has_voice:
+        # 通知 UI 说话状态 (is_speaking)：只在开始 / 结束说话时发送
+        if edge is not None:
+            self.gating_stats["is_speaking_events"] += 1
             send_ipc_message({
                 "session_id": session_id,
                 "type": "is_speaking",
-                "isSpeaking": True
+                "isSpeaking": edge
             })
 
     async def handle_reset_session(self, data: dict):
         session_id = data.get("session_id")
+        if self.fallback and self.fallback.process is not None:
+            self.local_sessions.pop(session_id, None)
+            self.fallback.send(data)
         if session_id in self.sessions:
             await self.sessions[session_id].stop()
             del self.sessions[session_id]
@@ -276,28 +809,190 @@ class BaiduWorker:
     async def handle_force_commit(self, data: dict):
         # 对于 WebSocket 模式，force_commit 不应该简单的重启，
         # 因为这会导致正在处理的语音丢失。
-        # 我们发送 FINISH 帧让百度完成当前识别即可。
+        # 在音频队列中插入 FINISH：百度返回 FIN_TEXT 后旧连接自行关闭，之后的音频换用预连接
         session_id = data.get("session_id")
+        if session_id in self.local_sessions:
+            self.fallback.send(data)
+            return
         if session_id in self.sessions:
-            session = self.sessions[session_id]
-            if session.ws and session.is_running:
-                try:
-                    sys.stderr.write(f"[{session_id}] Force commit: sending FINISH frame\n")
-                    await session.ws.send(json.dumps({"type": "FINISH"}))
-                    # 百度收到 FINISH 后会返回 FIN_TEXT，recv_loop 会处理存库
-                except Exception as e:
-                    sys.stderr.write(f"[{session_id}] Force commit error: {e}\n")
+            sys.stderr.write(f"[{session_id}] Force commit: sending FINISH frame\n")
+            self.sessions[session_id].finish()
+
+    async def handle_batch_file(self, data: dict):
+        """长文件转写：在后台任务中推送，不阻塞实时音频的读取"""
+        request_id = data.get("request_id", "unknown")
+        audio_path = data.get("audio_path")
+        if not audio_path or not os.path.exists(audio_path):
+            send_ipc_message({"request_id": request_id, "status": "error", "error": f"File not found: {audio_path}"})
+            return
+        asyncio.ensure_future(self._run_batch_file(request_id, audio_path))
+
+    async def _run_batch_file(self, request_id: str, audio_path: str):
+        try:
+            if not self.breaker.allow() and self.fallback and self.fallback.available:
+                await self._batch_via_fallback(request_id, audio_path)
+                return
+            pcm = await asyncio.get_running_loop().run_in_executor(None, read_wav_pcm16, audio_path)
+            await self._transcribe_batch(request_id, pcm)
+        except Exception as exc:
+            send_ipc_message({
+                "request_id": request_id,
+                "status": "error",
+                "error": str(exc),
+                "traceback": traceback.format_exc(),
+                "engine": "baidu",
+            })
+
+    async def _batch_via_fallback(self, request_id: str, audio_path: str):
+        """熔断期间整段交给本地 FunASR 离线识别"""
+        self._failovers["batch_circuit_open"] = self._failovers.get("batch_circuit_open", 0) + 1
+        sys.stderr.write(f"[Baidu Worker] 📁 Batch {request_id}: circuit open, using local FunASR\n")
+        sys.stderr.flush()
+        msg = await asyncio.wrap_future(self.fallback.request({"type": "batch_file", "audio_path": audio_path}))
+        send_ipc_message({**msg, "request_id": request_id, "engine": "baidu", "fallback": "funasr"})
+
+    async def _transcribe_batch(self, request_id: str, pcm: np.ndarray):
+        """
+        独占一条新连接（不占用实时会话的预连接）：START 后按 BATCH_SPEED 倍速推送 160ms 帧，
+        不做 VAD 门控（静音交给百度断句）；每个 FIN_TEXT 推送一条 batch_segment，FINISH 后拼接返回
+        """
+        duration = pcm.size / float(SAMPLE_RATE)
+        t0 = time.time()
+        conn = await self.pool.connect(max_wait=5.0)
+        sys.stderr.write(
+            f"[Baidu Worker] 📁 Batch {request_id}: {duration:.1f}s audio, speed={BATCH_SPEED or 'unlimited'}x\n"
+        )
+        sys.stderr.flush()
+        texts: List[str] = []
+        errors: List[str] = []
+
+        async def recv_loop():
+            async for message in conn.ws:
+                resp = json.loads(message)
+                if resp.get("err_no", 0) != 0:
+                    errors.append(f"{resp.get('err_msg')} (code={resp.get('err_no')})")
+                    continue
+                text = resp.get("result")
+                if isinstance(text, list):
+                    text = "".join(text)
+                if resp.get("type") != "FIN_TEXT" or not text:
+                    continue
+                texts.append(text)
+                send_ipc_message({
+                    "request_id": request_id,
+                    "session_id": request_id,
+                    "type": "batch_segment",
+                    "index": len(texts) - 1,
+                    "start_ms": resp.get("start_time"),
+                    "end_ms": resp.get("end_time"),
+                    "status": "success",
+                    "text": text,
+                    "engine": "baidu",
+                })
+
+        recv_task = None
+        try:
+            await conn.ws.send(_start_frame(conn.token))
+            recv_task = asyncio.create_task(recv_loop())
+            frame = int(SAMPLE_RATE * BATCH_FRAME_MS / 1000)
+            for index, offset in enumerate(range(0, pcm.size, frame)):
+                if recv_task.done():
+                    break  # 服务端提前断开
+                await conn.ws.send(pcm[offset:offset + frame].tobytes())
+                if BATCH_SPEED > 0:
+                    # 按累计音频时长节流，而不是每帧固定 sleep，避免误差累积
+                    ahead = (index + 1) * BATCH_FRAME_MS / 1000.0 / BATCH_SPEED - (time.time() - t0)
+                    if ahead > 0:
+                        await asyncio.sleep(ahead)
+            await conn.ws.send(json.dumps({"type": "FINISH"}))
+            await asyncio.wait_for(recv_task, timeout=FINISH_TIMEOUT + duration / max(BATCH_SPEED, 1.0))
+        except asyncio.TimeoutError:
+            errors.append("timed out waiting for final results")
+        except websockets.ConnectionClosed as exc:
+            if "1005" not in str(exc) and "1006" not in str(exc):
+                errors.append(str(exc))
+        finally:
+            if recv_task is not None and not recv_task.done():
+                recv_task.cancel()
+            await ConnectionPool._close(conn)
+
+        self.record_cloud_result(not errors)
+        latency_ms = int((time.time() - t0) * 1000)
+        sys.stderr.write(
+            f"[Baidu Worker] 📁 Batch {request_id} done in {latency_ms}ms "
+            f"({len(texts)} sentences, {len(errors)} errors)\n"
+        )
+        sys.stderr.flush()
+        if errors and not texts:
+            send_ipc_message({"request_id": request_id, "status": "error", "error": errors[0], "engine": "baidu"})
+            return
+        send_ipc_message({
+            "request_id": request_id,
+            "session_id": request_id,
+            "type": "sentence_complete",
+            "text": "".join(texts),
+            "timestamp": int(time.time() * 1000),
+            "is_final": True,
+            "status": "success",
+            "language": "zh",
+            "trigger": "batch_file",
+            "latency_ms": latency_ms,
+            "engine": "baidu",
+            "sentences": len(texts),
+            "errors": errors,
+        })
+
+
+def read_wav_pcm16(path: str) -> np.ndarray:
+    """读取 16-bit WAV，取首声道，采样率不符时线性插值到 SAMPLE_RATE"""
+    with wave.open(path, "rb") as wf:
+        if wf.getsampwidth() != 2:
+            raise ValueError("Only 16-bit PCM supported")
+        channels = wf.getnchannels()
+        rate = wf.getframerate()
+        raw = wf.readframes(wf.getnframes())
+    audio = np.frombuffer(raw, dtype=np.int16)
+    if channels > 1:
+        audio = audio.reshape(-1, channels)[:, 0]
+    if rate != SAMPLE_RATE and audio.size:
+        target = int(audio.size * SAMPLE_RATE / rate)
+        audio = np.interp(
+            np.arange(target) * (rate / float(SAMPLE_RATE)), np.arange(audio.size), audio.astype(np.float32)
+        ).astype(np.int16)
+    return np.ascontiguousarray(audio)
+
+
+async def stdin_lines():
+    """
+    逐行读取 stdin：POSIX 下用 asyncio 管道读取（不为每行切线程）；
+    Windows（SelectorEventLoop 不支持管道）或 stdin 不是管道时，回退到执行器中的阻塞 readline
+    """
+    loop = asyncio.get_running_loop()
+    reader = None
+    if platform.system() != "Windows":
+        try:
+            reader = asyncio.StreamReader(limit=STDIN_LINE_LIMIT)
+            await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), sys.stdin)
+        except (OSError, ValueError, NotImplementedError) as exc:
+            sys.stderr.write(f"[Baidu Worker] Async stdin unavailable ({exc}), using thread reader\n")
+            reader = None
 
-async def read_stdin(queue):
-    loop = asyncio.get_event_loop()
     while True:
-        # sys.stdin.readline 是阻塞的，在执行器中运行以避免卡死主循环
-        line = await loop.run_in_executor(None, sys.stdin.readline)
+        if reader is not None:
+            try:
+                line = (await reader.readline()).decode("utf-8", errors="ignore")
+            except ValueError as exc:
+                # 超长行：StreamReader 已丢弃该行，继续读下一行
+                sys.stderr.write(f"[Baidu Worker] Dropped oversized stdin line: {exc}\n")
+                continue
+        else:
+            line = await loop.run_in_executor(None, sys.stdin.readline)
         if not line:
-            break
+            return
         stripped = line.strip()
         if stripped:
-            await queue.put(stripped)
+            yield stripped
+
 
 async def main():
     # Windows 下 connect_read_pipe 在 ProactorEventLoop 中不稳定 (WinError 6)
@@ -309,14 +1004,10 @@ async def main():
             pass
 
     worker = BaiduWorker()
+    worker.pool.start()
     send_ipc_message({"status": "ready"})
-    
-    queue = asyncio.Queue()
-    asyncio.create_task(read_stdin(queue))
-    
-    while True:
-        line = await queue.get()
-        if not line: break
+
+    async for line in stdin_lines():
         try:
             data = json.loads(line)
             rtype = data.get("type")
@@ -326,8 +1017,21 @@ async def main():
                 await worker.handle_reset_session(data)
             elif rtype == "force_commit":
                 await worker.handle_force_commit(data)
+            elif rtype == "batch_file" or "audio_path" in data:
+                await worker.handle_batch_file(data)
+            elif rtype == "get_metrics":
+                send_ipc_message({
+                    "request_id": data.get("request_id", "unknown"),
+                    "type": "metrics",
+                    "status": "success",
+                    "metrics": worker.get_metrics(),
+                })
         except Exception as e:
             sys.stderr.write(f"[Baidu Worker] Error processing line: {e}\n")
 
+    await worker.pool.close()
+    if worker.fallback:
+        worker.fallback.close()
+
 if __name__ == "__main__":
     asyncio.run(main())
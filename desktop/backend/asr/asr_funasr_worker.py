@@ -10,19 +10,62 @@ FunASR 2-Pass Worker: 基于 funasr_onnx 的流式/离线混合语音识别
 - VAD 检测语音边界
 - 静音累积达到阈值触发 Pass 2 修正
 - 支持强制提交 (force_commit)
+
+运行角色（FUNASR_WORKER_ROLE）：
+- full（默认）：完整 2-Pass 流式识别
+- pass2：只加载离线模型 + 标点，处理 transcribe_segment / batch_file，
+  作为云端 Worker（SiliconFlow）熔断时的本地兜底
+- pass1：只加载 VAD + 流式模型，输出 partial；句尾时不做离线修正，
+  而是把整句音频以 segment_audio 消息交给桥接层（hybrid 引擎转发给云端出终稿）
+
+负载自适应质量阶梯（FUNASR_QUALITY_LADDER，默认 all → long → off）：按各会话实时率之和与排队延迟，
+过载时 Pass 2 从每句都做降为只做长句（>= FUNASR_PASS2_MIN_SEC），再降为只用 Pass 1 文本成句；
+负载回落后逐级恢复，当前档位随识别结果与 get_metrics 返回
+
+启动预热（ASR_WARMUP，默认开启）：发送 ready 之前用合成音频 / 固定文本把本角色加载的模型各跑一遍
+（ORT 会话首次运行的内存分配、标点模型的分词词典加载等），ready 消息的 startup 字段带回
+导入 / 各模型加载 / 预热耗时（毫秒）
+
+zygote 模式（Linux，桥接层设置 FUNASR_ZYGOTE_FD 时启用）：本进程只做模板，导入依赖、加载并预热模型后
+在控制 socket 上等待 fork 请求；每个请求带一对 socket（stdin/IPC 与 stderr），fork 出的子进程接管这两个
+socket 后直接进入正常的请求循环，模型权重与父进程写时复制共享，省去解释器启动、导入与加载模型。
+子进程退出后由模板进程回收并通过控制 socket 报告退出码
+
+共享模型权重（FUNASR_SHARED_WEIGHTS，默认开启，仅 CPU）：首次加载某个 .onnx 时用 ORT 另存一份
+权重外置（external data）的模型，之后都加载这份并关闭权重预打包（session.disable_prepacking），
+ORT 直接 mmap 外置权重文件，权重页属于文件映射而不是进程私有内存，多个 Worker 进程共享同一份物理内存，
+新增 Worker 只增加各自的推理中间结果；代价是不做权重预打包，部分算子略慢
+
+会话迁移（export_session / import_session）：把一个会话的 SessionState（流式模型 cache、未成句的音频、
+流式文本等）序列化为 JSON 快照（格式见 encode_state_value），由桥接层导入到另一个同角色的 Worker，
+用于负载均衡和不丢上下文的滚动重启
 """
 
 import json
 import os
 import platform
+import select
+import shutil
+import socket
 import sys
+import tempfile
 import time
 import traceback
 import base64
-from dataclasses import dataclass, field
-from typing import Dict, List, Optional
+from dataclasses import dataclass, field, fields
+from typing import Dict, List, Optional, Tuple
+
+# 线程预算（见 cpu_affinity）：亲和性必须在导入 numpy 之前设置
+from cpu_affinity import CPU_THREADS, apply_cpu_affinity
+
+CPU_AFFINITY = apply_cpu_affinity("[FunASR Worker]")
 
+_import_started = time.perf_counter()
 import numpy as np
+IMPORT_MS = round((time.perf_counter() - _import_started) * 1000, 1)
+
+from load_controller import LoadController
+from synth_voice import synth_voiced_clip
 
 # ==============================================================================
 # OS 级别的文件描述符重定向
@@ -83,6 +126,7 @@ if OFFLINE_MODE:
 # FunASR 配置
 # ==============================================================================
 SAMPLE_RATE = int(os.environ.get("ASR_SAMPLE_RATE", "16000"))
+WORKER_ROLE = os.environ.get("FUNASR_WORKER_ROLE", "full").strip().lower()
 CHUNK_MS = int(os.environ.get("ASR_CHUNK_MS", "200"))  # 每次读取的音频块时长 (毫秒)
 CHUNK_SAMPLES = int(SAMPLE_RATE * CHUNK_MS / 1000)
 
@@ -94,6 +138,31 @@ SILENCE_BUFFER_KEEP = 2  # 保留多少个静音块让音频更自然
 SENTENCE_END_PUNCTUATION = set("。！？!?.；;")
 MIN_SENTENCE_CHARS = int(os.environ.get("MIN_SENTENCE_CHARS", "2"))
 
+# 负载自适应质量阶梯（Pass 2 覆盖范围：all 每句 / long 只做长句 / off 只用 Pass 1）
+QUALITY_LEVELS = ("all", "long", "off")
+QUALITY_LADDER = [
+    level for level in (x.strip().lower() for x in os.environ.get("FUNASR_QUALITY_LADDER", "all,long,off").split(","))
+    if level in QUALITY_LEVELS
+] or ["all"]
+PASS2_MIN_SEC = float(os.environ.get("FUNASR_PASS2_MIN_SEC", "3"))  # long 档位下做 Pass 2 的最短句长
+
+# 启动预热
+WARMUP = os.environ.get("ASR_WARMUP", "1").lower() not in {"0", "false", "no"}
+WARMUP_SECONDS = float(os.environ.get("ASR_WARMUP_SECONDS", "3"))
+WARMUP_PUNC_TEXT = "今天的会议先到这里我们明天再继续讨论 see you tomorrow"
+
+STARTUP: Dict = {"import_ms": IMPORT_MS}  # 启动各阶段耗时（毫秒），随 ready 消息返回
+STARTUP["threads"] = {"cpu_threads": CPU_THREADS or None, "affinity": CPU_AFFINITY}
+
+# 共享模型权重：外置权重副本放在原模型目录下的 SHARED_WEIGHTS_SUBDIR（可用 FUNASR_SHARED_WEIGHTS_DIR 统一指定）
+SHARED_WEIGHTS = os.environ.get("FUNASR_SHARED_WEIGHTS", "1").lower() not in {"0", "false", "no"}
+SHARED_WEIGHTS_DIR = os.environ.get("FUNASR_SHARED_WEIGHTS_DIR", "")
+SHARED_WEIGHTS_SUBDIR = ".shared-weights"
+SHARED_WEIGHTS_MIN_BYTES = 1024  # 小于该大小的张量仍内嵌在 .onnx 里
+
+# zygote 模式：桥接层传入的控制 socket（SOCK_SEQPACKET）文件描述符
+ZYGOTE_FD = int(os.environ["FUNASR_ZYGOTE_FD"]) if os.environ.get("FUNASR_ZYGOTE_FD") else None
+
 # 推理设备选择（影响本地 FunASR ONNX 模型：VAD/Online/Offline/Punc）
 # - auto: 自动选择（优先 CUDA，其次 ROCm，其次 DirectML，最后 CPU）
 # - cpu/cuda/rocm/dml: 强制指定
@@ -299,6 +368,9 @@ class SessionState:
     
     # 时间戳
     start_time: float = 0.0
+
+    # 已切出的句子数（pass1 角色的 segment_audio 序号，reset 不清零）
+    segment_seq: int = 0
     
     def reset(self):
         """重置会话状态"""
@@ -311,6 +383,84 @@ class SessionState:
         self.start_time = 0.0
 
 
+# ==============================================================================
+# 会话快照：SessionState <-> JSON
+# ==============================================================================
+SESSION_SNAPSHOT_FORMAT = "funasr-session"
+SESSION_SNAPSHOT_VERSION = 1
+
+
+def encode_state_value(value):
+    """
+    把会话状态编码为可 JSON 序列化的值。只接受 SessionState 与 funasr_onnx 流式 cache 实际用到的类型：
+    ndarray（dtype/shape + base64 原始字节）、numpy 标量（保留 dtype）、tuple（单独标记）、
+    list、键为普通字符串的 dict、None / bool / int / float / str。
+    其他类型抛 TypeError：快照里不能出现反序列化时会执行代码的格式，遇到新类型要在这里显式加编码
+    """
+    if isinstance(value, np.ndarray):
+        return {
+            "__ndarray__": base64.b64encode(np.ascontiguousarray(value).tobytes()).decode("ascii"),
+            "dtype": value.dtype.str,
+            "shape": list(value.shape),
+        }
+    if isinstance(value, np.generic):
+        return {"__scalar__": value.item(), "dtype": value.dtype.str}
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, list):
+        return [encode_state_value(item) for item in value]
+    if isinstance(value, tuple):
+        return {"__tuple__": [encode_state_value(item) for item in value]}
+    if isinstance(value, dict):
+        for key in value:
+            if not isinstance(key, str) or key.startswith("__"):
+                raise TypeError(f"cannot snapshot dict key {key!r}")
+        return {key: encode_state_value(item) for key, item in value.items()}
+    raise TypeError(f"cannot snapshot value of type {type(value).__module__}.{type(value).__qualname__}")
+
+
+def decode_state_value(value):
+    if isinstance(value, list):
+        return [decode_state_value(item) for item in value]
+    if not isinstance(value, dict):
+        return value
+    if "__ndarray__" in value:
+        raw = base64.b64decode(value["__ndarray__"])
+        return np.frombuffer(raw, dtype=np.dtype(value["dtype"])).reshape(value["shape"]).copy()
+    if "__scalar__" in value:
+        return np.dtype(value["dtype"]).type(value["__scalar__"])
+    if "__tuple__" in value:
+        return tuple(decode_state_value(item) for item in value["__tuple__"])
+    return {key: decode_state_value(item) for key, item in value.items()}
+
+
+def export_session_state(state: SessionState) -> Dict:
+    return {
+        "format": SESSION_SNAPSHOT_FORMAT,
+        "version": SESSION_SNAPSHOT_VERSION,
+        "role": WORKER_ROLE,
+        "exported_at": int(time.time() * 1000),
+        "state": {f.name: encode_state_value(getattr(state, f.name)) for f in fields(SessionState)},
+    }
+
+
+def import_session_state(snapshot: Dict) -> SessionState:
+    """从快照恢复 SessionState；格式 / 版本 / 角色不匹配时抛 ValueError，快照里多出的字段忽略"""
+    if not isinstance(snapshot, dict) or snapshot.get("format") != SESSION_SNAPSHOT_FORMAT:
+        raise ValueError("not a FunASR session snapshot")
+    if snapshot.get("version") != SESSION_SNAPSHOT_VERSION:
+        raise ValueError(f"unsupported snapshot version: {snapshot.get('version')}")
+    if snapshot.get("role") != WORKER_ROLE:
+        # 流式 cache 只对同一组模型有效
+        raise ValueError(f"snapshot from role '{snapshot.get('role')}' cannot be imported into role '{WORKER_ROLE}'")
+    known = {f.name for f in fields(SessionState)}
+    values = {name: decode_state_value(value) for name, value in (snapshot.get("state") or {}).items() if name in known}
+    return SessionState(**values)
+
+
+LOAD = LoadController(QUALITY_LADDER, log_prefix="[FunASR Worker]", knob="pass2")
+
+
 def resolve_local_model_path(model_id: str) -> Optional[str]:
     """
     在离线模式下，解析本地模型路径。
@@ -346,6 +496,102 @@ def resolve_local_model_path(model_id: str) -> Optional[str]:
     return None
 
 
+def ort_threads(default: int) -> int:
+    """
+    ORT 会话的 intra-op 线程数。zygote 模式下固定为 1：ORT 线程池的工作线程不会随 fork 复制到子进程，
+    子进程里的并行算子实际只在调用线程上执行，显式设为 1 让配置与实际一致；并发靠多开 Worker 进程。
+    桥接层分配了线程预算时各会话都用预算值（各模型在请求循环里依次调用，不会同时占用线程）
+    """
+    if ZYGOTE_FD is not None:
+        return 1
+    return CPU_THREADS if CPU_THREADS > 0 else default
+
+
+def shared_weights_path(model_file: str) -> str:
+    """
+    外置权重副本的路径：文件名带上原模型的大小和修改时间，模型更新后自动重新生成。
+    先在同目录的临时子目录里生成再 rename 到位，多个 Worker 同时首次启动也不会读到写了一半的文件
+    """
+    import onnxruntime as ort
+
+    source = os.path.abspath(model_file)
+    stat = os.stat(source)
+    target_dir = (
+        os.path.join(SHARED_WEIGHTS_DIR, os.path.basename(os.path.dirname(source)))
+        if SHARED_WEIGHTS_DIR
+        else os.path.join(os.path.dirname(source), SHARED_WEIGHTS_SUBDIR)
+    )
+    stem = os.path.splitext(os.path.basename(source))[0]
+    name = f"{stem}.{stat.st_size}-{int(stat.st_mtime)}.onnx"
+    target = os.path.join(target_dir, name)
+    if os.path.exists(target):
+        return target
+
+    started = time.perf_counter()
+    os.makedirs(target_dir, exist_ok=True)
+    work_dir = tempfile.mkdtemp(prefix=".convert-", dir=target_dir)
+    try:
+        opts = ort.SessionOptions()
+        # 只做与硬件无关的基础优化；加载时仍按 funasr_onnx 的配置做完整优化
+        opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_BASIC
+        opts.optimized_model_filepath = os.path.join(work_dir, name)
+        opts.add_session_config_entry("session.optimized_model_external_initializers_file_name", name + ".data")
+        opts.add_session_config_entry(
+            "session.optimized_model_external_initializers_min_size_in_bytes", str(SHARED_WEIGHTS_MIN_BYTES)
+        )
+        ort.InferenceSession(source, sess_options=opts, providers=["CPUExecutionProvider"])
+        # 先放权重文件，.onnx 最后 rename，存在即表示完整
+        os.replace(os.path.join(work_dir, name + ".data"), target + ".data")
+        os.replace(os.path.join(work_dir, name), target)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    sys.stderr.write(
+        f"[FunASR Worker] Converted {source} to shared external weights in {elapsed_ms(started)}ms: {target}\n"
+    )
+    sys.stderr.flush()
+    return target
+
+
+def install_shared_weights(device: str):
+    """
+    替换 funasr_onnx 创建 ORT 会话用的 InferenceSession：CPU 上改为加载外置权重副本并关闭预打包，
+    失败时回退到原模型文件。只影响本进程随后加载的模型
+    """
+    info = STARTUP.setdefault("shared_weights", {"enabled": False, "models": []})
+    if not SHARED_WEIGHTS or device != "cpu":
+        return
+    try:
+        import funasr_onnx.utils.utils as funasr_utils
+    except ImportError:
+        return
+    original = getattr(funasr_utils, "InferenceSession", None)
+    if original is None or getattr(original, "_shared_weights", False):
+        return
+
+    def create_session(path_or_bytes, sess_options=None, providers=None, provider_options=None, **kwargs):
+        if isinstance(path_or_bytes, (str, os.PathLike)):
+            try:
+                shared_path = shared_weights_path(os.fspath(path_or_bytes))
+                if sess_options is None:
+                    import onnxruntime as ort
+
+                    sess_options = ort.SessionOptions()
+                sess_options.add_session_config_entry("session.disable_prepacking", "1")
+                session = original(
+                    shared_path, sess_options=sess_options, providers=providers, provider_options=provider_options, **kwargs
+                )
+                info["models"].append(os.path.basename(shared_path))
+                return session
+            except Exception as exc:
+                sys.stderr.write(f"[FunASR Worker] Shared weights unavailable for {path_or_bytes}, loading normally: {exc}\n")
+                sys.stderr.flush()
+        return original(path_or_bytes, sess_options=sess_options, providers=providers, provider_options=provider_options, **kwargs)
+
+    create_session._shared_weights = True
+    funasr_utils.InferenceSession = create_session
+    info["enabled"] = True
+
+
 def load_funasr_onnx_models(gpu_config: Optional[GPUConfig] = None):
     """
     加载 funasr_onnx 模型 (VAD + 流式ASR + 离线ASR + 标点)
@@ -357,6 +603,7 @@ def load_funasr_onnx_models(gpu_config: Optional[GPUConfig] = None):
     - ASR_QUANTIZE: 是否使用量化 (true/false)，默认根据模型类型自动选择
     - MODELSCOPE_OFFLINE: 离线模式，跳过网络请求直接使用本地缓存
     """
+    import_started = time.perf_counter()
     try:
         from funasr_onnx.vad_bin import Fsmn_vad
         from funasr_onnx.paraformer_online_bin import Paraformer as ParaformerOnline
@@ -367,6 +614,8 @@ def load_funasr_onnx_models(gpu_config: Optional[GPUConfig] = None):
         sys.stderr.write("[FunASR Worker] Please install: pip install funasr_onnx\n")
         sys.stderr.flush()
         raise
+    STARTUP["import_ms"] = round(IMPORT_MS + elapsed_ms(import_started), 1)
+    load_timings = STARTUP.setdefault("model_load", {})
 
     # 读取模型配置
     model_id = os.environ.get("ASR_MODEL", "funasr-paraformer")
@@ -384,6 +633,7 @@ def load_funasr_onnx_models(gpu_config: Optional[GPUConfig] = None):
             }
         except Exception:
             device_info = detect_onnx_device()
+    install_shared_weights(device_info.get("device", "cpu"))
     
     # Large 版本默认不使用量化，精度更高
     quantize_env = os.environ.get("ASR_QUANTIZE", "").lower()
@@ -496,68 +746,88 @@ def load_funasr_onnx_models(gpu_config: Optional[GPUConfig] = None):
             )
         return found
 
-    # 离线模式：只校验缓存是否存在（不把本地路径传给 funasr_onnx）
-    vad_cached = _ensure_cached(vad_model_id, "VAD")
-    online_cached = _ensure_cached(online_model_id, "Streaming ASR (Pass 1)")
-    offline_cached = _ensure_cached(offline_model_id, "Offline ASR (Pass 2)")
-    punc_cached = _ensure_cached(punc_model_id, "Punctuation")
+    # pass2 角色不做流式识别，跳过 VAD 与 Pass 1 模型；pass1 角色不做离线修正，跳过 Pass 2 与标点模型
+    streaming_enabled = WORKER_ROLE != "pass2"
+    offline_enabled = WORKER_ROLE != "pass1"
+    sys.stderr.write(f"[FunASR Worker] Worker role: {WORKER_ROLE}\n")
 
-    # 1. VAD 模型: 检测语音活动
-    sys.stderr.write(
-        f"[FunASR Worker] Loading VAD model: {vad_model_id}"
-        + (f" (cached at {vad_cached})" if vad_cached else "")
-        + "...\n"
-    )
-    sys.stderr.flush()
-    vad_model = Fsmn_vad(
-        model_dir=vad_model_id,
-        quantize=use_quantize,
-        device_id=int(device_info.get("device_id", -1)),
-    )
-
-    # 2. Pass 1 流式模型: 快速出字
-    sys.stderr.write(
-        f"[FunASR Worker] Loading streaming ASR model (Pass 1): {online_model_id}"
-        + (f" (cached at {online_cached})" if online_cached else "")
-        + "...\n"
-    )
-    sys.stderr.flush()
-    asr_online_model = ParaformerOnline(
-        model_dir=online_model_id,
-        batch_size=1,
-        device_id=int(device_info.get("device_id", -1)),
-        quantize=use_quantize,
-        intra_op_num_threads=4
-    )
+    # 离线模式：只校验缓存是否存在（不把本地路径传给 funasr_onnx）
+    vad_cached = _ensure_cached(vad_model_id, "VAD") if streaming_enabled else None
+    online_cached = _ensure_cached(online_model_id, "Streaming ASR (Pass 1)") if streaming_enabled else None
+    offline_cached = _ensure_cached(offline_model_id, "Offline ASR (Pass 2)") if offline_enabled else None
+    punc_cached = _ensure_cached(punc_model_id, "Punctuation") if offline_enabled else None
+
+    vad_model = None
+    asr_online_model = None
+    if streaming_enabled:
+        # 1. VAD 模型: 检测语音活动
+        sys.stderr.write(
+            f"[FunASR Worker] Loading VAD model: {vad_model_id}"
+            + (f" (cached at {vad_cached})" if vad_cached else "")
+            + "...\n"
+        )
+        sys.stderr.flush()
+        started = time.perf_counter()
+        vad_model = Fsmn_vad(
+            model_dir=vad_model_id,
+            quantize=use_quantize,
+            device_id=int(device_info.get("device_id", -1)),
+            intra_op_num_threads=ort_threads(4),
+        )
+        load_timings["vad_ms"] = elapsed_ms(started)
 
-    # 3. Pass 2 非流式模型: 高精度识别
-    sys.stderr.write(
-        f"[FunASR Worker] Loading offline ASR model (Pass 2): {offline_model_id}"
-        + (f" (cached at {offline_cached})" if offline_cached else "")
-        + "...\n"
-    )
-    sys.stderr.flush()
-    asr_offline_model = ParaformerOffline(
-        model_dir=offline_model_id,
-        batch_size=1,
-        device_id=int(device_info.get("device_id", -1)),
-        quantize=use_quantize,
-        intra_op_num_threads=4
-    )
+        # 2. Pass 1 流式模型: 快速出字
+        sys.stderr.write(
+            f"[FunASR Worker] Loading streaming ASR model (Pass 1): {online_model_id}"
+            + (f" (cached at {online_cached})" if online_cached else "")
+            + "...\n"
+        )
+        sys.stderr.flush()
+        started = time.perf_counter()
+        asr_online_model = ParaformerOnline(
+            model_dir=online_model_id,
+            batch_size=1,
+            device_id=int(device_info.get("device_id", -1)),
+            quantize=use_quantize,
+            intra_op_num_threads=ort_threads(4)
+        )
+        load_timings["online_ms"] = elapsed_ms(started)
+
+    asr_offline_model = None
+    punc_model = None
+    if offline_enabled:
+        # 3. Pass 2 非流式模型: 高精度识别
+        sys.stderr.write(
+            f"[FunASR Worker] Loading offline ASR model (Pass 2): {offline_model_id}"
+            + (f" (cached at {offline_cached})" if offline_cached else "")
+            + "...\n"
+        )
+        sys.stderr.flush()
+        started = time.perf_counter()
+        asr_offline_model = ParaformerOffline(
+            model_dir=offline_model_id,
+            batch_size=1,
+            device_id=int(device_info.get("device_id", -1)),
+            quantize=use_quantize,
+            intra_op_num_threads=ort_threads(4)
+        )
+        load_timings["offline_ms"] = elapsed_ms(started)
 
-    # 4. 标点模型: 给 Pass 2 结果加标点
-    sys.stderr.write(
-        f"[FunASR Worker] Loading punctuation model: {punc_model_id}"
-        + (f" (cached at {punc_cached})" if punc_cached else "")
-        + "...\n"
-    )
-    sys.stderr.flush()
-    punc_model = CT_Transformer(
-        model_dir=punc_model_id,
-        quantize=use_quantize,
-        device_id=int(device_info.get("device_id", -1)),
-        intra_op_num_threads=2
-    )
+        # 4. 标点模型: 给 Pass 2 结果加标点
+        sys.stderr.write(
+            f"[FunASR Worker] Loading punctuation model: {punc_model_id}"
+            + (f" (cached at {punc_cached})" if punc_cached else "")
+            + "...\n"
+        )
+        sys.stderr.flush()
+        started = time.perf_counter()
+        punc_model = CT_Transformer(
+            model_dir=punc_model_id,
+            quantize=use_quantize,
+            device_id=int(device_info.get("device_id", -1)),
+            intra_op_num_threads=ort_threads(2)
+        )
+        load_timings["punc_ms"] = elapsed_ms(started)
 
     sys.stderr.write("[FunASR Worker] All models loaded successfully!\n")
     sys.stderr.write(f"[FunASR Worker] Configuration: model={model_id}, quantize={use_quantize}\n")
@@ -566,6 +836,51 @@ def load_funasr_onnx_models(gpu_config: Optional[GPUConfig] = None):
     return vad_model, asr_online_model, asr_offline_model, punc_model
 
 
+def elapsed_ms(started: float) -> float:
+    return round((time.perf_counter() - started) * 1000, 1)
+
+
+def build_warmup_clip(seconds: float) -> np.ndarray:
+    """预热片段：带基频起伏和停顿的合成浊音；与 decode_audio_chunk 一致，是 int16 量级的 float32（不归一化）"""
+    return np.clip(synth_voiced_clip(seconds, SAMPLE_RATE) * 32767, -32768, 32767).astype(np.float32)
+
+
+def warm_up(vad_model, asr_online_model, asr_offline_model, punc_model) -> Dict[str, float]:
+    """
+    ready 之前把已加载的模型按实际调用方式各跑一遍，返回各模型耗时（毫秒）。
+    流式模型用一次性 cache，不影响任何会话；预热失败只记日志，不影响启动
+    """
+    if not WARMUP:
+        return {}
+    clip = build_warmup_clip(WARMUP_SECONDS)
+    chunks = [clip[i:i + CHUNK_SAMPLES] for i in range(0, len(clip), CHUNK_SAMPLES)]
+
+    def run_online():
+        cache: Dict = {}
+        for chunk in chunks:
+            asr_online_model(chunk, param_dict={"cache": cache, "is_final": False})
+
+    steps = [
+        ("vad_ms", vad_model, lambda: [vad_model(chunk) for chunk in chunks]),
+        ("online_ms", asr_online_model, run_online),
+        ("offline_ms", asr_offline_model, lambda: asr_offline_model(clip)),
+        ("punc_ms", punc_model, lambda: punc_model(WARMUP_PUNC_TEXT)),
+    ]
+    timings: Dict[str, float] = {}
+    for name, model, run in steps:
+        if model is None:
+            continue
+        started = time.perf_counter()
+        try:
+            run()
+        except Exception as exc:
+            sys.stderr.write(f"[FunASR Worker] Warm-up {name[:-3]} failed: {exc}\n")
+            sys.stderr.flush()
+            continue
+        timings[name] = elapsed_ms(started)
+    return timings
+
+
 def handle_streaming_chunk(
     vad_model,
     asr_online_model,
@@ -595,6 +910,8 @@ def handle_streaming_chunk(
 
     if audio_chunk.size == 0:
         return
+    LOAD.record_lag(data)
+    LOAD.record(session_id, audio_sec=audio_chunk.size / SAMPLE_RATE)
 
     # 记录开始时间
     if not state.is_speaking and state.start_time == 0:
@@ -683,6 +1000,7 @@ def handle_streaming_chunk(
                             "is_final": False,
                             "status": "success",
                             "language": "zh",
+                            "quality_step": LOAD.step,
                         })
                         state.last_sent_text = text
                         sys.stderr.write(f"[FunASR Worker] 📝 PARTIAL: \"{state.streaming_text[-50:]}...\"\n")
@@ -733,6 +1051,16 @@ def _trigger_pass2(
     if not state.full_sentence_buffer:
         return
 
+    if asr_offline_model is None:
+        _emit_segment_audio(state, request_id, session_id, timestamp_ms, trigger)
+        return
+
+    # 质量阶梯：过载时短句（或全部句子）直接用 Pass 1 文本成句，省掉离线识别 + 标点
+    buffered_sec = sum(len(chunk) for chunk in state.full_sentence_buffer) / SAMPLE_RATE
+    if LOAD.level == "off" or (LOAD.level == "long" and buffered_sec < PASS2_MIN_SEC):
+        _commit_pass1_text(state, request_id, session_id, timestamp_ms, trigger, buffered_sec)
+        return
+
     sys.stderr.write(f"[FunASR Worker] Triggering Pass 2 ({trigger})...\n")
     sys.stderr.flush()
 
@@ -814,6 +1142,7 @@ def _trigger_pass2(
                     "end_time": int(sentence_end_time),
                     "sentence_index": i,
                     "total_sentences": len(sentences),
+                    "quality_step": LOAD.step,
                 })
                 
                 current_time = sentence_end_time
@@ -827,6 +1156,70 @@ def _trigger_pass2(
     state.reset()
 
 
+def _commit_pass1_text(
+    state: SessionState,
+    request_id: str,
+    session_id: str,
+    timestamp_ms: int,
+    trigger: str,
+    audio_duration: float,
+):
+    """跳过 Pass 2：以累积的 Pass 1 流式文本作为终稿（无标点修正）"""
+    text = state.streaming_text.strip()
+    if len(text) >= MIN_SENTENCE_CHARS:
+        start_ms = state.start_time * 1000 if state.start_time else timestamp_ms - audio_duration * 1000
+        sys.stderr.write(f"[FunASR Worker] 🎯 SENTENCE (pass1 only, {LOAD.level}): \"{text[:50]}...\"\n")
+        sys.stderr.flush()
+        send_ipc_message({
+            "request_id": request_id,
+            "session_id": session_id,
+            "type": "sentence_complete",
+            "text": text,
+            "timestamp": int(start_ms + audio_duration * 1000),
+            "is_final": True,
+            "status": "success",
+            "language": "zh",
+            "audio_duration": audio_duration,
+            "trigger": trigger,
+            "start_time": int(start_ms),
+            "end_time": int(start_ms + audio_duration * 1000),
+            "sentence_index": 0,
+            "total_sentences": 1,
+            "pass2_skipped": True,
+            "quality_step": LOAD.step,
+        })
+    state.reset()
+
+
+def _emit_segment_audio(
+    state: SessionState,
+    request_id: str,
+    session_id: str,
+    timestamp_ms: int,
+    trigger: str,
+):
+    """pass1 角色的句尾：把整句音频交给桥接层做终稿识别，附带 Pass 1 文本供对照"""
+    complete_audio = np.concatenate(state.full_sentence_buffer)
+    state.segment_seq += 1
+    sys.stderr.write(
+        f"[FunASR Worker] ✂️ SEGMENT #{state.segment_seq} ({len(complete_audio) / SAMPLE_RATE:.1f}s, trigger={trigger})\n"
+    )
+    sys.stderr.flush()
+    send_ipc_message({
+        "request_id": request_id,
+        "session_id": session_id,
+        "type": "segment_audio",
+        "audio_data": base64.b64encode(complete_audio.astype(np.int16).tobytes()).decode("ascii"),
+        "sample_rate": SAMPLE_RATE,
+        "partial_text": state.streaming_text,
+        "segment_seq": state.segment_seq,
+        "trigger": trigger,
+        "timestamp": timestamp_ms,
+        "start_time": int(state.start_time * 1000) if state.start_time else None,
+    })
+    state.reset()
+
+
 def handle_force_commit(
     asr_offline_model,
     punc_model,
@@ -871,6 +1264,7 @@ def handle_force_commit(
             "trigger": "force_commit_text_only",
             "language": "zh",
             "audio_duration": 0,
+            "quality_step": LOAD.step,
         })
         state.reset()
     else:
@@ -878,6 +1272,43 @@ def handle_force_commit(
         sys.stderr.flush()
 
 
+def recognize_offline(asr_offline_model, punc_model, audio_float: np.ndarray):
+    """离线识别 + 标点，返回 (raw_text, final_text)"""
+    offline_res = asr_offline_model(audio_float)
+    raw_text = ""
+    if offline_res:
+        # 解析返回值（可能是 tuple 或 dict）
+        item = offline_res[0] if isinstance(offline_res, list) else offline_res
+        if isinstance(item, dict):
+            raw_text = item.get("preds") or item.get("text") or ""
+        elif isinstance(item, (tuple, list)) and len(item) > 0:
+            raw_text = item[0] if isinstance(item[0], str) else str(item[0])
+        elif isinstance(item, str):
+            raw_text = item
+        else:
+            raw_text = str(item) if item else ""
+
+    # 标点
+    if not raw_text:
+        return raw_text, ""
+    try:
+        punc_res = punc_model(raw_text)
+        # 解析标点模型返回值
+        if punc_res:
+            punc_item = punc_res[0] if isinstance(punc_res, list) else punc_res
+            if isinstance(punc_item, str):
+                final_text = punc_item
+            elif isinstance(punc_item, (tuple, list)) and len(punc_item) > 0:
+                final_text = punc_item[0] if isinstance(punc_item[0], str) else str(punc_item[0])
+            else:
+                final_text = str(punc_item) if punc_item else raw_text
+        else:
+            final_text = raw_text
+    except Exception:
+        final_text = raw_text
+    return raw_text, final_text
+
+
 def handle_batch_file(asr_offline_model, punc_model, data: dict):
     """处理批量文件识别"""
     request_id = data.get("request_id", "unknown")
@@ -897,40 +1328,8 @@ def handle_batch_file(asr_offline_model, punc_model, data: dict):
             audio_data = np.frombuffer(wf.readframes(wf.getnframes()), dtype=np.int16)
             audio_float = audio_data.astype(np.float32)
 
-        # 离线识别
-        offline_res = asr_offline_model(audio_float)
-        raw_text = ""
-        if offline_res:
-            # 解析返回值（可能是 tuple 或 dict）
-            item = offline_res[0] if isinstance(offline_res, list) else offline_res
-            if isinstance(item, dict):
-                raw_text = item.get("preds") or item.get("text") or ""
-            elif isinstance(item, (tuple, list)) and len(item) > 0:
-                raw_text = item[0] if isinstance(item[0], str) else str(item[0])
-            elif isinstance(item, str):
-                raw_text = item
-            else:
-                raw_text = str(item) if item else ""
-
-        # 标点
-        if raw_text:
-            try:
-                punc_res = punc_model(raw_text)
-                # 解析标点模型返回值
-                if punc_res:
-                    punc_item = punc_res[0] if isinstance(punc_res, list) else punc_res
-                    if isinstance(punc_item, str):
-                        final_text = punc_item
-                    elif isinstance(punc_item, (tuple, list)) and len(punc_item) > 0:
-                        final_text = punc_item[0] if isinstance(punc_item[0], str) else str(punc_item[0])
-                    else:
-                        final_text = str(punc_item) if punc_item else raw_text
-                else:
-                    final_text = raw_text
-            except Exception:
-                final_text = raw_text
-        else:
-            final_text = ""
+        # 离线识别 + 标点
+        raw_text, final_text = recognize_offline(asr_offline_model, punc_model, audio_float)
 
         send_ipc_message({
             "request_id": request_id,
@@ -948,64 +1347,321 @@ def handle_batch_file(asr_offline_model, punc_model, data: dict):
         })
 
 
-def main():
+def handle_transcribe_segment(asr_offline_model, punc_model, data: dict):
+    """识别一段已断句的音频（云端 Worker 熔断时的本地兜底，audio_data 为 base64 int16 PCM）"""
+    request_id = data.get("request_id", "unknown")
+    t_start = time.time()
     try:
-        sys.stderr.write("[FunASR Worker] Starting FunASR 2-Pass Worker...\n")
-        sys.stderr.flush()
-
-        # 加载模型
-        vad_model, asr_online_model, asr_offline_model, punc_model = load_funasr_onnx_models()
+        audio_float = decode_audio_chunk(data.get("audio_data") or "")
+        if audio_float.size == 0:
+            raw_text, final_text = "", ""
+        else:
+            raw_text, final_text = recognize_offline(asr_offline_model, punc_model, audio_float)
+        send_ipc_message({
+            "request_id": request_id,
+            "type": "segment_result",
+            "text": final_text,
+            "raw_text": raw_text,
+            "language": "zh",
+            "status": "success",
+            "latency_ms": int((time.time() - t_start) * 1000),
+        })
+    except Exception as exc:
+        send_ipc_message({
+            "request_id": request_id,
+            "type": "segment_result",
+            "status": "error",
+            "error": str(exc),
+        })
 
-        sessions_cache: Dict[str, SessionState] = {}
-        send_ipc_message({"status": "ready"})
 
-        sys.stderr.write("[FunASR Worker] Ready! 2-Pass mode enabled.\n")
-        sys.stderr.flush()
+def serve_requests(vad_model, asr_online_model, asr_offline_model, punc_model):
+    """请求循环：逐行读取 stdin 直到 EOF"""
+    sessions_cache: Dict[str, SessionState] = {}
 
-        while True:
-            line = sys.stdin.readline()
-            if not line:
-                break
+    while True:
+        line = sys.stdin.readline()
+        if not line:
+            break
 
-            try:
-                data = json.loads(line)
-            except json.JSONDecodeError as exc:
-                send_ipc_message({"request_id": "unknown", "error": f"Invalid JSON: {exc}"})
-                continue
+        try:
+            data = json.loads(line)
+        except json.JSONDecodeError as exc:
+            send_ipc_message({"request_id": "unknown", "error": f"Invalid JSON: {exc}"})
+            continue
 
-            request_type = data.get("type")
-            request_id = data.get("request_id", "default")
-            session_id = data.get("session_id", request_id)
+        request_type = data.get("type")
+        request_id = data.get("request_id", "default")
+        session_id = data.get("session_id", request_id)
 
-            if request_type == "reset_session":
-                sys.stderr.write(f"[FunASR Worker] Resetting session: {session_id}\n")
+        if request_type == "export_session":
+            # 默认连同会话一起移出本 Worker（迁移语义），remove=false 时只做快照；编码失败时会话留在本 Worker
+            state = sessions_cache.get(session_id)
+            try:
+                snapshot = export_session_state(state) if state is not None else None
+            except TypeError as exc:
+                sys.stderr.write(f"[FunASR Worker] Cannot export session {session_id}: {exc}\n")
                 sys.stderr.flush()
-                sessions_cache.pop(session_id, None)
+                send_ipc_message({
+                    "request_id": request_id,
+                    "session_id": session_id,
+                    "type": "session_snapshot",
+                    "status": "error",
+                    "error": str(exc),
+                })
                 continue
+            if data.get("remove", True):
+                sessions_cache.pop(session_id, None)
+            send_ipc_message({
+                "request_id": request_id,
+                "session_id": session_id,
+                "type": "session_snapshot",
+                "status": "success",
+                "snapshot": snapshot,
+            })
+            continue
 
-            if request_type == "force_commit":
-                handle_force_commit(asr_offline_model, punc_model, data, sessions_cache)
+        if request_type == "import_session":
+            snapshot = data.get("snapshot")
+            try:
+                if snapshot is None:
+                    sessions_cache.pop(session_id, None)
+                else:
+                    sessions_cache[session_id] = import_session_state(snapshot)
+            except (ValueError, KeyError, TypeError) as exc:
+                send_ipc_message({
+                    "request_id": request_id,
+                    "session_id": session_id,
+                    "type": "session_imported",
+                    "status": "error",
+                    "error": str(exc),
+                })
                 continue
+            sys.stderr.write(f"[FunASR Worker] Imported session: {session_id}\n")
+            sys.stderr.flush()
+            send_ipc_message({
+                "request_id": request_id,
+                "session_id": session_id,
+                "type": "session_imported",
+                "status": "success",
+            })
+            continue
 
-            if request_type == "streaming_chunk":
-                handle_streaming_chunk(
-                    vad_model,
-                    asr_online_model,
-                    asr_offline_model,
-                    punc_model,
-                    data,
-                    sessions_cache,
-                )
-                continue
+        if request_type == "reset_session":
+            sys.stderr.write(f"[FunASR Worker] Resetting session: {session_id}\n")
+            sys.stderr.flush()
+            sessions_cache.pop(session_id, None)
+            continue
 
-            if request_type == "batch_file" or "audio_path" in data:
-                handle_batch_file(asr_offline_model, punc_model, data)
-                continue
+        if request_type in ("transcribe_segment", "batch_file") and asr_offline_model is None:
+            send_ipc_message({
+                "request_id": request_id,
+                "session_id": session_id,
+                "status": "error",
+                "error": f"{request_type} is not supported in role '{WORKER_ROLE}'",
+            })
+            continue
+
+        if request_type == "transcribe_segment":
+            handle_transcribe_segment(asr_offline_model, punc_model, data)
+            continue
+
+        if request_type in ("streaming_chunk", "force_commit") and vad_model is None:
+            send_ipc_message({
+                "request_id": request_id,
+                "session_id": session_id,
+                "status": "error",
+                "error": f"{request_type} is not supported in role '{WORKER_ROLE}'",
+            })
+            continue
 
+        if request_type == "force_commit":
+            handle_force_commit(asr_offline_model, punc_model, data, sessions_cache)
+            continue
+
+        if request_type == "streaming_chunk":
+            started = time.time()
+            handle_streaming_chunk(
+                vad_model,
+                asr_online_model,
+                asr_offline_model,
+                punc_model,
+                data,
+                sessions_cache,
+            )
+            LOAD.record(session_id, decode_sec=time.time() - started)
+            continue
+
+        if request_type == "get_metrics":
             send_ipc_message({
                 "request_id": request_id,
-                "error": f"Unknown request type: {request_type}",
+                "type": "metrics",
+                "status": "success",
+                "metrics": {**LOAD.snapshot(), "role": WORKER_ROLE, "sessions": len(sessions_cache)},
             })
+            continue
+
+        if request_type == "batch_file" or "audio_path" in data:
+            handle_batch_file(asr_offline_model, punc_model, data)
+            continue
+
+        send_ipc_message({
+            "request_id": request_id,
+            "error": f"Unknown request type: {request_type}",
+        })
+
+
+# ==============================================================================
+# zygote 模式：模板进程 + fork 出的 Worker
+# ==============================================================================
+
+def _send_control(ctl: socket.socket, data: dict):
+    try:
+        ctl.send(json.dumps(data).encode("utf-8"))
+    except OSError as exc:
+        sys.stderr.write(f"[FunASR Zygote] Failed to send control message: {exc}\n")
+        sys.stderr.flush()
+
+
+def _reap_children(ctl: socket.socket):
+    """回收已退出的子进程并报告退出码（被信号杀死时为负的信号值，与 asyncio 一致）"""
+    while True:
+        try:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+        except ChildProcessError:
+            return
+        if pid == 0:
+            return
+        returncode = os.waitstatus_to_exitcode(status)
+        sys.stderr.write(f"[FunASR Zygote] Worker pid={pid} exited with {returncode}\n")
+        sys.stderr.flush()
+        _send_control(ctl, {"type": "exited", "pid": pid, "returncode": returncode})
+
+
+def run_forked_worker(
+    io_fd: int, err_fd: int, models: Tuple, fork_started: float, zygote_pid: int, cpus: Optional[List[int]] = None
+):
+    """fork 出的子进程：接管桥接层传来的 socket 作为 stdin / IPC / stderr，然后进入正常的请求循环"""
+    global ipc_channel, LOAD
+
+    if cpus and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cpus)
+
+    os.dup2(io_fd, 0)
+    os.dup2(err_fd, 1)
+    os.dup2(err_fd, 2)
+    os.close(io_fd)
+    os.close(err_fd)
+    # 模板进程的 IPC 管道不能留在子进程里，否则模板退出后桥接层读不到 EOF
+    zygote_channel = ipc_channel
+    ipc_channel = os.fdopen(os.dup(0), "w", buffering=1, encoding="utf-8")
+    zygote_channel.close()
+    sys.stdin = os.fdopen(0, "r", encoding="utf-8", closefd=False)
+    # 负载统计与会话状态都按进程独立，不继承模板进程的数据
+    LOAD = LoadController(QUALITY_LADDER, log_prefix="[FunASR Worker]", knob="pass2")
+
+    fork_ms = elapsed_ms(fork_started)
+    startup = {**STARTUP, "fork": {"zygote_pid": zygote_pid, "fork_ms": fork_ms, "cpus": cpus or None}}
+    send_ipc_message({"status": "ready", "role": WORKER_ROLE, "startup": startup})
+    sys.stderr.write(f"[FunASR Worker] Ready! role={WORKER_ROLE} (forked from zygote {zygote_pid} in {fork_ms}ms)\n")
+    sys.stderr.flush()
+    serve_requests(*models)
+
+
+def serve_zygote(ctl_fd: int, models: Tuple):
+    """
+    模板进程主循环：每个 fork 请求是一个 SOCK_SEQPACKET 包，带两个文件描述符（stdin/IPC、stderr）。
+    模板进程保持单线程，fork 时不会有其他线程持有锁；控制 socket 关闭（桥接层退出）时结束
+    """
+    ctl = socket.socket(fileno=ctl_fd)
+    zygote_pid = os.getpid()
+    send_ipc_message({"status": "ready", "role": WORKER_ROLE, "startup": STARTUP, "zygote": True})
+    sys.stderr.write(f"[FunASR Zygote] Ready! role={WORKER_ROLE} pid={zygote_pid}, waiting for fork requests\n")
+    sys.stderr.flush()
+
+    while True:
+        readable, _, _ = select.select([ctl], [], [], 0.5)
+        _reap_children(ctl)
+        if not readable:
+            continue
+        try:
+            msg, fds, _, _ = socket.recv_fds(ctl, 4096, 2)
+        except OSError as exc:
+            sys.stderr.write(f"[FunASR Zygote] Control socket error: {exc}\n")
+            break
+        if not msg:
+            break
+        try:
+            request = json.loads(msg.decode("utf-8"))
+        except ValueError:
+            request = {}
+        if request.get("type") != "fork" or len(fds) != 2:
+            for fd in fds:
+                os.close(fd)
+            _send_control(ctl, {"type": "error", "token": request.get("token"), "error": "invalid fork request"})
+            continue
+
+        fork_started = time.perf_counter()
+        sys.stderr.flush()
+        ipc_channel.flush()
+        pid = os.fork()
+        if pid == 0:
+            returncode = 0
+            try:
+                ctl.close()
+                run_forked_worker(fds[0], fds[1], models, fork_started, zygote_pid, request.get("cpus"))
+            except BaseException as exc:
+                returncode = 1
+                try:
+                    sys.stderr.write(f"[FunASR Worker] Fatal error: {exc}\n")
+                    sys.stderr.write(traceback.format_exc())
+                    send_ipc_message({"status": "fatal", "error": str(exc)})
+                except Exception:
+                    pass
+            finally:
+                try:
+                    sys.stderr.flush()
+                    ipc_channel.flush()
+                finally:
+                    # 不执行从模板进程继承的 atexit / 缓冲区清理
+                    os._exit(returncode)
+        for fd in fds:
+            os.close(fd)
+        sys.stderr.write(f"[FunASR Zygote] Forked worker pid={pid}\n")
+        sys.stderr.flush()
+        _send_control(ctl, {"type": "forked", "token": request.get("token"), "pid": pid})
+
+    sys.stderr.write("[FunASR Zygote] Control socket closed, exiting\n")
+    sys.stderr.flush()
+
+
+def main():
+    try:
+        sys.stderr.write("[FunASR Worker] Starting FunASR 2-Pass Worker...\n")
+        sys.stderr.flush()
+
+        # 加载模型
+        vad_model, asr_online_model, asr_offline_model, punc_model = load_funasr_onnx_models()
+        STARTUP["model_load_ms"] = round(sum(STARTUP.get("model_load", {}).values()), 1)
+
+        started = time.perf_counter()
+        STARTUP["warmup"] = warm_up(vad_model, asr_online_model, asr_offline_model, punc_model)
+        STARTUP["warmup_ms"] = elapsed_ms(started)
+        sys.stderr.write(
+            f"[FunASR Worker] Startup: import={STARTUP['import_ms']}ms load={STARTUP['model_load_ms']}ms "
+            f"warmup={STARTUP['warmup_ms']}ms {STARTUP['warmup']}\n"
+        )
+        sys.stderr.flush()
+
+        models = (vad_model, asr_online_model, asr_offline_model, punc_model)
+        if ZYGOTE_FD is not None:
+            serve_zygote(ZYGOTE_FD, models)
+            return
+
+        send_ipc_message({"status": "ready", "role": WORKER_ROLE, "startup": STARTUP})
+        sys.stderr.write(f"[FunASR Worker] Ready! role={WORKER_ROLE}\n")
+        sys.stderr.flush()
+        serve_requests(*models)
 
     except Exception as exc:
         sys.stderr.write(f"[FunASR Worker] Fatal error: {exc}\n")
@@ -1,35 +1,57 @@
 #!/usr/bin/env python3
 # coding: utf-8
 """
-SiliconFlow ASR Worker - Parallel Redundant Architecture (并行冗余架构)
+SiliconFlow ASR Worker - Hedged Request Architecture (对冲请求架构)
 
 策略：
 - VAD 精准断句：使用 FunASR 轻量级 FSMN-VAD 模型（本地推理，延迟低）
-- 并行冗余请求：每段音频同时发送 N 个（默认2个）请求到云端 API
-- Race 机制：只接受最先返回的结果，其他自动取消
+- 连接池复用：httpx.AsyncClient 长连接（可选 HTTP/2），启动预热、空闲保活
+- 压缩上传：默认 FLAC 无损编码（可插拔编码器），直接从 int16 编码，不经过 float 往返
+- 自适应对冲：每段先只发 1 个请求，超过动态延迟分位数（默认 p90）仍未返回才补发备份请求
+- Race 机制：只接受最先成功的结果，其余在途请求被真正中断（取消协程并关闭连接）
 - 段落独立：每段音频独立处理，不等待前一段完成
+- 熔断兜底：滚动窗口错误率/延迟超限时熔断，期间（以及单段等待过久时）改用本地 FunASR 子进程识别，
+  后台定期探测云端恢复后自动切回；令牌桶限制请求速率，避免触发服务端限流
+- 长文件：按 VAD 静音切成 API 大小的块并发上传（限并发、可重试），每块结果即时推送，最后按序拼接
+- 后台提交：识别请求在后台流水线中执行，主循环只负责读音频/VAD/断句，从不等待网络；
+  结果按会话内 segment_seq 顺序发布（SF_ORDERED_RESULTS=0 时先到先发），
+  队头等待不超过 SF_ORDERED_MAX_HOLD_MS
+- 短段合并：过短的段落（"嗯"、"对"）在有限等待时间内与相邻段合并为一次上传（段间插入静音），
+  返回文本能按段数切分时仍按段发布
 
 优势：
-- 高可靠性：单个请求失败不影响结果
-- 低延迟：总是取最快返回的那个
-- 简化逻辑：无需复杂的重试和补偿机制
+- 低成本：绝大多数段落只消耗一次上传和一次 API 配额
+- 低尾延迟：慢请求由备份请求兜底，每分钟对冲次数有上限
+- 兼容旧行为：SF_HEDGE_MODE=race 时恢复每段同时发送 N 个请求
 """
 
+import asyncio
 import base64
 import concurrent.futures
 import io
 import json
 import os
 import platform
+import re
 import sys
+import threading
 import time
 import traceback
 import wave
+from collections import deque
 from dataclasses import dataclass, field
-from typing import Dict, List, Optional
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+# 线程预算（见 cpu_affinity）：亲和性必须在导入 numpy 之前设置
+from cpu_affinity import CPU_THREADS, apply_cpu_affinity
+
+CPU_AFFINITY = apply_cpu_affinity("[SF Worker]")
 
 import numpy as np
 
+from cloud_resilience import CircuitBreaker, LocalFallbackWorker, TokenBucket, percentile, round_ms
+
 # ==============================================================================
 # IPC 通道重定向
 # ==============================================================================
@@ -37,12 +59,16 @@ ipc_fd = os.dup(sys.stdout.fileno())
 ipc_channel = os.fdopen(ipc_fd, "w", buffering=1, encoding="utf-8")
 os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
 sys.stdout = sys.stderr
+# 主线程与后台提交流水线（事件循环线程）都会写 IPC，按行加锁避免交错
+_ipc_lock = threading.Lock()
 
 
 def send_ipc_message(data: dict):
     try:
-        ipc_channel.write(json.dumps(data, ensure_ascii=False) + "\n")
-        ipc_channel.flush()
+        line = json.dumps(data, ensure_ascii=False) + "\n"
+        with _ipc_lock:
+            ipc_channel.write(line)
+            ipc_channel.flush()
     except Exception as exc:
         sys.stderr.write(f"[IPC Error] {exc}\n")
         sys.stderr.flush()
@@ -51,7 +77,8 @@ def send_ipc_message(data: dict):
 # ==============================================================================
 # 配置
 # ==============================================================================
-API_URL = "https://api.siliconflow.cn/v1/audio/transcriptions"
+# 可指向本地模拟服务（scripts/mock-cloud-asr.py）做离线压测
+API_URL = os.environ.get("SILICONFLOW_API_URL", "https://api.siliconflow.cn/v1/audio/transcriptions").strip()
 _SF_API_KEY_OBFUSCATED = "c2staWJndG9zZmhuYmZxbmlueWVtYnRvY3B2eGJ2aG1qb3JuemJsZWZteWxlamd2a2xr"
 API_KEY = os.environ.get("SILICONFLOW_API_KEY", base64.b64decode(_SF_API_KEY_OBFUSCATED).decode()).strip()
 MODEL_NAME = os.environ.get("SILICONFLOW_MODEL", "TeleAI/TeleSpeechASR").strip()
@@ -61,8 +88,64 @@ CHUNK_MS = 200  # VAD 输入块大小
 MAX_BUFFER_SEC = float(os.environ.get("SF_MAX_BUFFER_SEC", "5.0"))  # 降低到5秒，避免单句过长
 REQUEST_TIMEOUT = float(os.environ.get("SF_REQUEST_TIMEOUT", "25.0"))
 
-# 并行冗余配置
-PARALLEL_REQUESTS = int(os.environ.get("SF_PARALLEL_REQUESTS", "2"))  # 每段发送的并行请求数
+# 对冲请求配置
+PARALLEL_REQUESTS = int(os.environ.get("SF_PARALLEL_REQUESTS", "2"))  # 每段最多同时在途的请求数（含备份）
+HEDGE_MODE = os.environ.get("SF_HEDGE_MODE", "adaptive").strip().lower()  # adaptive / race（同时全发，旧行为）
+HEDGE_PERCENTILE = float(os.environ.get("SF_HEDGE_PERCENTILE", "0.9"))  # 超过该延迟分位数才补发备份
+HEDGE_INITIAL_DELAY_MS = float(os.environ.get("SF_HEDGE_INITIAL_DELAY_MS", "1500"))  # 样本不足时的对冲延迟
+HEDGE_MIN_DELAY_MS = float(os.environ.get("SF_HEDGE_MIN_DELAY_MS", "200"))
+HEDGE_MIN_SAMPLES = int(os.environ.get("SF_HEDGE_MIN_SAMPLES", "10"))
+HEDGE_WINDOW = int(os.environ.get("SF_HEDGE_WINDOW", "200"))  # 参与分位数统计的最近请求数
+HEDGE_MAX_PER_MINUTE = int(os.environ.get("SF_HEDGE_MAX_PER_MINUTE", "20"))  # 每分钟最多对冲次数
+
+# 连接池配置（httpx keep-alive，避免每个请求重复 DNS/TCP/TLS 握手）
+HTTP2_ENABLED = os.environ.get("SF_HTTP2", "1") in ("1", "true", "yes")  # 需要安装 h2，缺失时回退 HTTP/1.1
+POOL_MAX_CONNECTIONS = int(os.environ.get("SF_POOL_MAX_CONNECTIONS", "8"))
+POOL_KEEPALIVE_EXPIRY = float(os.environ.get("SF_POOL_KEEPALIVE_EXPIRY", "120"))  # 空闲连接保留时长（秒）
+PREWARM_CONNECTIONS = int(os.environ.get("SF_PREWARM_CONNECTIONS", str(PARALLEL_REQUESTS)))  # 启动时预建连接数
+KEEPALIVE_INTERVAL = float(os.environ.get("SF_KEEPALIVE_INTERVAL", "30"))  # 空闲保活请求间隔（秒），0 关闭
+CONNECT_TIMEOUT = float(os.environ.get("SF_CONNECT_TIMEOUT", "3.0"))
+
+# 提交流水线：按 segment_seq 顺序发布结果（0 = 谁先返回先发布）
+ORDERED_RESULTS = os.environ.get("SF_ORDERED_RESULTS", "1") in ("1", "true", "yes")
+# 已返回的结果等待前序段的最长时间：超过后跳过未返回的队头先发布后续段，队头返回时补发并标记 late
+ORDERED_MAX_HOLD_MS = float(os.environ.get("SF_ORDERED_MAX_HOLD_MS", "10000"))
+INGEST_STATS_WINDOW = 500  # 摄入延迟统计窗口（最近 N 个音频块）
+
+# 熔断 + 限流 + 本地兜底
+BREAKER_WINDOW_SEC = float(os.environ.get("SF_BREAKER_WINDOW_SEC", "60"))  # 滚动统计窗口
+BREAKER_MIN_SAMPLES = int(os.environ.get("SF_BREAKER_MIN_SAMPLES", "5"))
+BREAKER_ERROR_RATE = float(os.environ.get("SF_BREAKER_ERROR_RATE", "0.5"))  # 窗口内错误率达到即熔断
+BREAKER_LATENCY_MS = float(os.environ.get("SF_BREAKER_LATENCY_MS", "8000"))  # 窗口内 p90 延迟达到即熔断
+BREAKER_CONSECUTIVE_FAILURES = int(os.environ.get("SF_BREAKER_CONSECUTIVE_FAILURES", "3"))
+BREAKER_PROBE_SEC = float(os.environ.get("SF_BREAKER_PROBE_SEC", "10"))  # 熔断后首次探测间隔，失败则指数退避
+RATE_LIMIT_RPS = float(os.environ.get("SF_RATE_LIMIT_RPS", "10"))  # 0 = 不限流
+RATE_LIMIT_BURST = float(os.environ.get("SF_RATE_LIMIT_BURST", "20"))
+RATE_LIMIT_MAX_WAIT_MS = float(os.environ.get("SF_RATE_LIMIT_MAX_WAIT_MS", "500"))  # 等不到令牌就走本地兜底
+LOCAL_FALLBACK = os.environ.get("SF_LOCAL_FALLBACK", "1") in ("1", "true", "yes")
+FALLBACK_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "asr_funasr_worker.py")
+FAILOVER_AFTER_MS = float(os.environ.get("SF_FAILOVER_AFTER_MS", "8000"))  # 单段等待超过该值即转本地识别
+FALLBACK_TIMEOUT = float(os.environ.get("SF_FALLBACK_TIMEOUT", "120"))  # 含本地模型首次加载时间
+
+# 短段合并：短于 MIN_SEC 的段最多等待 MAX_WAIT_MS，与相邻段合并上传（MIN_SEC=0 关闭）
+COALESCE_MIN_SEC = float(os.environ.get("SF_COALESCE_MIN_SEC", "0.8"))
+COALESCE_MAX_WAIT_MS = float(os.environ.get("SF_COALESCE_MAX_WAIT_MS", "600"))  # 合并带来的额外延迟上限
+COALESCE_MAX_SEC = float(os.environ.get("SF_COALESCE_MAX_SEC", str(MAX_BUFFER_SEC)))  # 合并后单次上传的最大时长
+COALESCE_GAP_MS = float(os.environ.get("SF_COALESCE_GAP_MS", "300"))  # 段间插入的静音，帮助模型断句
+# 只在句末标点处切分：逗号 / 顿号 / 空白常出现在一段话内部，按它们切会把文字错配到相邻段
+COALESCE_SPLIT_RE = re.compile(r"(?<=[。！？!?；;])|(?<=\.)(?=\s)")
+
+# 长文件转写：按 VAD 静音切成不超过 CHUNK_SEC 的块（控制单次上传体积在 API 限制内），并发上传
+BATCH_CHUNK_SEC = float(os.environ.get("SF_BATCH_CHUNK_SEC", "30"))
+BATCH_CONCURRENCY = int(os.environ.get("SF_BATCH_CONCURRENCY", "4"))
+BATCH_RETRIES = int(os.environ.get("SF_BATCH_RETRIES", "2"))
+BATCH_VAD_WINDOW_SEC = 60.0  # 离线 VAD 每次推理的音频长度
+BATCH_SILENCE_RMS = 300.0  # 整块最大短时能量低于该值（int16 量程）视为静音，不上传
+
+# 上传编码：flac（无损，默认）/ wav / opus / mp3，服务端拒绝时自动回退 wav
+UPLOAD_FORMAT = os.environ.get("SF_UPLOAD_FORMAT", "flac").strip().lower()
+_api_origin = urlsplit(API_URL)
+HEALTH_URL = os.environ.get("SF_HEALTH_URL", f"{_api_origin.scheme}://{_api_origin.netloc}/").strip()
 
 # VAD 配置
 SILENCE_THRESHOLD_CHUNKS = int(os.environ.get("SF_SILENCE_CHUNKS", "2"))  # 降低到2，更快断句（原3）
@@ -79,19 +162,15 @@ SENTENCE_END_PUNCT = set("。！？!?.；;")
 
 
 def decode_audio_chunk(audio_b64: str) -> np.ndarray:
-    """Base64 -> float32 PCM"""
+    """Base64 -> int16 PCM（零拷贝视图，上传编码直接使用 int16）"""
     audio_bytes = base64.b64decode(audio_b64)
-    audio_int16 = np.frombuffer(audio_bytes, dtype=np.int16)
-    return audio_int16.astype(np.float32)
+    return np.frombuffer(audio_bytes, dtype=np.int16)
 
 
 def pcm_to_wav_bytes(pcm: np.ndarray, sample_rate: int) -> bytes:
-    """float32/int16 -> wav bytes"""
+    """int16 -> wav bytes（非 int16 输入按 int16 量程处理，不做全数组幅度扫描）"""
     if pcm.dtype != np.int16:
-        if np.max(np.abs(pcm)) <= 1.0:
-            pcm = (pcm * 32767).astype(np.int16)
-        else:
-            pcm = pcm.astype(np.int16)
+        pcm = np.clip(pcm, -32768, 32767).astype(np.int16)
     buf = io.BytesIO()
     with wave.open(buf, "wb") as wf:
         wf.setnchannels(1)
@@ -101,6 +180,57 @@ def pcm_to_wav_bytes(pcm: np.ndarray, sample_rate: int) -> bytes:
     return buf.getvalue()
 
 
+def _soundfile_encoder(fmt: str, subtype: str) -> Callable[[np.ndarray, int], bytes]:
+    def encode(pcm: np.ndarray, sample_rate: int) -> bytes:
+        import soundfile as sf
+
+        if pcm.dtype != np.int16:
+            pcm = np.clip(pcm, -32768, 32767).astype(np.int16)
+        buf = io.BytesIO()
+        # soundfile 对 int16 输入走 sf_writef_short，不会转换成 float
+        sf.write(buf, pcm, sample_rate, format=fmt, subtype=subtype)
+        return buf.getvalue()
+
+    return encode
+
+
+@dataclass
+class UploadEncoder:
+    name: str
+    filename: str
+    mime: str
+    encode: Callable[[np.ndarray, int], bytes]
+
+
+UPLOAD_ENCODERS: Dict[str, UploadEncoder] = {}
+
+
+def register_upload_encoder(name: str, filename: str, mime: str, encode: Callable[[np.ndarray, int], bytes]):
+    """注册上传编码器：encode(int16_pcm, sample_rate) -> bytes"""
+    UPLOAD_ENCODERS[name] = UploadEncoder(name=name, filename=filename, mime=mime, encode=encode)
+
+
+register_upload_encoder("wav", "chunk.wav", "audio/wav", pcm_to_wav_bytes)
+register_upload_encoder("flac", "chunk.flac", "audio/flac", _soundfile_encoder("FLAC", "PCM_16"))
+register_upload_encoder("opus", "chunk.ogg", "audio/ogg", _soundfile_encoder("OGG", "OPUS"))
+register_upload_encoder("mp3", "chunk.mp3", "audio/mpeg", _soundfile_encoder("MP3", "MPEG_LAYER_III"))
+
+
+def resolve_upload_encoder(name: str) -> UploadEncoder:
+    """解析编码器；soundfile/libsndfile 不支持该格式时回退 wav"""
+    encoder = UPLOAD_ENCODERS.get(name)
+    if encoder is None:
+        sys.stderr.write(f"[SF Worker] Unknown upload format '{name}', fallback to wav\n")
+        return UPLOAD_ENCODERS["wav"]
+    if encoder.name != "wav":
+        try:
+            encoder.encode(np.zeros(1600, dtype=np.int16), SAMPLE_RATE)
+        except Exception as exc:
+            sys.stderr.write(f"[SF Worker] Upload format '{name}' unavailable ({exc}), fallback to wav\n")
+            return UPLOAD_ENCODERS["wav"]
+    return encoder
+
+
 def smart_concat(history: str, new_text: str) -> str:
     """智能拼接文本"""
     if not new_text:
@@ -122,6 +252,556 @@ def smart_concat(history: str, new_text: str) -> str:
     return history + new_text
 
 
+def plan_batch_chunks(
+    audio: np.ndarray, sample_rate: int, max_sec: float, speech: Optional[List[Tuple[int, int]]] = None
+) -> List[Tuple[int, int]]:
+    """
+    把长音频切成不超过 max_sec 的块，返回 [(start, end)] 采样点区间
+
+    - 切点优先落在 VAD 语音区间之间的静音中点，且尽量靠后（块越少请求越少）
+    - 窗口内没有静音间隙时，取 300ms 平滑能量最低处（靠后优先），尽量不切在字中间
+    - 不含语音的块直接丢弃
+    """
+    total = len(audio)
+    max_len = max(1, int(max_sec * sample_rate))
+    if total == 0:
+        return []
+
+    frame = max(1, int(0.03 * sample_rate))
+    n_frames = total // frame
+    if n_frames:
+        frames = audio[: n_frames * frame].astype(np.float32).reshape(n_frames, frame)
+        energy = np.sqrt(np.convolve(np.mean(frames ** 2, axis=1), np.ones(10) / 10.0, mode="same"))
+    else:
+        energy = np.zeros(0, dtype=np.float32)
+
+    gap_cuts = []
+    if speech:
+        gap_cuts = [(speech[i][1] + speech[i + 1][0]) // 2 for i in range(len(speech) - 1)]
+
+    chunks: List[Tuple[int, int]] = []
+    pos = 0
+    while total - pos > max_len:
+        lo, hi = pos + max_len // 2, pos + max_len
+        candidates = [cut for cut in gap_cuts if lo <= cut <= hi]
+        if candidates:
+            cut = max(candidates)
+        else:
+            f_lo, f_hi = lo // frame, min(hi // frame, n_frames)
+            if f_hi > f_lo:
+                window = energy[f_lo:f_hi]
+                # 取接近最低能量的最后一帧，让块尽量长
+                quiet = np.flatnonzero(window <= window.min() * 1.2 + 1.0)
+                cut = (f_lo + int(quiet[-1])) * frame
+            else:
+                cut = hi
+        chunks.append((pos, cut))
+        pos = cut
+    chunks.append((pos, total))
+
+    def has_speech(start: int, end: int) -> bool:
+        if speech is not None:
+            return any(s < end and e > start for s, e in speech)
+        f_lo, f_hi = start // frame, max(start // frame + 1, min(end // frame, n_frames))
+        return n_frames == 0 or float(np.max(energy[f_lo:f_hi], initial=0.0)) >= BATCH_SILENCE_RMS
+
+    return [(start, end) for start, end in chunks if has_speech(start, end)]
+
+
+def join_chunk_texts(texts: List[str]) -> str:
+    """拼接分块文本：中文直接相连，两侧都是字母数字时补一个空格"""
+    out = ""
+    for text in texts:
+        if out and out[-1].isascii() and out[-1].isalnum() and text[:1].isascii() and text[:1].isalnum():
+            out += " "
+        out += text
+    return out
+
+
+def _h2_available() -> bool:
+    try:
+        import h2  # noqa: F401  # type: ignore
+
+        return True
+    except ImportError:
+        return False
+
+
+class SiliconFlowClient:
+    """
+    SiliconFlow HTTP 客户端：后台事件循环 + httpx.AsyncClient 连接池
+
+    - keep-alive 复用连接，每段音频不再重复 DNS/TCP/TLS 握手
+    - 可选 HTTP/2：多个冗余请求在同一连接上多路复用
+    - 启动时预热连接，空闲期间定期发送健康请求，防止连接被服务端/NAT 回收
+    - submit() 返回 concurrent.futures.Future，取消时会真正中断在途的协程请求
+    """
+
+    def __init__(self):
+        import httpx
+
+        self._httpx = httpx
+        self.http2 = HTTP2_ENABLED and _h2_available()
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run_loop, name="sf-http", daemon=True)
+        self._thread.start()
+        self._last_activity = time.time()
+        self._keepalive_task: Optional[asyncio.Task] = None
+        self.client = self.submit(self._create_client()).result()
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    async def _create_client(self):
+        httpx = self._httpx
+        return httpx.AsyncClient(
+            http2=self.http2,
+            timeout=httpx.Timeout(REQUEST_TIMEOUT, connect=CONNECT_TIMEOUT),
+            limits=httpx.Limits(
+                max_connections=POOL_MAX_CONNECTIONS,
+                max_keepalive_connections=POOL_MAX_CONNECTIONS,
+                keepalive_expiry=POOL_KEEPALIVE_EXPIRY,
+            ),
+            headers={"Authorization": f"Bearer {API_KEY}"} if API_KEY else None,
+        )
+
+    def submit(self, coro) -> concurrent.futures.Future:
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    async def _ping(self) -> Optional[float]:
+        """轻量健康请求：只关心连接是否建立/保持，不关心状态码"""
+        t0 = time.time()
+        try:
+            await self.client.request("HEAD", HEALTH_URL, timeout=CONNECT_TIMEOUT + 2)
+        except Exception as exc:
+            sys.stderr.write(f"[SF Worker] Keep-alive ping failed: {exc}\n")
+            sys.stderr.flush()
+            return None
+        self._last_activity = time.time()
+        return self._last_activity - t0
+
+    async def _warmup(self, connections: int) -> List[Optional[float]]:
+        # HTTP/1.1 下并发 ping 会建立多条连接；HTTP/2 下复用同一条连接
+        count = 1 if self.http2 else max(1, connections)
+        return list(await asyncio.gather(*(self._ping() for _ in range(count))))
+
+    async def _keepalive_loop(self):
+        while True:
+            await asyncio.sleep(KEEPALIVE_INTERVAL)
+            if time.time() - self._last_activity >= KEEPALIVE_INTERVAL:
+                await self._ping()
+
+    async def _start_keepalive(self):
+        self._keepalive_task = asyncio.create_task(self._keepalive_loop())
+
+    def warmup(self):
+        """预热连接池并启动保活任务（阻塞直到预热完成）"""
+        if PREWARM_CONNECTIONS > 0:
+            latencies = self.submit(self._warmup(PREWARM_CONNECTIONS)).result()
+            ok = [l for l in latencies if l is not None]
+            sys.stderr.write(
+                f"[SF Worker] Connection pool warmed: {len(ok)}/{len(latencies)} ok"
+                + (f", handshake+ping {max(ok) * 1000:.0f}ms" if ok else "")
+                + "\n"
+            )
+            sys.stderr.flush()
+        if KEEPALIVE_INTERVAL > 0:
+            self.submit(self._start_keepalive()).result()
+
+    async def transcribe(self, audio_bytes: bytes, filename: str, mime: str) -> dict:
+        resp = await self.client.post(
+            API_URL,
+            data={"model": MODEL_NAME},
+            files={"file": (filename, audio_bytes, mime)},
+        )
+        self._last_activity = time.time()
+        resp.raise_for_status()
+        return resp.json()
+
+    async def _aclose(self):
+        if self._keepalive_task:
+            self._keepalive_task.cancel()
+        await self.client.aclose()
+
+    def close(self):
+        try:
+            self.submit(self._aclose()).result(timeout=5)
+        except Exception:
+            pass
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+
+class HedgePolicy:
+    """
+    自适应对冲策略
+
+    - 记录最近 HEDGE_WINDOW 个成功请求的延迟，动态计算对冲延迟（默认 p90）
+    - 每分钟对冲次数受 HEDGE_MAX_PER_MINUTE 限制，避免服务端整体变慢时流量翻倍
+    - 统计对冲率、备份请求胜率以及延迟分位数，供 get_metrics 导出
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._latencies_ms: deque = deque(maxlen=HEDGE_WINDOW)
+        self._hedge_times: deque = deque()
+        self.segments = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.hedges_throttled = 0
+        self.failures = 0
+
+    def hedge_delay(self) -> float:
+        """返回补发备份请求前的等待时间（秒）"""
+        if HEDGE_MODE == "race":
+            return 0.0
+        with self._lock:
+            samples = list(self._latencies_ms)
+        if len(samples) < HEDGE_MIN_SAMPLES:
+            delay_ms = HEDGE_INITIAL_DELAY_MS
+        else:
+            delay_ms = percentile(samples, HEDGE_PERCENTILE) or HEDGE_INITIAL_DELAY_MS
+        return max(HEDGE_MIN_DELAY_MS, delay_ms) / 1000.0
+
+    def try_acquire_hedge(self) -> bool:
+        if HEDGE_MODE == "race":
+            return True
+        now = time.time()
+        with self._lock:
+            while self._hedge_times and now - self._hedge_times[0] > 60.0:
+                self._hedge_times.popleft()
+            if len(self._hedge_times) >= HEDGE_MAX_PER_MINUTE:
+                self.hedges_throttled += 1
+                return False
+            self._hedge_times.append(now)
+            return True
+
+    def record_segment(self, hedged: bool, winner_is_backup: bool, ok: bool):
+        with self._lock:
+            self.segments += 1
+            if hedged:
+                self.hedges += 1
+            if winner_is_backup:
+                self.hedge_wins += 1
+            if not ok:
+                self.failures += 1
+
+    def record_latency(self, latency_sec: float):
+        with self._lock:
+            self._latencies_ms.append(latency_sec * 1000.0)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            samples = list(self._latencies_ms)
+            segments, hedges, wins = self.segments, self.hedges, self.hedge_wins
+            throttled, failures = self.hedges_throttled, self.failures
+        return {
+            "mode": HEDGE_MODE,
+            "segments": segments,
+            "hedges": hedges,
+            "hedge_rate": round(hedges / segments, 4) if segments else 0.0,
+            "hedge_wins": wins,
+            "hedge_win_rate": round(wins / hedges, 4) if hedges else 0.0,
+            "hedges_throttled": throttled,
+            "failures": failures,
+            "hedge_delay_ms": round(self.hedge_delay() * 1000.0, 1),
+            "latency_ms": {
+                "samples": len(samples),
+                "p50": round_ms(percentile(samples, 0.5)),
+                "p90": round_ms(percentile(samples, 0.9)),
+                "p99": round_ms(percentile(samples, 0.99)),
+            },
+        }
+
+
+class _ReorderQueue:
+    """
+    单个会话的重排队列：next_seq 为下一个应发布的段号，pending 暂存提前返回的结果，
+    skipped 为等待超时被跳过、尚未返回的段号，timer 为队头等待超时的定时器
+    """
+
+    __slots__ = ("next_seq", "pending", "skipped", "timer")
+
+    def __init__(self):
+        self.next_seq: Optional[int] = None
+        self.pending: Dict[int, tuple] = {}
+        self.skipped: set = set()
+        self.timer: Optional[threading.Timer] = None
+
+
+class CommitPipeline:
+    """
+    后台提交流水线
+
+    - submit() 只登记段落并挂上完成回调，立即返回；识别在 SiliconFlowClient 的事件循环中执行
+    - ordered=True：会话内按 segment_seq 发布，前序段未返回时后续结果暂存。
+      单段最长可能等待 FAILOVER_AFTER_MS + FALLBACK_TIMEOUT（本地兜底首次加载），因此暂存另设上限
+      ORDERED_MAX_HOLD_MS：超时后跳过仍未返回的队头，先发布后续段；被跳过的段返回时立即补发并带 late=True
+    - ordered=False：结果返回即发布
+    """
+
+    def __init__(self, ordered: bool, max_hold_ms: float = ORDERED_MAX_HOLD_MS):
+        self.ordered = ordered
+        self.max_hold_sec = max_hold_ms / 1000.0
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._queues: Dict[str, _ReorderQueue] = {}
+        self._in_flight = 0
+        self._max_in_flight = 0
+        self._submitted = 0
+        self._released = 0
+        self._held_back = 0  # 因前序段未返回而被暂存过的结果数
+        self._skipped = 0  # 等待超时被跳过的队头段数
+        self._late = 0  # 被跳过后才返回、补发的段数
+        self._hold_ms: deque = deque(maxlen=HEDGE_WINDOW)
+
+    def submit(
+        self,
+        session_id: str,
+        seqs: List[int],
+        future: concurrent.futures.Future,
+        build_messages: Callable[[Optional[dict]], List[Optional[dict]]],
+    ):
+        """登记一个请求；合并上传时一个请求对应多个连续段号，build_messages 按 seqs 顺序返回各段消息"""
+        with self._lock:
+            queue = self._queues.setdefault(session_id, _ReorderQueue())
+            if queue.next_seq is None:
+                queue.next_seq = seqs[0]
+            self._submitted += 1
+            self._in_flight += 1
+            self._max_in_flight = max(self._max_in_flight, self._in_flight)
+
+        def _done(fut: concurrent.futures.Future):
+            try:
+                result = fut.result()
+            except BaseException as exc:  # 事件循环关闭导致的取消等
+                sys.stderr.write(f"[SF Worker] Segment #{seqs} ({session_id}) aborted: {exc!r}\n")
+                sys.stderr.flush()
+                result = None
+            try:
+                messages = build_messages(result)
+            except Exception as exc:
+                sys.stderr.write(f"[SF Worker] Failed to build result for segment #{seqs}: {exc}\n")
+                sys.stderr.flush()
+                messages = [None] * len(seqs)
+            self._complete(queue, seqs, messages)
+
+        future.add_done_callback(_done)
+
+    def _complete(self, queue: _ReorderQueue, seqs: List[int], messages: List[Optional[dict]]):
+        now = time.time()
+        with self._lock:
+            self._in_flight -= 1
+            if self.ordered:
+                ready = []
+                for seq, message in zip(seqs, messages):
+                    if seq in queue.skipped:
+                        # 队头等待超时后才返回：后续段已发布，直接补发
+                        queue.skipped.discard(seq)
+                        self._late += 1
+                        ready.append({**message, "late": True} if message is not None else None)
+                    else:
+                        queue.pending[seq] = (message, now)
+                ready.extend(self._pop_ready(queue, now, seqs))
+                self._arm_hold_timer(queue, now)
+            else:
+                ready = list(messages)
+            self._publish(ready)
+            if self._in_flight == 0:
+                self._idle.notify_all()
+
+    def _pop_ready(self, queue: _ReorderQueue, now: float, seqs: List[int]) -> List[Optional[dict]]:
+        ready = []
+        while queue.next_seq in queue.pending:
+            msg, t_done = queue.pending.pop(queue.next_seq)
+            if queue.next_seq not in seqs:
+                self._held_back += 1
+                self._hold_ms.append((now - t_done) * 1000.0)
+            ready.append(msg)
+            queue.next_seq += 1
+        return ready
+
+    def _publish(self, ready: List[Optional[dict]]):
+        # 持锁发送，保证多个线程触发的完成回调不会打乱同一会话的发布顺序
+        for msg in ready:
+            self._released += 1
+            if msg is not None:
+                send_ipc_message(msg)
+
+    def _arm_hold_timer(self, queue: _ReorderQueue, now: float):
+        """有结果在等待队头时，按最早暂存的结果设置超时定时器（持锁调用）"""
+        if not queue.pending or queue.timer is not None:
+            return
+        oldest = min(t_done for _, t_done in queue.pending.values())
+        queue.timer = threading.Timer(max(0.0, oldest + self.max_hold_sec - now), self._on_hold_timeout, (queue,))
+        queue.timer.daemon = True
+        queue.timer.start()
+
+    def _on_hold_timeout(self, queue: _ReorderQueue):
+        now = time.time()
+        with self._lock:
+            queue.timer = None
+            if not queue.pending:
+                return
+            oldest = min(t_done for _, t_done in queue.pending.values())
+            ready = []
+            if now - oldest >= self.max_hold_sec - 0.01:
+                head = min(queue.pending)
+                skipped = list(range(queue.next_seq, head))
+                sys.stderr.write(
+                    f"[SF Worker] Segment(s) #{skipped} still pending after {(now - oldest) * 1000:.0f}ms hold, "
+                    f"releasing later results\n"
+                )
+                sys.stderr.flush()
+                queue.skipped.update(skipped)
+                self._skipped += len(skipped)
+                queue.next_seq = head
+                ready = self._pop_ready(queue, now, [])
+            self._arm_hold_timer(queue, now)
+            self._publish(ready)
+
+    def reset(self, session_id: str):
+        """会话重置后段号从 1 重新开始；旧队列仍由在途回调持有，照常按序发布剩余结果"""
+        with self._lock:
+            self._queues.pop(session_id, None)
+
+    def drain(self, timeout: float) -> bool:
+        """等待所有在途段落完成（退出前调用）"""
+        with self._lock:
+            return self._idle.wait_for(lambda: self._in_flight == 0, timeout=timeout)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            hold = list(self._hold_ms)
+            return {
+                "ordered": self.ordered,
+                "in_flight": self._in_flight,
+                "max_in_flight": self._max_in_flight,
+                "submitted": self._submitted,
+                "released": self._released,
+                "waiting_reorder": sum(len(q.pending) for q in self._queues.values()),
+                "held_back": self._held_back,
+                "skipped_heads": self._skipped,
+                "late": self._late,
+                "hold_ms": {"p50": round_ms(percentile(hold, 0.5)), "p99": round_ms(percentile(hold, 0.99))},
+            }
+
+
+@dataclass
+class PendingSegment:
+    pcm: np.ndarray
+    seq: int
+    request_id: str
+    trigger: str
+    queued_at: float = field(default_factory=time.time)
+
+    @property
+    def duration(self) -> float:
+        return len(self.pcm) / float(SAMPLE_RATE)
+
+
+def split_coalesced_text(text: str, parts: int) -> Optional[List[str]]:
+    """按句末标点把合并请求的文本切回各段；切出的片段数与段数不一致时返回 None"""
+    pieces = [p.strip() for p in COALESCE_SPLIT_RE.split(text) if p and p.strip()]
+    return pieces if len(pieces) == parts else None
+
+
+class SegmentCoalescer:
+    """
+    短段合并器
+
+    - 每个会话最多持有一组待合并段落；组内段号连续，所有提交都经过本类，保证段号按序进入流水线
+    - 触发发送：出现不短于 COALESCE_MIN_SEC 的段 / final、force_commit / 组内首段等待超过
+      COALESCE_MAX_WAIT_MS / 再加一段会超过 COALESCE_MAX_SEC
+    - submit_group 在持锁状态下调用（主线程或定时器线程）
+    """
+
+    def __init__(self, submit_group: Callable[[str, List[PendingSegment]], None]):
+        self.enabled = COALESCE_MIN_SEC > 0 and COALESCE_MAX_WAIT_MS > 0
+        self._submit_group = submit_group
+        self._lock = threading.Lock()
+        self._groups: Dict[str, List[PendingSegment]] = {}
+        self._timers: Dict[str, threading.Timer] = {}
+        self._stats = {"segments": 0, "held": 0, "requests": 0, "merged_requests": 0, "split_ok": 0, "split_fallback": 0}
+        self._wait_ms: deque = deque(maxlen=HEDGE_WINDOW)
+
+    @staticmethod
+    def group_duration(group: List[PendingSegment]) -> float:
+        if not group:
+            return 0.0
+        return sum(seg.duration for seg in group) + (len(group) - 1) * COALESCE_GAP_MS / 1000.0
+
+    def add(self, session_id: str, seg: PendingSegment):
+        with self._lock:
+            self._stats["segments"] += 1
+            group = self._groups.get(session_id)
+            if group and self.group_duration(group) + COALESCE_GAP_MS / 1000.0 + seg.duration > COALESCE_MAX_SEC:
+                self._flush_locked(session_id)
+                group = None
+            if group is None:
+                group = self._groups[session_id] = []
+            group.append(seg)
+
+            short = self.enabled and seg.duration < COALESCE_MIN_SEC
+            if not short or seg.trigger in ("final", "force_commit"):
+                self._flush_locked(session_id)
+                return
+
+            self._stats["held"] += 1
+            if session_id not in self._timers:
+                timer = threading.Timer(COALESCE_MAX_WAIT_MS / 1000.0, self._on_timeout)
+                timer.args = (session_id, timer)
+                timer.daemon = True
+                self._timers[session_id] = timer
+                timer.start()
+
+    def _on_timeout(self, session_id: str, timer: threading.Timer):
+        with self._lock:
+            # 定时器触发前该组可能已被其他条件发送，此时忽略
+            if self._timers.get(session_id) is timer:
+                self._flush_locked(session_id)
+
+    def flush(self, session_id: Optional[str] = None):
+        """立即发送指定会话（None = 全部会话）的待合并段落"""
+        with self._lock:
+            for sid in [session_id] if session_id is not None else list(self._groups):
+                self._flush_locked(sid)
+
+    def _flush_locked(self, session_id: str):
+        timer = self._timers.pop(session_id, None)
+        if timer is not None:
+            timer.cancel()
+        group = self._groups.pop(session_id, None)
+        if not group:
+            return
+        now = time.time()
+        self._stats["requests"] += 1
+        if len(group) > 1:
+            self._stats["merged_requests"] += 1
+        self._wait_ms.extend((now - seg.queued_at) * 1000.0 for seg in group if seg.duration < COALESCE_MIN_SEC)
+        self._submit_group(session_id, group)
+
+    def record_split(self, ok: bool):
+        with self._lock:
+            self._stats["split_ok" if ok else "split_fallback"] += 1
+
+    def snapshot(self, audio_sec: float) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            waits = list(self._wait_ms)
+            pending = sum(len(g) for g in self._groups.values())
+        saved = stats["segments"] - stats["requests"] - pending
+        return {
+            "enabled": self.enabled,
+            "min_sec": COALESCE_MIN_SEC,
+            "max_wait_ms": COALESCE_MAX_WAIT_MS,
+            **stats,
+            "requests_saved": saved,
+            "requests_saved_per_min": round(saved / (audio_sec / 60.0), 2) if audio_sec > 0 else None,
+            "wait_ms": {"p50": round_ms(percentile(waits, 0.5)), "max": round_ms(max(waits) if waits else None)},
+        }
+
+
 @dataclass
 class SessionState:
     audio_buffer: List[np.ndarray] = field(default_factory=list)
@@ -146,17 +826,59 @@ class SessionState:
 class SiliconFlowWorker:
     def __init__(self):
         self.sessions: Dict[str, SessionState] = {}
-        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=8)
         self.vad_model = None
         self._vad_device_info = {"device": "cpu", "device_id": -1, "provider": "CPUExecutionProvider", "providers": []}
+        self.client = SiliconFlowClient()
+        self.hedge_policy = HedgePolicy()
+        self.breaker = CircuitBreaker(
+            "[SF Worker]",
+            BREAKER_WINDOW_SEC,
+            BREAKER_MIN_SAMPLES,
+            BREAKER_ERROR_RATE,
+            BREAKER_LATENCY_MS,
+            BREAKER_CONSECUTIVE_FAILURES,
+            BREAKER_PROBE_SEC,
+        )
+        self.rate_limiter = TokenBucket(RATE_LIMIT_RPS, RATE_LIMIT_BURST)
+        self.fallback = LocalFallbackWorker(FALLBACK_SCRIPT, "pass2", "[SF Worker]") if LOCAL_FALLBACK else None
+        self._failovers: Dict[str, int] = {}
+        self._probe_task: Optional[asyncio.Future] = None
+        self.encoder = resolve_upload_encoder(UPLOAD_FORMAT)
+        self._upload_stats = {"segments": 0, "audio_sec": 0.0, "raw_bytes": 0, "upload_bytes": 0, "encode_ms": 0.0}
+        self._upload_lock = threading.Lock()
+        self._vad_lock = threading.Lock()  # 实时 VAD 与长文件离线 VAD 共用同一个模型
+        self.pipeline = CommitPipeline(ORDERED_RESULTS)
+        self.coalescer = SegmentCoalescer(self._submit_group)
+        # 摄入延迟：桥接层打时间戳 -> Worker 开始处理该块；以及单块处理耗时（VAD + 断句）
+        self._ingest_lag_ms: deque = deque(maxlen=INGEST_STATS_WINDOW)
+        self._ingest_handle_ms: deque = deque(maxlen=INGEST_STATS_WINDOW)
+        self._ingest_chunks = 0
+        self._ingest_audio_sec = 0.0
 
         # 加载轻量级 VAD 模型
         if USE_FUNASR_VAD:
             self._load_vad_model()
         
-        sys.stderr.write(f"[SF Worker] Parallel Redundant Mode\n")
+        sys.stderr.write(f"[SF Worker] Hedged Request Mode\n")
         sys.stderr.write(f"[SF Worker] - Model: {MODEL_NAME}\n")
-        sys.stderr.write(f"[SF Worker] - Parallel requests: {PARALLEL_REQUESTS}\n")
+        sys.stderr.write(
+            f"[SF Worker] - Hedging: mode={HEDGE_MODE}, max_in_flight={PARALLEL_REQUESTS}, "
+            f"percentile={HEDGE_PERCENTILE}, max_per_minute={HEDGE_MAX_PER_MINUTE}\n"
+        )
+        sys.stderr.write(f"[SF Worker] - Upload format: {self.encoder.name}\n")
+        sys.stderr.write(
+            f"[SF Worker] - Circuit breaker: error_rate>={BREAKER_ERROR_RATE} or p90>={BREAKER_LATENCY_MS:.0f}ms "
+            f"over {BREAKER_WINDOW_SEC:.0f}s, local fallback={'on' if self.fallback else 'off'}, "
+            f"rate_limit={RATE_LIMIT_RPS}/s\n"
+        )
+        if self.coalescer.enabled:
+            sys.stderr.write(
+                f"[SF Worker] - Coalescing: segments < {COALESCE_MIN_SEC}s wait up to {COALESCE_MAX_WAIT_MS:.0f}ms\n"
+            )
+        sys.stderr.write(
+            f"[SF Worker] - HTTP pool: http2={self.client.http2}, max_connections={POOL_MAX_CONNECTIONS}, "
+            f"keepalive_interval={KEEPALIVE_INTERVAL}s\n"
+        )
         if self.vad_model:
             sys.stderr.write(
                 "[SF Worker] - VAD: FunASR FSMN-VAD"
@@ -253,6 +975,8 @@ class SiliconFlowWorker:
                 model_dir=vad_model_id,
                 quantize=True,
                 device_id=int(self._vad_device_info.get("device_id", -1)),
+                # 桥接层分配了线程预算时按预算，否则沿用 funasr_onnx 默认的 4 线程
+                intra_op_num_threads=CPU_THREADS if CPU_THREADS > 0 else 4,
             )
             sys.stderr.write("[SF Worker] VAD model loaded successfully!\n")
             sys.stderr.flush()
@@ -261,16 +985,18 @@ class SiliconFlowWorker:
             sys.stderr.flush()
             self.vad_model = None
 
-    def _is_speech(self, chunk_f32: np.ndarray) -> bool:
+    def _is_speech(self, chunk: np.ndarray) -> bool:
         """VAD 检测：优先用 FunASR 模型，回退到简单 RMS"""
-        if chunk_f32.size == 0:
+        if chunk.size == 0:
             return False
+        chunk_f32 = chunk.astype(np.float32)
         
         if self.vad_model:
             try:
                 # FunASR VAD 实际上接受 float32 格式（范围在 -32768 到 32768）
                 # 输入的 chunk_f32 已经是正确格式了，直接传入
-                segments = self.vad_model(chunk_f32)
+                with self._vad_lock:
+                    segments = self.vad_model(chunk_f32)
                 return len(segments) > 0
             except Exception as e:
                 sys.stderr.write(f"[SF Worker] VAD error: {e}, using RMS fallback\n")
@@ -281,13 +1007,84 @@ class SiliconFlowWorker:
         threshold = 300 / 32768.0
         return rms >= threshold
 
+    def get_metrics(self) -> dict:
+        return {
+            "engine": "siliconflow",
+            "sessions": len(self.sessions),
+            "hedging": self.hedge_policy.snapshot(),
+            "upload": self._upload_snapshot(),
+            "pipeline": self.pipeline.snapshot(),
+            "ingest": self._ingest_snapshot(),
+            "coalescing": self.coalescer.snapshot(self._ingest_audio_sec),
+            "breaker": self.breaker.snapshot(),
+            "rate_limit": self.rate_limiter.snapshot(),
+            "fallback": {
+                **(self.fallback.snapshot() if self.fallback else {"state": "disabled"}),
+                "failovers": dict(self._failovers),
+            },
+        }
+
+    def _ingest_snapshot(self) -> dict:
+        lag = list(self._ingest_lag_ms)
+        handle = list(self._ingest_handle_ms)
+        return {
+            "chunks": self._ingest_chunks,
+            "lag_ms": {
+                "p50": round_ms(percentile(lag, 0.5)),
+                "p99": round_ms(percentile(lag, 0.99)),
+                "max": round_ms(max(lag) if lag else None),
+            },
+            "handle_ms": {
+                "p50": round_ms(percentile(handle, 0.5)),
+                "p99": round_ms(percentile(handle, 0.99)),
+            },
+        }
+
+    def _upload_snapshot(self) -> dict:
+        with self._upload_lock:
+            stats = dict(self._upload_stats)
+        segments = stats["segments"]
+        return {
+            "format": self.encoder.name,
+            "segments": segments,
+            "upload_kbytes": round(stats["upload_bytes"] / 1024.0, 1),
+            "compression_ratio": round(stats["raw_bytes"] / stats["upload_bytes"], 3) if stats["upload_bytes"] else None,
+            "upload_kbps_of_audio": round(stats["upload_bytes"] * 8 / 1000.0 / stats["audio_sec"], 1) if stats["audio_sec"] else None,
+            "encode_ms_avg": round(stats["encode_ms"] / segments, 2) if segments else None,
+        }
+
+    def _encode_upload(self, pcm: np.ndarray, sample_rate: int, encoder: UploadEncoder) -> bytes:
+        t0 = time.perf_counter()
+        payload = encoder.encode(pcm, sample_rate)
+        encode_ms = (time.perf_counter() - t0) * 1000.0
+        with self._upload_lock:
+            self._upload_stats["segments"] += 1
+            self._upload_stats["audio_sec"] += len(pcm) / float(sample_rate)
+            self._upload_stats["raw_bytes"] += len(pcm) * 2
+            self._upload_stats["upload_bytes"] += len(payload)
+            self._upload_stats["encode_ms"] += encode_ms
+        return payload
+
+    def _demote_encoder(self, exc: Exception) -> bool:
+        """服务端拒绝压缩格式（400/415）时回退 wav，返回是否发生了回退"""
+        status = getattr(getattr(exc, "response", None), "status_code", None)
+        if self.encoder.name == "wav" or status not in (400, 415):
+            return False
+        sys.stderr.write(f"[SF Worker] API rejected upload format '{self.encoder.name}' (HTTP {status}), switching to wav\n")
+        sys.stderr.flush()
+        self.encoder = UPLOAD_ENCODERS["wav"]
+        return True
+
     def _get_state(self, session_id: str) -> SessionState:
         if session_id not in self.sessions:
             self.sessions[session_id] = SessionState()
         return self.sessions[session_id]
 
     def reset_session(self, session_id: str):
+        # 已断句的短段仍要发出去，再丢弃会话状态
+        self.coalescer.flush(session_id)
         self.sessions.pop(session_id, None)
+        self.pipeline.reset(session_id)
         sys.stderr.write(f"[SF Worker] Session reset: {session_id}\n")
         sys.stderr.flush()
 
@@ -297,10 +1094,22 @@ class SiliconFlowWorker:
             return
         state = self.sessions.get(session_id)
         if not state or not state.audio_buffer:
+            # 没有未断句的音频，但可能还有等待合并的短段：客户端要求提交，不再等合并定时器
+            self.coalescer.flush(session_id)
             return
         self._commit_segment(state, data.get("request_id", "default"), session_id, "force_commit")
 
     def handle_streaming_chunk(self, data: dict):
+        t_start = time.time()
+        if "timestamp" in data:
+            self._ingest_lag_ms.append(max(0.0, t_start * 1000.0 - float(data["timestamp"])))
+        try:
+            self._handle_streaming_chunk(data)
+        finally:
+            self._ingest_chunks += 1
+            self._ingest_handle_ms.append((time.time() - t_start) * 1000.0)
+
+    def _handle_streaming_chunk(self, data: dict):
         session_id = data.get("session_id") or data.get("request_id") or "default"
         request_id = data.get("request_id", "default")
         audio_b64 = data.get("audio_data")
@@ -317,6 +1126,7 @@ class SiliconFlowWorker:
         chunk = decode_audio_chunk(audio_b64)
         if chunk.size == 0:
             return
+        self._ingest_audio_sec += chunk.size / float(SAMPLE_RATE)
 
         # VAD 检测
         has_voice = self._is_speech(chunk)
@@ -346,7 +1156,26 @@ class SiliconFlowWorker:
             trigger = "final" if is_final else ("max_buffer" if buffered_sec >= MAX_BUFFER_SEC else "silence")
             self._commit_segment(state, request_id, session_id, trigger)
 
+    def handle_streaming_segment(self, data: dict):
+        """
+        外部已断好的整句音频（hybrid 引擎下由本地 FunASR Pass 1 的 VAD 切分）：
+        跳过本 Worker 的 VAD，直接进入合并 / 对冲 / 有序发布流程
+        """
+        session_id = data.get("session_id") or data.get("request_id") or "default"
+        audio_b64 = data.get("audio_data")
+        if not audio_b64:
+            return
+        segment = decode_audio_chunk(audio_b64)
+        if segment.size == 0:
+            return
+        self._ingest_chunks += 1
+        self._ingest_audio_sec += segment.size / float(SAMPLE_RATE)
+        state = self._get_state(session_id)
+        state.audio_buffer.append(segment)
+        self._commit_segment(state, data.get("request_id", "default"), session_id, data.get("trigger") or "segment")
+
     def handle_batch_file(self, data: dict):
+        """长文件转写：在后台线程读文件并规划分块，不阻塞实时音频的读取"""
         request_id = data.get("request_id", "unknown")
         audio_path = data.get("audio_path")
         
@@ -354,6 +1183,11 @@ class SiliconFlowWorker:
             send_ipc_message({"request_id": request_id, "status": "error", "error": f"File not found: {audio_path}"})
             return
 
+        threading.Thread(
+            target=self._run_batch_file, args=(request_id, audio_path), name="sf-batch", daemon=True
+        ).start()
+
+    def _run_batch_file(self, request_id: str, audio_path: str):
         try:
             with wave.open(audio_path, "rb") as wf:
                 if wf.getsampwidth() != 2:
@@ -364,11 +1198,16 @@ class SiliconFlowWorker:
             
             audio = np.frombuffer(raw, dtype=np.int16)
             if ch > 1:
-                audio = audio.reshape(-1, ch)[:, 0]
-            audio_f32 = audio.astype(np.float32)
-            
-            # 批量文件使用单请求即可
-            self._parallel_transcribe_and_send(audio_f32, sr, request_id, "batch_file", None, None)
+                audio = np.ascontiguousarray(audio.reshape(-1, ch)[:, 0])
+
+            speech = self._vad_speech_segments(audio, sr)
+            chunks = plan_batch_chunks(audio, sr, BATCH_CHUNK_SEC, speech)
+            sys.stderr.write(
+                f"[SF Worker] 📁 Batch {request_id}: {len(audio) / float(sr):.1f}s -> {len(chunks)} chunks "
+                f"(vad={'fsmn' if speech is not None else 'energy'}, concurrency={BATCH_CONCURRENCY})\n"
+            )
+            sys.stderr.flush()
+            self.client.submit(self._transcribe_batch(audio, sr, chunks, request_id)).result()
         except Exception as exc:
             send_ipc_message({
                 "request_id": request_id,
@@ -377,8 +1216,113 @@ class SiliconFlowWorker:
                 "traceback": traceback.format_exc()
             })
 
+    def _vad_speech_segments(self, audio: np.ndarray, sample_rate: int) -> Optional[List[Tuple[int, int]]]:
+        """
+        用 FSMN-VAD 离线检测语音区间（采样点），按窗口分批推理，避免长文件一次性占用大量内存；
+        VAD 不可用或出错时返回 None，由调用方回退到能量切分
+        """
+        if not self.vad_model or sample_rate != SAMPLE_RATE:
+            return None
+        window = int(BATCH_VAD_WINDOW_SEC * sample_rate)
+        merge_gap = int(0.05 * sample_rate)
+        segments: List[Tuple[int, int]] = []
+        try:
+            for offset in range(0, len(audio), window):
+                part = audio[offset:offset + window]
+                with self._vad_lock:
+                    out = self.vad_model(part.astype(np.float32))
+                # funasr_onnx 返回 [[[start_ms, end_ms], ...]]（按输入条数嵌套），end=-1 表示持续到结尾
+                while out and isinstance(out[0], (list, tuple)) and out[0] and isinstance(out[0][0], (list, tuple)):
+                    out = out[0]
+                for pair in out or []:
+                    if not isinstance(pair, (list, tuple)) or len(pair) != 2:
+                        continue
+                    start = offset + int(pair[0] * sample_rate / 1000)
+                    end = offset + (len(part) if pair[1] < 0 else int(pair[1] * sample_rate / 1000))
+                    # 窗口边界会把一段语音切成两段，首尾相接时合并回去
+                    if segments and start - segments[-1][1] <= merge_gap:
+                        segments[-1] = (segments[-1][0], max(segments[-1][1], end))
+                    else:
+                        segments.append((start, end))
+        except Exception as exc:
+            sys.stderr.write(f"[SF Worker] Batch VAD failed: {exc}, fallback to energy cut points\n")
+            sys.stderr.flush()
+            return None
+        return segments
+
+    async def _transcribe_batch(
+        self, audio: np.ndarray, sample_rate: int, chunks: List[Tuple[int, int]], request_id: str
+    ):
+        """分块并发上传（受 BATCH_CONCURRENCY 限制，失败重试），每块返回即推送 batch_segment，最后按序拼接"""
+        semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+        texts: List[Optional[str]] = [None] * len(chunks)
+        t0 = time.time()
+
+        async def run_chunk(index: int, start: int, end: int):
+            async with semaphore:
+                result = None
+                attempts = 0
+                for attempts in range(1, BATCH_RETRIES + 2):
+                    result = await self._transcribe(audio[start:end], sample_rate, hedge=False)
+                    if result is not None:
+                        break
+                    if attempts <= BATCH_RETRIES:
+                        await asyncio.sleep(min(4.0, 0.5 * 2 ** (attempts - 1)))
+            message = {
+                "request_id": request_id,
+                "session_id": request_id,
+                "type": "batch_segment",
+                "index": index,
+                "total": len(chunks),
+                "start_ms": int(start * 1000 / sample_rate),
+                "end_ms": int(end * 1000 / sample_rate),
+                "attempts": attempts,
+                "engine": "siliconflow",
+            }
+            if result is None:
+                message.update({"status": "error", "error": f"Chunk failed after {attempts} attempts"})
+            else:
+                texts[index] = result["text"]
+                message.update({"status": "success", "text": result["text"], "latency_ms": int(result["latency"] * 1000)})
+                if result.get("source") == "local":
+                    message["fallback"] = "funasr"
+            send_ipc_message(message)
+
+        await asyncio.gather(*(run_chunk(i, start, end) for i, (start, end) in enumerate(chunks)))
+
+        failed = [i for i, text in enumerate(texts) if text is None]
+        latency_ms = int((time.time() - t0) * 1000)
+        sys.stderr.write(
+            f"[SF Worker] 📁 Batch {request_id} done in {latency_ms}ms ({len(chunks) - len(failed)}/{len(chunks)} chunks ok)\n"
+        )
+        sys.stderr.flush()
+        if chunks and len(failed) == len(chunks):
+            send_ipc_message({
+                "request_id": request_id,
+                "status": "error",
+                "error": "All batch chunks failed",
+                "engine": "siliconflow",
+            })
+            return
+
+        send_ipc_message({
+            "request_id": request_id,
+            "session_id": request_id,
+            "type": "sentence_complete",
+            "text": join_chunk_texts([text for text in texts if text]),
+            "timestamp": int(time.time() * 1000),
+            "is_final": True,
+            "status": "success",
+            "language": "zh",
+            "trigger": "batch_file",
+            "latency_ms": latency_ms,
+            "engine": "siliconflow",
+            "chunks": len(chunks),
+            "failed_chunks": failed,
+        })
+
     def _commit_segment(self, state: SessionState, request_id: str, session_id: str, trigger: str):
-        """提交音频段"""
+        """提交音频段：交给后台流水线后立即返回，主循环继续读取音频"""
         merged = np.concatenate(state.audio_buffer)
         sr = SAMPLE_RATE
         state.reset()
@@ -389,128 +1333,299 @@ class SiliconFlowWorker:
         sys.stderr.write(f"[SF Worker] 📤 Committing segment #{seg_seq} ({duration_sec:.1f}s, trigger={trigger})\n")
         sys.stderr.flush()
         
-        # 并行冗余请求
-        self._parallel_transcribe_and_send(merged, sr, request_id, trigger, session_id, seg_seq)
+        self.coalescer.add(session_id, PendingSegment(merged, seg_seq, request_id, trigger))
+
+    def _submit_group(self, session_id: str, group: List[PendingSegment]):
+        """把一组连续段落交给流水线：单段直接上传，多段插入静音后合并为一次上传"""
+        if len(group) == 1:
+            seg = group[0]
+            future = self.client.submit(self._transcribe(seg.pcm, SAMPLE_RATE))
+            self.pipeline.submit(
+                session_id,
+                [seg.seq],
+                future,
+                lambda result: [self._result_message(result, seg.request_id, seg.trigger, session_id, seg.seq)],
+            )
+            return
 
-    def _parallel_transcribe_and_send(
-        self,
-        audio_f32: np.ndarray,
-        sample_rate: int,
-        request_id: str,
-        trigger: str,
-        session_id: Optional[str],
-        seg_seq: Optional[int],
-    ):
-        """并行发送多个冗余请求，取最快返回的结果"""
-        import requests
-        
+        gap = np.zeros(int(SAMPLE_RATE * COALESCE_GAP_MS / 1000.0), dtype=np.int16)
+        pieces: List[np.ndarray] = []
+        for i, seg in enumerate(group):
+            if i:
+                pieces.append(gap)
+            pieces.append(seg.pcm)
+        merged = np.concatenate(pieces)
+        sys.stderr.write(
+            f"[SF Worker] 🔗 Coalescing segments #{group[0].seq}-#{group[-1].seq} "
+            f"into one request ({len(merged) / float(SAMPLE_RATE):.1f}s)\n"
+        )
+        sys.stderr.flush()
+        future = self.client.submit(self._transcribe(merged, SAMPLE_RATE))
+        self.pipeline.submit(
+            session_id,
+            [seg.seq for seg in group],
+            future,
+            lambda result: self._coalesced_messages(result, group, session_id),
+        )
+
+    def _coalesced_messages(
+        self, result: Optional[dict], group: List[PendingSegment], session_id: str
+    ) -> List[Optional[dict]]:
+        """合并请求的结果：能按段切分时逐段发布，否则在首段位置发布整段文本（附 segment_seqs）"""
+        seqs = [seg.seq for seg in group]
+        messages: List[Optional[dict]] = [None] * len(group)
+        parts = split_coalesced_text(result["text"], len(group)) if result else None
+        if parts is not None:
+            self.coalescer.record_split(True)
+            for i, (seg, text) in enumerate(zip(group, parts)):
+                message = self._result_message(dict(result, text=text), seg.request_id, seg.trigger, session_id, seg.seq)
+                message["coalesced"] = len(group)
+                messages[i] = message
+            return messages
+
+        last = group[-1]
+        message = self._result_message(result, last.request_id, last.trigger, session_id, seqs[0])
+        if message is not None:
+            if result is not None:
+                self.coalescer.record_split(False)
+            message["segment_seqs"] = seqs
+            message["coalesced"] = len(group)
+        messages[0] = message
+        return messages
+
+    async def _transcribe(self, pcm: np.ndarray, sample_rate: int, hedge: bool = True) -> Optional[dict]:
+        """
+        识别一段音频，返回 {"text", "replica_id", "latency", "source"}；全部失败或超时返回 None
+
+        - hedge=False 时只发单个请求，且不计入对冲统计和熔断的延迟窗口（长文件分块的时长分布与实时段落不同）
+        - 熔断打开、限流等不到令牌、云端失败或单段等待超过 FAILOVER_AFTER_MS 时改用本地兜底
+        """
         t0 = time.time()
-        wav_bytes = pcm_to_wav_bytes(audio_f32, sample_rate)
-        
-        def single_request(replica_id: int):
-            """单个 API 请求"""
+        if not self.breaker.allow():
+            if self.fallback and self.fallback.available:
+                return await self._fallback_or_none(pcm, sample_rate, "circuit_open", t0)
+            hedge = False  # 没有可用的本地兜底：仍尝试云端，但不再对冲放大流量
+
+        max_wait = RATE_LIMIT_MAX_WAIT_MS / 1000.0 if self.fallback else REQUEST_TIMEOUT
+        if not await self.rate_limiter.acquire(max_wait):
+            return await self._fallback_or_none(pcm, sample_rate, "rate_limited", t0)
+
+        deadline = t0 + REQUEST_TIMEOUT + 5
+        failover_at = t0 + FAILOVER_AFTER_MS / 1000.0 if (self.fallback and hedge) else None
+        task = asyncio.ensure_future(self._hedged_request(pcm, sample_rate, hedge))
+        result = None
+        reason = None
+        try:
+            while True:
+                done, _ = await asyncio.wait({task}, timeout=0.25)
+                if done:
+                    result = task.result()
+                    reason = None if result is not None else "cloud_error"
+                    break
+                now = time.time()
+                if now >= deadline:
+                    reason = "timeout"
+                elif self.fallback and self.fallback.available and not self.breaker.allow():
+                    reason = "circuit_open"  # 其它段触发了熔断，不再等这一段
+                elif failover_at is not None and now >= failover_at:
+                    reason = "slow"
+                if reason:
+                    sys.stderr.write(f"[SF Worker] Abandoning cloud request after {(now - t0) * 1000:.0f}ms ({reason})\n")
+                    sys.stderr.flush()
+                    break
+        except Exception as exc:
+            sys.stderr.write(f"[SF Worker] Hedged request failed: {exc}\n")
+            sys.stderr.flush()
+            reason = "cloud_error"
+        finally:
+            if not task.done():
+                task.cancel()
+
+        # 长文件分块（hedge=False）只计成败不计延迟：整块音频的耗时远高于实时段落，会误触 p90 延迟熔断
+        latency_ms = (time.time() - t0) * 1000 if (result is not None and hedge) else None
+        if self.breaker.record(result is not None, latency_ms):
+            self._on_breaker_open()
+        if result is not None:
+            if not self.breaker.allow():
+                self.breaker.probe_result(True)  # 熔断期间（无兜底时）仍发往云端的请求成功，视为探测成功
+            result["latency"] = time.time() - t0
+            result["source"] = "cloud"
+            return result
+        return await self._fallback_or_none(pcm, sample_rate, reason, t0)
+
+    async def _fallback_or_none(self, pcm: np.ndarray, sample_rate: int, reason: str, t0: float) -> Optional[dict]:
+        self._failovers[reason] = self._failovers.get(reason, 0) + 1
+        if not self.fallback or not self.fallback.available:
+            return None
+        try:
+            reply = await asyncio.wait_for(
+                asyncio.wrap_future(self.fallback.request({
+                    "type": "transcribe_segment",
+                    "audio_data": base64.b64encode(pcm.astype(np.int16).tobytes()).decode("ascii"),
+                    "sample_rate": sample_rate,
+                })),
+                timeout=FALLBACK_TIMEOUT,
+            )
+        except Exception as exc:
+            sys.stderr.write(f"[SF Worker] Local fallback failed ({reason}): {exc}\n")
+            sys.stderr.flush()
+            return None
+        if reply.get("status") != "success":
+            sys.stderr.write(f"[SF Worker] Local fallback error ({reason}): {reply.get('error')}\n")
+            sys.stderr.flush()
+            return None
+        sys.stderr.write(f"[SF Worker]   ✓ Local fallback ({reason}) in {reply.get('latency_ms')}ms\n")
+        sys.stderr.flush()
+        return {
+            "text": (reply.get("text") or "").strip(),
+            "replica_id": None,
+            "source": "local",
+            "fallback_reason": reason,
+            "latency": time.time() - t0,
+        }
+
+    def _on_breaker_open(self):
+        """熔断打开：预先拉起本地兜底（模型加载需要时间），并启动后台探测"""
+        if self.fallback:
+            self.fallback.ensure_started()
+        if self._probe_task is None or self._probe_task.done():
+            self._probe_task = asyncio.ensure_future(self._probe_loop())
+
+    async def _probe_loop(self):
+        """熔断期间按退避间隔用一小段静音探测云端，成功即恢复"""
+        probe_pcm = np.zeros(int(SAMPLE_RATE * 0.5), dtype=np.int16)
+        while not self.breaker.allow():
+            await asyncio.sleep(self.breaker.seconds_until_probe())
+            ok = False
+            try:
+                payload = self._encode_upload(probe_pcm, SAMPLE_RATE, self.encoder)
+                await asyncio.wait_for(
+                    self.client.transcribe(payload, self.encoder.filename, self.encoder.mime),
+                    timeout=REQUEST_TIMEOUT,
+                )
+                ok = True
+            except Exception as exc:
+                sys.stderr.write(f"[SF Worker] Probe failed: {exc}\n")
+                sys.stderr.flush()
+            self.breaker.probe_result(ok)
+
+    async def _hedged_request(self, pcm: np.ndarray, sample_rate: int, hedge: bool = True) -> Optional[dict]:
+        """对冲发送请求：先发 1 个，超过动态延迟阈值仍未返回才补发备份，取最先成功的结果"""
+        policy = self.hedge_policy
+        encoded: Dict[str, bytes] = {}
+
+        def upload_payload():
+            # 同一段音频的多个副本共享编码结果；编码器回退后按新格式重新编码
+            encoder = self.encoder
+            if encoder.name not in encoded:
+                encoded[encoder.name] = self._encode_upload(pcm, sample_rate, encoder)
+            return encoded[encoder.name], encoder
+
+        upload_payload()
+
+        async def single_request(replica_id: int):
+            """单个 API 请求（复用连接池）"""
+            t_start = time.time()
             try:
-                files = {"file": ("chunk.wav", wav_bytes, "audio/wav")}
-                data = {"model": MODEL_NAME}
-                headers = {"Authorization": f"Bearer {API_KEY}"} if API_KEY else {}
-                
                 sys.stderr.write(f"[SF Worker]   - Request #{replica_id} started\n")
                 sys.stderr.flush()
                 
-                resp = requests.post(
-                    API_URL,
-                    headers=headers,
-                    data=data,
-                    files=files,
-                    timeout=(3, REQUEST_TIMEOUT),
-                )
-                resp.raise_for_status()
-                
-                j = resp.json()
+                payload, encoder = upload_payload()
+                try:
+                    j = await self.client.transcribe(payload, encoder.filename, encoder.mime)
+                except Exception as exc:
+                    if not self._demote_encoder(exc):
+                        raise
+                    payload, encoder = upload_payload()
+                    j = await self.client.transcribe(payload, encoder.filename, encoder.mime)
                 text = (j.get("text") or "").strip()
-                latency = time.time() - t0
+                latency = time.time() - t_start
+                if hedge:
+                    policy.record_latency(latency)
                 
                 sys.stderr.write(f"[SF Worker]   ✓ Request #{replica_id} returned in {latency:.2f}s: \"{text[:30]}...\"\n")
                 sys.stderr.flush()
                 
-                return {"text": text, "replica_id": replica_id, "latency": latency}
+                return {"text": text, "replica_id": replica_id}
+            except asyncio.CancelledError:
+                sys.stderr.write(f"[SF Worker]   ⊘ Request #{replica_id} aborted\n")
+                sys.stderr.flush()
+                raise
             except Exception as exc:
                 sys.stderr.write(f"[SF Worker]   ✗ Request #{replica_id} failed: {exc}\n")
                 sys.stderr.flush()
                 raise
 
-        # 并行发送 N 个请求
-        futures = []
-        for i in range(PARALLEL_REQUESTS):
-            future = self.executor.submit(single_request, i)
-            futures.append(future)
-        
-        # 等待第一个完成的请求（Race）
-        result = None
+        max_in_flight = PARALLEL_REQUESTS if hedge else 1
+        in_flight = {asyncio.ensure_future(single_request(0))}
+        launched = 1
+        hedged = False
+        can_hedge = max_in_flight > 1
+        delay = policy.hedge_delay()
         try:
-            done, pending = concurrent.futures.wait(
-                futures,
-                timeout=REQUEST_TIMEOUT + 5,
-                return_when=concurrent.futures.FIRST_COMPLETED
-            )
-            
-            # 取第一个成功的结果
-            for future in done:
-                try:
-                    result = future.result()
-                    break
-                except Exception:
-                    continue
-            
-            # 取消其他未完成的请求
-            for future in pending:
-                future.cancel()
-                
-        except Exception as exc:
-            sys.stderr.write(f"[SF Worker] Parallel request failed: {exc}\n")
-            sys.stderr.flush()
-
+            while in_flight:
+                timeout = delay if (can_hedge and launched < max_in_flight) else None
+                done, in_flight = await asyncio.wait(
+                    in_flight, timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if task.exception() is None:
+                        res = task.result()
+                        if hedge:
+                            policy.record_segment(hedged, hedged and res["replica_id"] > 0, ok=True)
+                        return res
+                if not done or not in_flight:
+                    # 超时未返回 -> 对冲；全部失败 -> 立即补发（仍受在途上限约束）
+                    if launched < max_in_flight and (done or policy.try_acquire_hedge()):
+                        if not done:
+                            hedged = True
+                            sys.stderr.write(f"[SF Worker]   ↻ Hedging after {delay * 1000:.0f}ms\n")
+                            sys.stderr.flush()
+                        in_flight.add(asyncio.ensure_future(single_request(launched)))
+                        launched += 1
+                    elif not done:
+                        can_hedge = False
+            if hedge:
+                policy.record_segment(hedged, False, ok=False)
+            return None
+        finally:
+            # 真正中断输掉的在途请求（取消协程会关闭对应连接上的流）
+            for task in in_flight:
+                task.cancel()
+
+    def _result_message(
+        self,
+        result: Optional[dict],
+        request_id: str,
+        trigger: str,
+        session_id: str,
+        seg_seq: int,
+    ) -> Optional[dict]:
+        """把识别结果转换为 IPC 消息；streaming 空文本返回 None（不发布，但仍占用顺序位）"""
         # 如果所有请求都失败
         if result is None:
-            send_ipc_message({
+            message = {
                 "request_id": request_id,
-                "session_id": session_id or request_id,
+                "session_id": session_id,
                 "status": "error",
-                "error": "All parallel requests failed",
+                "error": "All hedged requests failed",
                 "trigger": trigger,
                 "engine": "siliconflow",
-            })
-            return
+                "segment_seq": seg_seq,
+            }
+            return message
 
         # 处理成功的结果
         text = result["text"]
         latency_ms = int(result["latency"] * 1000)
         now_ms = int(time.time() * 1000)
 
-        # batch_file：直接返回
-        if session_id is None:
-            send_ipc_message({
-                "request_id": request_id,
-                "session_id": request_id,
-                "type": "sentence_complete",
-                "text": text,
-                "timestamp": now_ms,
-                "is_final": True,
-                "status": "success",
-                "language": "zh",
-                "trigger": trigger,
-                "latency_ms": latency_ms,
-                "engine": "siliconflow",
-                "replica_id": result["replica_id"],
-            })
-            return
-
         # streaming：每段独立返回（不再累积）
         # 这样避免了重复保存问题，由前端/Node.js端决定如何处理多段文本
         if not text:
-            return
+            return None
 
-        send_ipc_message({
+        message = {
             "request_id": request_id,
             "session_id": session_id,
             "type": "sentence_complete",
@@ -524,14 +1639,19 @@ class SiliconFlowWorker:
             "engine": "siliconflow",
             "segment_seq": seg_seq,
             "replica_id": result["replica_id"],
-        })
+        }
+        if result.get("source") == "local":
+            message["fallback"] = "funasr"
+            message["fallback_reason"] = result.get("fallback_reason")
+        return message
 
 
 def main():
     try:
         worker = SiliconFlowWorker()
+        worker.client.warmup()
         send_ipc_message({"status": "ready"})
-        sys.stderr.write("[SF Worker] READY - Parallel Redundant Mode Enabled\n")
+        sys.stderr.write("[SF Worker] READY - Hedged Request Mode Enabled\n")
         sys.stderr.flush()
 
         while True:
@@ -551,6 +1671,15 @@ def main():
                 worker.handle_force_commit(data)
             elif req_type == "streaming_chunk":
                 worker.handle_streaming_chunk(data)
+            elif req_type == "streaming_segment":
+                worker.handle_streaming_segment(data)
+            elif req_type == "get_metrics":
+                send_ipc_message({
+                    "request_id": data.get("request_id", "unknown"),
+                    "type": "metrics",
+                    "status": "success",
+                    "metrics": worker.get_metrics(),
+                })
             elif req_type == "batch_file" or "audio_path" in data:
                 worker.handle_batch_file(data)
             else:
@@ -559,6 +1688,15 @@ def main():
                     "status": "error",
                     "error": f"Unknown request type: {req_type}"
                 })
+
+        # stdin 关闭：发出待合并的短段，等在途段落发布完再关闭连接池
+        worker.coalescer.flush()
+        if not worker.pipeline.drain(timeout=REQUEST_TIMEOUT + 10):
+            sys.stderr.write("[SF Worker] Exiting with segments still in flight\n")
+            sys.stderr.flush()
+        worker.client.close()
+        if worker.fallback:
+            worker.fallback.close()
                 
     except Exception as exc:
         sys.stderr.write(f"[SF Worker] Fatal: {exc}\n")
@@ -0,0 +1,353 @@
+# coding: utf-8
+"""
+云端 ASR Worker 共用的容错组件（SiliconFlow / 百度）
+
+- CircuitBreaker：按滚动窗口错误率 / p90 延迟 / 连续失败熔断，后台探测恢复
+- TokenBucket：请求 / 建连限流
+- LocalFallbackWorker：熔断或云端失败时的本地 FunASR 兜底子进程
+
+与 Worker 脚本放在同一目录，由 Worker 直接 import；只依赖标准库
+"""
+
+import asyncio
+import concurrent.futures
+import json
+import os
+import queue
+import subprocess
+import sys
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, List, Optional
+
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    """最近邻分位数（q 取 0~1）"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, max(0, int(round(q * (len(ordered) - 1)))))
+    return ordered[idx]
+
+
+def round_ms(value: Optional[float]) -> Optional[float]:
+    return round(value, 1) if value is not None else None
+
+
+class CircuitBreaker:
+    """
+    熔断器
+
+    - 滚动窗口内样本数足够且错误率 / p90 延迟超限，或连续失败达到阈值时打开
+    - 打开期间 allow() 返回 False，调用方直接走兜底；由后台探测（probe_result）成功后关闭
+    - 探测失败、或探测通过后未出现真实成功就再次熔断时，间隔指数退避（上限 probe_max_sec）
+    """
+
+    def __init__(
+        self,
+        name: str,
+        window_sec: float,
+        min_samples: int,
+        error_rate: float,
+        latency_ms: float,
+        consecutive_failures: int,
+        probe_sec: float,
+        probe_max_sec: float = 120.0,
+    ):
+        self.name = name
+        self.window_sec = window_sec
+        self.min_samples = min_samples
+        self.error_rate = error_rate
+        self.latency_ms = latency_ms
+        self.consecutive_failures = consecutive_failures
+        self.probe_sec = probe_sec
+        self.probe_max_sec = probe_max_sec
+        self.state = "closed"
+        self.trips = 0
+        self.last_reason: Optional[str] = None
+        self._events: deque = deque()  # (time, ok, latency_ms)
+        self._consecutive = 0
+        self._opened_at = 0.0
+        self._next_probe = 0.0
+        self._backoff = probe_sec
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        return self.state != "open"
+
+    def _trim(self, now: float):
+        while self._events and now - self._events[0][0] > self.window_sec:
+            self._events.popleft()
+
+    def record(self, ok: bool, latency_ms: Optional[float] = None) -> bool:
+        """记录一次调用结果，返回本次是否触发熔断"""
+        now = time.time()
+        with self._lock:
+            self._events.append((now, ok, latency_ms))
+            self._trim(now)
+            if self.state == "open":
+                # 熔断前已在途的请求结果不改变状态
+                return False
+            self._consecutive = 0 if ok else self._consecutive + 1
+            if ok:
+                self._backoff = self.probe_sec  # 恢复后出现真实成功才重置退避
+            reason = self._trip_reason()
+            if reason is None:
+                return False
+            self.state = "open"
+            self.trips += 1
+            self.last_reason = reason
+            self._opened_at = now
+            delay = self._schedule_probe(now)
+        sys.stderr.write(f"{self.name} ⚡ Circuit OPEN ({reason}), next probe in {delay:.0f}s\n")
+        sys.stderr.flush()
+        return True
+
+    def _trip_reason(self) -> Optional[str]:
+        if self.consecutive_failures and self._consecutive >= self.consecutive_failures:
+            return f"{self._consecutive} consecutive failures"
+        if len(self._events) < self.min_samples:
+            return None
+        errors = sum(1 for _, ok, _ in self._events if not ok)
+        if errors / len(self._events) >= self.error_rate:
+            return f"error rate {errors}/{len(self._events)}"
+        latencies = [lat for _, _, lat in self._events if lat is not None]
+        p90 = percentile(latencies, 0.9)
+        if p90 is not None and len(latencies) >= self.min_samples and p90 >= self.latency_ms:
+            return f"p90 latency {p90:.0f}ms"
+        return None
+
+    def _schedule_probe(self, now: float) -> float:
+        delay = self._backoff
+        self._next_probe = now + delay
+        self._backoff = min(self._backoff * 2, self.probe_max_sec)
+        return delay
+
+    def seconds_until_probe(self) -> float:
+        return max(0.0, self._next_probe - time.time())
+
+    def probe_result(self, ok: bool):
+        now = time.time()
+        with self._lock:
+            if self.state != "open":
+                return
+            if ok:
+                self.state = "closed"
+                self._events.clear()
+                self._consecutive = 0
+            else:
+                delay = self._schedule_probe(now)
+        if ok:
+            sys.stderr.write(f"{self.name} ✓ Circuit CLOSED (probe ok after {now - self._opened_at:.0f}s)\n")
+        else:
+            sys.stderr.write(f"{self.name} Probe failed, next probe in {delay:.0f}s\n")
+        sys.stderr.flush()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            self._trim(time.time())
+            events = list(self._events)
+        latencies = [lat for _, _, lat in events if lat is not None]
+        return {
+            "state": self.state,
+            "trips": self.trips,
+            "last_reason": self.last_reason,
+            "window_samples": len(events),
+            "window_error_rate": round(sum(1 for _, ok, _ in events if not ok) / len(events), 3) if events else None,
+            "window_p90_ms": round_ms(percentile(latencies, 0.9)),
+            "next_probe_in_sec": round(self.seconds_until_probe(), 1) if self.state == "open" else None,
+        }
+
+
+class TokenBucket:
+    """令牌桶限流（rate<=0 表示不限）"""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.capacity = max(1.0, burst)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self.acquired = 0
+        self.rejected = 0
+
+    def _take(self) -> float:
+        """尝试取一个令牌：成功返回 0，否则返回还需等待的秒数"""
+        if self.rate <= 0:
+            self.acquired += 1
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1.0:
+                self._tokens -= 1.0
+                self.acquired += 1
+                return 0.0
+            return (1.0 - self._tokens) / self.rate
+
+    def try_acquire(self) -> bool:
+        if self._take() == 0.0:
+            return True
+        self.rejected += 1
+        return False
+
+    async def acquire(self, max_wait: float) -> bool:
+        deadline = time.monotonic() + max_wait
+        while True:
+            wait = self._take()
+            if wait == 0.0:
+                return True
+            if time.monotonic() + wait > deadline:
+                self.rejected += 1
+                return False
+            await asyncio.sleep(wait)
+
+    def snapshot(self) -> dict:
+        return {"rate": self.rate, "burst": self.capacity, "acquired": self.acquired, "rejected": self.rejected}
+
+
+class LocalFallbackWorker:
+    """
+    本地 FunASR 兜底子进程（script 为 asr_funasr_worker.py 的路径；首次需要时才启动，模型加载期间的请求排队等待）
+
+    - request()：带 request_id 的请求/响应，返回 concurrent.futures.Future
+    - send()：单向转发；子进程输出中不属于 request() 的消息交给 on_message
+    - 写入由独立线程完成，子进程加载模型期间 stdin 写满也不会阻塞调用方
+    """
+
+    def __init__(
+        self, script: str, role: str, log_prefix: str, on_message: Optional[Callable[[dict], None]] = None
+    ):
+        self.script = script
+        self.role = role
+        self.log_prefix = log_prefix
+        self.on_message = on_message
+        self.process: Optional[subprocess.Popen] = None
+        self.ready = threading.Event()
+        self.failed: Optional[str] = None
+        self.requests = 0
+        self._started_at = 0.0
+        self._ready_sec: Optional[float] = None
+        self._lock = threading.Lock()
+        self._pending: Dict[str, concurrent.futures.Future] = {}
+        self._outbox: "queue.Queue[Optional[bytes]]" = queue.Queue(maxsize=2000)
+
+    @property
+    def available(self) -> bool:
+        return self.failed is None
+
+    def ensure_started(self):
+        with self._lock:
+            if self.process is not None or self.failed:
+                return
+            env = dict(os.environ, FUNASR_WORKER_ROLE=self.role)
+            sys.stderr.write(f"{self.log_prefix} Starting local FunASR fallback (role={self.role})...\n")
+            sys.stderr.flush()
+            try:
+                # 打包环境下 sys.executable 是 asr-backend，传入 .py 路径即可由其启动脚本
+                self.process = subprocess.Popen(
+                    [sys.executable, self.script], stdin=subprocess.PIPE, stdout=subprocess.PIPE, env=env
+                )
+            except Exception as exc:
+                self.failed = f"spawn failed: {exc}"
+                sys.stderr.write(f"{self.log_prefix} Local fallback unavailable: {self.failed}\n")
+                sys.stderr.flush()
+                return
+            self._started_at = time.time()
+            threading.Thread(target=self._read_loop, name="funasr-fallback-reader", daemon=True).start()
+            threading.Thread(target=self._write_loop, name="funasr-fallback-writer", daemon=True).start()
+
+    def _write_loop(self):
+        while True:
+            line = self._outbox.get()
+            if line is None:
+                break
+            try:
+                self.process.stdin.write(line)
+                self.process.stdin.flush()
+            except Exception:
+                break
+
+    def _read_loop(self):
+        for raw in self.process.stdout:
+            try:
+                msg = json.loads(raw.decode("utf-8", errors="ignore"))
+            except ValueError:
+                continue
+            status = msg.get("status")
+            if status == "ready":
+                self._ready_sec = time.time() - self._started_at
+                sys.stderr.write(f"{self.log_prefix} Local fallback ready in {self._ready_sec:.1f}s\n")
+                sys.stderr.flush()
+                self.ready.set()
+                continue
+            if status == "fatal":
+                self.failed = msg.get("error") or "fatal"
+                continue
+            with self._lock:
+                fut = self._pending.pop(msg.get("request_id"), None)
+            if fut is not None:
+                if not fut.done():
+                    fut.set_result(msg)
+            elif self.on_message is not None:
+                self.on_message(msg)
+        code = self.process.wait()
+        self.failed = self.failed or f"exited with code {code}"
+        sys.stderr.write(f"{self.log_prefix} Local fallback stopped: {self.failed}\n")
+        sys.stderr.flush()
+        self.ready.set()
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        for fut in pending.values():
+            if not fut.done():
+                fut.set_exception(RuntimeError(self.failed))
+
+    def send(self, payload: dict) -> bool:
+        self.ensure_started()
+        if self.failed:
+            return False
+        try:
+            self._outbox.put_nowait((json.dumps(payload, ensure_ascii=False) + "\n").encode("utf-8"))
+            return True
+        except queue.Full:
+            return False
+
+    def request(self, payload: dict) -> concurrent.futures.Future:
+        fut: concurrent.futures.Future = concurrent.futures.Future()
+        request_id = f"fb-{time.time_ns()}"
+        with self._lock:
+            self._pending[request_id] = fut
+        self.requests += 1
+        if not self.send({**payload, "request_id": request_id}):
+            with self._lock:
+                self._pending.pop(request_id, None)
+            fut.set_exception(RuntimeError(self.failed or "fallback queue full"))
+        return fut
+
+    def close(self):
+        if self.process is None:
+            return
+        self._outbox.put(None)
+        try:
+            self.process.terminate()
+            self.process.wait(timeout=5)
+        except Exception:
+            pass
+
+    def snapshot(self) -> dict:
+        if self.failed:
+            state = "failed"
+        elif self.process is None:
+            state = "idle"
+        else:
+            state = "ready" if self.ready.is_set() else "starting"
+        return {
+            "role": self.role,
+            "state": state,
+            "pid": self.process.pid if self.process else None,
+            "requests": self.requests,
+            "ready_sec": round(self._ready_sec, 1) if self._ready_sec is not None else None,
+            "error": self.failed,
+        }
@@ -0,0 +1,34 @@
+# coding: utf-8
+"""
+Worker 的 CPU 线程预算（由桥接层 ThreadBudget 通过环境变量下发）
+
+- ASR_CPU_THREADS：分配给本 Worker 的线程数，0 表示未分配
+- ASR_CPU_AFFINITY：绑定的 CPU 集合（如 "0,1" 或 "4-7"）
+
+Worker 必须在导入 numpy / onnxruntime 之前调用 apply_cpu_affinity()：
+Linux 上亲和性按线程生效，只有之后创建的 BLAS / ORT 线程才会继承
+"""
+
+import os
+import sys
+from typing import List, Optional
+
+CPU_THREADS = int(os.environ.get("ASR_CPU_THREADS", "0") or 0)
+
+
+def apply_cpu_affinity(log_prefix: str) -> Optional[List[int]]:
+    """按 ASR_CPU_AFFINITY 绑定当前进程，返回实际绑定的 CPU 列表；未设置或不支持时返回 None"""
+    spec = os.environ.get("ASR_CPU_AFFINITY", "").strip()
+    if not spec or not hasattr(os, "sched_setaffinity"):
+        return None
+    try:
+        cpus = set()
+        for part in spec.split(","):
+            start, _, end = part.strip().partition("-")
+            cpus.update(range(int(start), int(end or start) + 1))
+        os.sched_setaffinity(0, cpus)
+    except (OSError, ValueError) as exc:
+        sys.stderr.write(f"{log_prefix} Failed to apply CPU affinity {spec!r}: {exc}\n")
+        sys.stderr.flush()
+        return None
+    return sorted(cpus)
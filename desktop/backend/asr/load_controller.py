@@ -0,0 +1,128 @@
+# coding: utf-8
+"""
+负载自适应质量阶梯（各本地 Worker 共用）
+
+滑动窗口内统计每个会话的实时率（处理耗时 / 收到的音频时长，求和即整机负载）和排队延迟。
+过载时沿阶梯降一档，负载回落后升一档；阶梯的每一档具体是什么（beam 大小、Pass 2 覆盖范围……）由 Worker 决定
+
+- ASR_LOAD_WINDOW_SEC：实时率与排队延迟的统计窗口
+- ASR_LOAD_HIGH_RTF / ASR_LOAD_LOW_RTF：降档 / 升档的整机实时率阈值（两者之间留出回差）
+- ASR_LOAD_MAX_LAG_MS：排队延迟 p90 超过即降一档
+- ASR_LOAD_HOLD_SEC：两次换档的最小间隔
+"""
+
+import os
+import sys
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+LOAD_WINDOW_SEC = float(os.environ.get("ASR_LOAD_WINDOW_SEC", "10"))
+LOAD_HIGH_RTF = float(os.environ.get("ASR_LOAD_HIGH_RTF", "0.8"))
+LOAD_LOW_RTF = float(os.environ.get("ASR_LOAD_LOW_RTF", "0.4"))
+LOAD_MAX_LAG_MS = float(os.environ.get("ASR_LOAD_MAX_LAG_MS", "1500"))
+LOAD_HOLD_SEC = float(os.environ.get("ASR_LOAD_HOLD_SEC", "10"))
+LOAD_MIN_SESSION_AUDIO_SEC = 1.0  # 窗口内音频太少的会话不计实时率（句尾 flush 会放大比值）
+
+
+class LoadController:
+    """
+    ladder 为各档取值（第 0 档质量最高），labels 为对应的显示名（日志与 metrics，默认 str(取值)）；
+    每次换档后至少保持 ASR_LOAD_HOLD_SEC，降档与升档阈值之间留出回差，避免来回抖动
+    """
+
+    def __init__(
+        self,
+        ladder: List[Any],
+        labels: Optional[List[str]] = None,
+        log_prefix: str = "[Worker]",
+        knob: str = "quality",
+    ):
+        self.ladder = ladder
+        self.labels = labels if labels is not None else [str(level) for level in ladder]
+        self.log_prefix = log_prefix
+        self.knob = knob  # 日志里被调节的对象
+        self.step = 0
+        self.changes = 0
+        self._events: Deque[Tuple[float, str, float, float]] = deque()  # (时间, 会话, 处理秒数, 音频秒数)
+        self._lags: Deque[Tuple[float, float]] = deque()  # (时间, 排队延迟 ms)
+        self._changed_at = time.time()
+        self._evaluated_at = 0.0
+
+    @property
+    def level(self):
+        return self.ladder[self.step]
+
+    def record(self, session_id: str, decode_sec: float = 0.0, audio_sec: float = 0.0):
+        self._events.append((time.time(), session_id, decode_sec, audio_sec))
+        self._adjust()
+
+    def record_lag(self, data: Dict):
+        """音频块在 stdin 里的排队延迟：处理时刻 - 发送端 timestamp"""
+        sent = data.get("timestamp")
+        if isinstance(sent, (int, float)):
+            self.record_lag_ms(time.time() * 1000 - sent)
+
+    def record_lag_ms(self, lag_ms: float):
+        if 0 <= lag_ms < 600000:  # 两端时钟不一致的异常值不计入
+            self._lags.append((time.time(), lag_ms))
+
+    def _trim(self, now: float):
+        horizon = now - LOAD_WINDOW_SEC
+        while self._events and self._events[0][0] < horizon:
+            self._events.popleft()
+        while self._lags and self._lags[0][0] < horizon:
+            self._lags.popleft()
+
+    def session_rtf(self) -> Dict[str, float]:
+        decode: Dict[str, float] = {}
+        audio: Dict[str, float] = {}
+        for _, session_id, decode_sec, audio_sec in self._events:
+            decode[session_id] = decode.get(session_id, 0.0) + decode_sec
+            audio[session_id] = audio.get(session_id, 0.0) + audio_sec
+        return {
+            session_id: decode[session_id] / audio[session_id]
+            for session_id in decode
+            if audio[session_id] >= LOAD_MIN_SESSION_AUDIO_SEC
+        }
+
+    def lag_ms(self) -> float:
+        lags = sorted(lag for _, lag in self._lags)
+        return lags[int(0.9 * (len(lags) - 1))] if lags else 0.0
+
+    def _adjust(self):
+        now = time.time()
+        if len(self.ladder) < 2 or now - self._changed_at < LOAD_HOLD_SEC or now - self._evaluated_at < 1.0:
+            return
+        self._evaluated_at = now
+        self._trim(now)
+        load = sum(self.session_rtf().values())
+        lag = self.lag_ms()
+        if (load > LOAD_HIGH_RTF or lag > LOAD_MAX_LAG_MS) and self.step < len(self.ladder) - 1:
+            self._move(1, load, lag)
+        elif load < LOAD_LOW_RTF and lag < LOAD_MAX_LAG_MS / 2 and self.step > 0:
+            self._move(-1, load, lag)
+
+    def _move(self, delta: int, load: float, lag: float):
+        previous = self.labels[self.step]
+        self.step += delta
+        self.changes += 1
+        self._changed_at = time.time()
+        sys.stderr.write(
+            f"{self.log_prefix} Load rtf={load:.2f} lag_p90={lag:.0f}ms, "
+            f"{self.knob} {previous} -> {self.labels[self.step]}\n"
+        )
+        sys.stderr.flush()
+
+    def snapshot(self) -> dict:
+        self._trim(time.time())
+        rtf = self.session_rtf()
+        return {
+            "quality_step": self.step,
+            "quality": self.labels[self.step],
+            "ladder": self.labels,
+            "load_rtf": round(sum(rtf.values()), 3),
+            "session_rtf": {session_id: round(value, 3) for session_id, value in rtf.items()},
+            "lag_ms_p90": round(self.lag_ms(), 1),
+            "quality_changes": self.changes,
+        }
@@ -0,0 +1,18 @@
+# coding: utf-8
+"""
+合成浊音片段：带基频起伏（谐波叠加）和停顿包络，外加少量噪声。
+比纯正弦更接近真实语音的特征与压缩率，用于 Worker 预热；固定随机种子，结果可复现
+"""
+
+import numpy as np
+
+
+def synth_voiced_clip(seconds: float, sample_rate: int, pause_hz: float = 0.3, pause_threshold: float = -0.3) -> np.ndarray:
+    """-1~1 的 float32 片段；包络 sin(2π·pause_hz·t) 低于 pause_threshold 的部分为停顿"""
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    f0 = 160 + 40 * np.sin(2 * np.pi * 0.7 * t)
+    phase = 2 * np.pi * np.cumsum(f0) / sample_rate
+    voiced = sum(np.sin(k * phase) / k for k in range(1, 8))
+    envelope = (np.sin(2 * np.pi * pause_hz * t) > pause_threshold).astype(np.float32)
+    noise = np.random.default_rng(0).normal(0, 0.004, t.size)
+    return (voiced * envelope * 0.2 + noise).astype(np.float32)
@@ -2,15 +2,17 @@ import asyncio
 import base64
 import json
 import os
+import signal
+import socket
 import sys
 import tempfile
 from pathlib import Path
-from typing import Dict, Optional
+from typing import Awaitable, Callable, Dict, List, Optional, Union
 from uuid import uuid4
 import time
 
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect, UploadFile, File, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 import uvicorn
 from starlette.websockets import WebSocketState
 
@@ -32,7 +34,30 @@ DEFAULT_ENGINE = os.environ.get("ASR_ENGINE", "funasr").lower()
 DEFAULT_MODEL = os.environ.get("ASR_MODEL", "funasr-paraformer")
 
 # 支持的引擎列表
-SUPPORTED_ENGINES = {"funasr", "siliconflow", "baidu"}
+# hybrid：本地 FunASR Pass 1 出 partial + SiliconFlow 出终稿（见 HybridWorkerBridge）
+SUPPORTED_ENGINES = {"funasr", "siliconflow", "baidu", "hybrid"}
+
+# zygote 模式（仅 Linux + funasr 引擎）：一个模板进程加载好模型，Worker 由它 fork 出来，
+# 新增 / 崩溃后重启的 Worker 不必重新启动解释器和加载模型（见 ZygoteServer）
+ZYGOTE_REQUESTED = os.environ.get("ASR_ZYGOTE", "0").lower() in ("1", "true", "yes")
+ZYGOTE_SUPPORTED = sys.platform.startswith("linux") and hasattr(socket, "send_fds")
+ZYGOTE_FORK_TIMEOUT = float(os.environ.get("ASR_ZYGOTE_FORK_TIMEOUT", "10"))
+
+# CPU 线程预算（见 ThreadBudget）：ASR_THREAD_BUDGET 为总线程数（默认本进程可用的 CPU 数，0/off 关闭），
+# ASR_CPU_PINNING=1 时再给每个 Worker 绑定互不重叠的 CPU 集合
+THREAD_BUDGET_ENV = os.environ.get("ASR_THREAD_BUDGET", "").strip().lower()
+CPU_PINNING = os.environ.get("ASR_CPU_PINNING", "0").lower() in ("1", "true", "yes")
+# 各引擎分配线程的权重：本地 FunASR 全部推理在本机；云端引擎只跑 VAD（熔断时才拉起本地兜底）
+ENGINE_THREAD_WEIGHTS = {"funasr": 1.0, "siliconflow": 0.5, "baidu": 0.5}
+# 传给 Worker 的线程环境变量：ASR_CPU_THREADS 给 ORT 会话，其余给 numpy 背后的 BLAS / OpenMP
+THREAD_ENV_KEYS = ("ASR_CPU_THREADS", "OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS")
+
+# Worker stdout 单行上限：会话快照、segment_audio 带整句音频，远超 asyncio 默认的 64KB
+IPC_LINE_LIMIT = 64 * 1024 * 1024
+# 会话迁移（滚动重启）中单个 export / import 请求的超时
+MIGRATION_TIMEOUT = float(os.environ.get("ASR_MIGRATION_TIMEOUT", "10"))
+# 桥接层内部使用的 Worker 回复，不转发给 WebSocket 客户端
+INTERNAL_MESSAGE_TYPES = {"session_snapshot", "session_imported"}
 
 
 def _print_debug_info():
@@ -99,20 +124,405 @@ def is_packaged() -> bool:
     return hasattr(sys, "_MEIPASS")
 
 
+def available_cpus() -> List[int]:
+    """本进程允许使用的 CPU（Linux 上尊重 taskset / cgroup 的亲和性限制）"""
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+class ThreadBudget:
+    """
+    桥接层统一管理的 CPU 线程预算：每个 WorkerBridge 按引擎权重登记，总线程数按权重分给各 Worker
+    （最大余数法，每个至少 1 个），通过环境变量下发线程数、按需下发 CPU 亲和性，
+    避免每个进程各自按核数开线程导致多 Worker / 多引擎时严重超额订阅。
+    分配在 Worker 启动时读取，之后登记的成员只影响随后启动（或重启）的 Worker
+    """
+
+    def __init__(self, total: int, cpus: List[int], pinning: bool):
+        self.total = max(1, total)
+        self.cpus = cpus
+        self.pinning = pinning and hasattr(os, "sched_setaffinity")
+        self.members: Dict[str, float] = {}
+
+    @classmethod
+    def from_env(cls) -> Optional["ThreadBudget"]:
+        if THREAD_BUDGET_ENV in ("0", "off", "false", "no"):
+            return None
+        cpus = available_cpus()
+        total = int(THREAD_BUDGET_ENV) if THREAD_BUDGET_ENV.isdigit() else len(cpus)
+        return cls(total, cpus, CPU_PINNING)
+
+    def register(self, name: str, weight: float) -> str:
+        """登记一个 Worker，返回唯一的成员名"""
+        key, index = name, 2
+        while key in self.members:
+            key, index = f"{name}#{index}", index + 1
+        self.members[key] = max(0.01, weight)
+        return key
+
+    def unregister(self, key: str):
+        self.members.pop(key, None)
+
+    def _allocate(self) -> Dict[str, int]:
+        if not self.members:
+            return {}
+        weight_sum = sum(self.members.values())
+        spare = max(0, self.total - len(self.members))
+        # 每个成员保底 1 个线程，其余按权重分配，余数给小数部分最大的成员
+        shares = {key: spare * weight / weight_sum for key, weight in self.members.items()}
+        threads = {key: 1 + int(share) for key, share in shares.items()}
+        leftover = self.total - sum(threads.values())
+        for key in sorted(shares, key=lambda k: shares[k] - int(shares[k]), reverse=True)[:max(0, leftover)]:
+            threads[key] += 1
+        return threads
+
+    def assignments(self) -> Dict[str, dict]:
+        threads = self._allocate()
+        result: Dict[str, dict] = {}
+        offset = 0
+        for key, count in threads.items():
+            cpus = None
+            if self.pinning and self.cpus:
+                # 成员数超过 CPU 数时绕回开头（此时已超额订阅，describe() 会标出）
+                cpus = sorted({self.cpus[(offset + i) % len(self.cpus)] for i in range(count)})
+                offset += count
+            result[key] = {"threads": count, "cpus": cpus, "weight": self.members[key]}
+        return result
+
+    def assignment(self, key: str) -> dict:
+        return self.assignments().get(key) or {"threads": 1, "cpus": None}
+
+    def worker_env(self, key: str) -> Dict[str, str]:
+        """下发给 Worker 的环境变量；用户显式设置的同名环境变量优先"""
+        assignment = self.assignment(key)
+        env = {name: str(assignment["threads"]) for name in THREAD_ENV_KEYS}
+        if assignment["cpus"]:
+            env["ASR_CPU_AFFINITY"] = ",".join(str(cpu) for cpu in assignment["cpus"])
+        return {name: value for name, value in env.items() if name not in os.environ}
+
+    def describe(self) -> dict:
+        assignments = self.assignments()
+        assigned = sum(item["threads"] for item in assignments.values())
+        return {
+            "total_threads": self.total,
+            "available_cpus": len(self.cpus),
+            "pinning": self.pinning,
+            "assigned_threads": assigned,
+            "oversubscribed": assigned > len(self.cpus),
+            "workers": assignments,
+        }
+
+
+THREAD_BUDGET = ThreadBudget.from_env()
+
+
+def read_process_memory(pid: Optional[int]) -> Optional[dict]:
+    """
+    进程内存（MB），取自 /proc/<pid>/smaps_rollup（仅 Linux）：
+    pss 把共享页（mmap 的模型权重、zygote 写时复制页）按共享进程数均摊，各 Worker 的 pss 之和即实际占用；
+    private 是进程独占的部分，即新增一个 Worker 的边际成本
+    """
+    if not pid:
+        return None
+    fields: Dict[str, int] = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup", encoding="ascii", errors="ignore") as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) >= 3 and parts[2] == "kB":
+                    fields[parts[0].rstrip(":")] = int(parts[1])
+    except (OSError, ValueError):
+        return None
+
+    def mb(*keys: str) -> float:
+        return round(sum(fields.get(key, 0) for key in keys) / 1024, 1)
+
+    return {
+        "rss_mb": mb("Rss"),
+        "pss_mb": mb("Pss"),
+        "pss_file_mb": mb("Pss_File"),
+        "pss_anon_mb": mb("Pss_Anon"),
+        "shared_mb": mb("Shared_Clean", "Shared_Dirty"),
+        "private_mb": mb("Private_Clean", "Private_Dirty"),
+    }
+
+
+class ForkedWorkerProcess:
+    """
+    zygote fork 出的 Worker，提供 WorkerBridge 用到的 asyncio.subprocess.Process 接口
+    （pid / stdin / stdout / stderr / returncode / wait / terminate / kill）。
+    它不是本进程的子进程，退出码由 zygote 回收后通过控制 socket 报告
+    """
+
+    def __init__(
+        self,
+        pid: int,
+        exit_future: asyncio.Future,
+        stdin: asyncio.StreamWriter,
+        stdout: asyncio.StreamReader,
+        stderr: asyncio.StreamReader,
+        stderr_writer: asyncio.StreamWriter,
+    ):
+        self.pid = pid
+        self.stdin = stdin
+        self.stdout = stdout
+        self.stderr = stderr
+        # stderr socket 只读，保留 writer 引用以免 socket 被提前关闭
+        self._stderr_writer = stderr_writer
+        self._exit_future = exit_future
+
+    @property
+    def returncode(self) -> Optional[int]:
+        return self._exit_future.result() if self._exit_future.done() else None
+
+    async def wait(self) -> int:
+        return await asyncio.shield(self._exit_future)
+
+    def send_signal(self, sig: int):
+        # 已回收的 pid 可能被复用，退出后不再发信号
+        if self.returncode is not None:
+            raise ProcessLookupError(self.pid)
+        os.kill(self.pid, sig)
+
+    def terminate(self):
+        self.send_signal(signal.SIGTERM)
+
+    def kill(self):
+        self.send_signal(signal.SIGKILL)
+
+
+class ZygoteServer:
+    """
+    Worker 模板进程：以 FUNASR_ZYGOTE_FD 启动 worker 脚本，它导入依赖、加载并预热模型后不处理请求，
+    只在控制 socket（SOCK_SEQPACKET）上等待 fork 请求。每次 fork 传过去两个 socket 作为子进程的
+    stdin/IPC 和 stderr，子进程与模板写时复制共享模型权重，从请求到 ready 只需 fork + 重定向
+    """
+
+    def __init__(self, label: str):
+        self.label = label
+        self.process: Optional[asyncio.subprocess.Process] = None
+        self.control: Optional[socket.socket] = None
+        self.ready_event = asyncio.Event()
+        self.startup: Optional[dict] = None
+        self.forks = 0
+        self.pending_forks: Dict[str, asyncio.Future] = {}
+        self.exit_futures: Dict[int, asyncio.Future] = {}
+        self.tasks: List[asyncio.Task] = []
+
+    @property
+    def alive(self) -> bool:
+        return (
+            self.process is not None
+            and self.process.returncode is None
+            and self.control is not None
+            and self.ready_event.is_set()
+        )
+
+    async def start(self, cmd: List[str], env: Dict[str, str], timeout: float = 300):
+        control, child_end = socket.socketpair(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+        try:
+            self.process = await asyncio.create_subprocess_exec(
+                *cmd,
+                stdin=asyncio.subprocess.DEVNULL,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+                env={**env, "FUNASR_ZYGOTE_FD": str(child_end.fileno())},
+                pass_fds=(child_end.fileno(),),
+            )
+        finally:
+            child_end.close()
+        control.setblocking(False)
+        self.control = control
+        print(f"[Zygote:{self.label}] Template process spawned, pid={self.process.pid}", file=sys.stderr)
+        sys.stderr.flush()
+
+        self.tasks = [
+            asyncio.create_task(self._consume_output()),
+            asyncio.create_task(self._consume_stderr()),
+            asyncio.create_task(self._consume_control()),
+        ]
+        started = time.perf_counter()
+        exited = asyncio.create_task(self.process.wait())
+        ready = asyncio.create_task(self.ready_event.wait())
+        try:
+            done, _ = await asyncio.wait({exited, ready}, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            exited.cancel()
+            ready.cancel()
+        if not self.ready_event.is_set():
+            await self.stop()
+            raise RuntimeError(f"ASR zygote ({self.label}) did not become ready")
+        self.startup = {**(self.startup or {}), "spawn_to_ready_ms": round((time.perf_counter() - started) * 1000, 1)}
+        print(f"[Zygote:{self.label}] READY, startup={self.startup}", file=sys.stderr)
+        sys.stderr.flush()
+
+    async def _consume_output(self):
+        assert self.process and self.process.stdout
+        async for line in self.process.stdout:
+            try:
+                payload = json.loads(line.decode("utf-8", errors="ignore"))
+            except json.JSONDecodeError:
+                continue
+            if payload.get("status") == "ready":
+                self.startup = payload.get("startup") or {}
+                self.ready_event.set()
+            elif payload.get("status") == "fatal":
+                print(f"[Zygote:{self.label}] Fatal error: {payload.get('error')}", file=sys.stderr)
+                sys.stderr.flush()
+
+    async def _consume_stderr(self):
+        assert self.process and self.process.stderr
+        async for line in self.process.stderr:
+            sys.stderr.write(line.decode("utf-8", errors="ignore"))
+            sys.stderr.flush()
+
+    async def _consume_control(self):
+        loop = asyncio.get_running_loop()
+        while self.control is not None:
+            try:
+                data = await loop.sock_recv(self.control, 4096)
+            except (OSError, asyncio.CancelledError):
+                break
+            if not data:
+                break
+            try:
+                message = json.loads(data.decode("utf-8"))
+            except json.JSONDecodeError:
+                continue
+            kind = message.get("type")
+            if kind == "forked":
+                # 在这里登记退出 future：exited 可能紧跟 forked 到达，早于 fork() 的调用方恢复执行
+                pid = int(message["pid"])
+                self.exit_futures[pid] = loop.create_future()
+                fut = self.pending_forks.pop(message.get("token"), None)
+                if fut is not None and not fut.done():
+                    fut.set_result(pid)
+            elif kind == "exited":
+                fut = self.exit_futures.get(int(message["pid"]))
+                if fut is not None and not fut.done():
+                    fut.set_result(int(message.get("returncode", -1)))
+            elif kind == "error":
+                fut = self.pending_forks.pop(message.get("token"), None)
+                if fut is not None and not fut.done():
+                    fut.set_exception(RuntimeError(message.get("error") or "zygote fork failed"))
+
+        # 模板进程已退出：子进程的退出码再也收不到，按未知处理，避免 wait() 永远挂起
+        print(f"[Zygote:{self.label}] Control socket closed", file=sys.stderr)
+        sys.stderr.flush()
+        self.ready_event.clear()
+        for fut in self.pending_forks.values():
+            if not fut.done():
+                fut.set_exception(RuntimeError("ASR zygote exited"))
+        for fut in self.exit_futures.values():
+            if not fut.done():
+                fut.set_result(-1)
+        self.pending_forks.clear()
+        self.exit_futures.clear()
+
+    async def fork(self, cpus: Optional[List[int]] = None) -> ForkedWorkerProcess:
+        """cpus 不为空时子进程 fork 后先绑定到这些 CPU（模板进程自身的亲和性来自启动时的环境变量）"""
+        if not self.alive:
+            raise RuntimeError("ASR zygote is not running")
+        io_parent, io_child = socket.socketpair()
+        err_parent, err_child = socket.socketpair()
+        token = uuid4().hex
+        fut: asyncio.Future = asyncio.get_running_loop().create_future()
+        self.pending_forks[token] = fut
+        try:
+            socket.send_fds(
+                self.control,
+                [json.dumps({"type": "fork", "token": token, "cpus": cpus}).encode("utf-8")],
+                [io_child.fileno(), err_child.fileno()],
+            )
+            pid = await asyncio.wait_for(fut, timeout=ZYGOTE_FORK_TIMEOUT)
+        except BaseException:
+            io_parent.close()
+            err_parent.close()
+            raise
+        finally:
+            self.pending_forks.pop(token, None)
+            io_child.close()
+            err_child.close()
+
+        self.forks += 1
+        stdout, stdin = await asyncio.open_unix_connection(sock=io_parent, limit=IPC_LINE_LIMIT)
+        stderr, stderr_writer = await asyncio.open_unix_connection(sock=err_parent)
+        exit_future = self.exit_futures.get(pid) or asyncio.get_running_loop().create_future()
+        # 已退出的 Worker 不再需要登记
+        self.exit_futures = {p: f for p, f in self.exit_futures.items() if not f.done() or p == pid}
+        return ForkedWorkerProcess(pid, exit_future, stdin, stdout, stderr, stderr_writer)
+
+    async def stop(self):
+        # 关闭控制 socket，模板进程读到 EOF 后自行退出；已 fork 的 Worker 各自由 WorkerBridge 停止
+        if self.control is not None:
+            self.control.close()
+            self.control = None
+        if self.process and self.process.returncode is None:
+            try:
+                await asyncio.wait_for(self.process.wait(), timeout=5)
+            except asyncio.TimeoutError:
+                try:
+                    self.process.kill()
+                except ProcessLookupError:
+                    pass
+        for task in self.tasks:
+            task.cancel()
+        self.tasks = []
+        self.process = None
+        self.ready_event.clear()
+
+    def describe(self) -> dict:
+        return {
+            "pid": self.process.pid if self.process else None,
+            "alive": self.alive,
+            "forks": self.forks,
+            "live_workers": sum(1 for fut in self.exit_futures.values() if not fut.done()),
+            "startup": self.startup,
+            "memory": read_process_memory(self.process.pid if self.process else None),
+        }
+
+
 class WorkerBridge:
     """
     Thin bridge that keeps the existing stdin/stdout workers (asr_worker.py / asr_funasr_worker.py)
     and exposes them over WebSocket via FastAPI.
     """
 
-    def __init__(self, engine: str, model: str):
+    def __init__(
+        self,
+        engine: str,
+        model: str,
+        extra_env: Optional[Dict[str, str]] = None,
+        message_hook: Optional[Callable[[dict], Awaitable[bool]]] = None,
+    ):
         self.engine = engine
         self.model = model
+        # 额外的 worker 环境变量（如 FUNASR_WORKER_ROLE）
+        self.extra_env = extra_env or {}
+        # worker 输出的拦截器：返回 True 表示已处理，不再分发给 HTTP 请求 / WebSocket
+        self.message_hook = message_hook
         self.process: Optional[asyncio.subprocess.Process] = None
         self.stdout_task: Optional[asyncio.Task] = None
         self.ready_event = asyncio.Event()
         self.ws_clients: Dict[str, WebSocket] = {}
         self.pending_requests: Dict[str, asyncio.Future] = {}
+        # 长文件转写的中间结果（batch_segment），按 request_id 投递
+        self.progress_queues: Dict[str, asyncio.Queue] = {}
+        # 启动耗时：worker 在 ready 消息里报告的各阶段耗时 + 从拉起进程到 ready 的总耗时
+        self.spawned_at: Optional[float] = None
+        self.startup: Optional[dict] = None
+        # zygote 模式下的模板进程，Worker（包括退出后的重启）都由它 fork
+        self.zygote: Optional[ZygoteServer] = None
+        # 会话迁移：活跃会话（发过音频且未 reset）、迁移期间暂存的会话消息（None 表示未暂停）
+        self.active_sessions: set = set()
+        self.held_payloads: Optional[List[dict]] = None
+        self.restart_lock = asyncio.Lock()
+        # 在全局线程预算中的成员名；预算关闭时为 None
+        self.budget_key: Optional[str] = None
+        if THREAD_BUDGET is not None:
+            role = self.extra_env.get("FUNASR_WORKER_ROLE", "full") if engine == "funasr" else "cloud"
+            self.budget_key = THREAD_BUDGET.register(f"{engine}/{role}", ENGINE_THREAD_WEIGHTS.get(engine, 1.0))
 
     def _worker_script_path(self, packaged: bool) -> Path:
         """获取 worker 脚本路径（统一使用 Python 解释器启动，而非独立可执行文件）。"""
@@ -127,10 +537,35 @@ class WorkerBridge:
         # Fallback to generic worker
         return base_dir / "asr_worker.py"
 
+    def _use_zygote(self) -> bool:
+        if not ZYGOTE_REQUESTED or self.engine != "funasr":
+            return False
+        if not ZYGOTE_SUPPORTED:
+            print("[WorkerBridge] ASR_ZYGOTE requires Linux with socket.send_fds, spawning normally", file=sys.stderr)
+            return False
+        return True
+
     async def start(self):
         if self.process:
-            return
-
+            if not (self.stdout_task and self.stdout_task.done()):
+                return
+            # Worker 已退出（stdout 已关闭）：清理后重新拉起
+            print(f"[WorkerBridge] Worker pid={self.process.pid} has exited, restarting", file=sys.stderr)
+            sys.stderr.flush()
+            await self._stop_worker()
+
+        info = {"spawned_at": time.perf_counter()}
+        self.process = await self._spawn_process(info)
+        self.spawned_at = info["spawned_at"]
+        self.startup = None
+        self.stdout_task = asyncio.create_task(self._consume_output(self.process, self.ready_event, info))
+        asyncio.create_task(self._consume_stderr(self.process))
+
+    async def _spawn_process(self, info: dict):
+        """
+        拉起一个 Worker 进程（zygote 模式下从模板 fork）并返回，不修改当前 Worker；
+        info["spawned_at"] 更新为真正开始创建进程的时间（不含 zygote 自身的启动）
+        """
         print(f"[WorkerBridge] engine={self.engine}, model={self.model}", file=sys.stderr)
         print(f"[WorkerBridge] is_packaged={is_packaged()}", file=sys.stderr)
         
@@ -158,6 +593,11 @@ class WorkerBridge:
                 "MODELSCOPE_CACHE_HOME": os.environ.get("MODELSCOPE_CACHE") or "",
             }
         )
+        if self.budget_key is not None:
+            budget_env = THREAD_BUDGET.worker_env(self.budget_key)
+            print(f"[WorkerBridge] Thread budget for {self.budget_key}: {budget_env}", file=sys.stderr)
+            env.update(budget_env)
+        env.update(self.extra_env)
 
         if not worker_path.exists():
             parent = worker_path.parent
@@ -172,29 +612,45 @@ class WorkerBridge:
             sys.stderr.flush()
             raise FileNotFoundError(f"Worker script not found: {worker_path}")
 
-        print(f"[WorkerBridge] Spawning worker subprocess...", file=sys.stderr)
-        sys.stderr.flush()
-
-        self.process = await asyncio.create_subprocess_exec(
-            python_cmd,
-            str(worker_path),
-            stdin=asyncio.subprocess.PIPE,
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE,
-            env=env,
-        )
-
-        print(f"[WorkerBridge] Worker process spawned, pid={self.process.pid}", file=sys.stderr)
+        if self._use_zygote():
+            if self.zygote is None or not self.zygote.alive:
+                if self.zygote is not None:
+                    await self.zygote.stop()
+                self.zygote = ZygoteServer(f"{self.engine}/{self.extra_env.get('FUNASR_WORKER_ROLE', 'full')}")
+                await self.zygote.start([python_cmd, str(worker_path)], env)
+            print(f"[WorkerBridge] Forking worker from zygote pid={self.zygote.process.pid}...", file=sys.stderr)
+            sys.stderr.flush()
+            info["spawned_at"] = time.perf_counter()
+            assignment = THREAD_BUDGET.assignment(self.budget_key) if self.budget_key is not None else {}
+            process = await self.zygote.fork(cpus=assignment.get("cpus"))
+        else:
+            print(f"[WorkerBridge] Spawning worker subprocess...", file=sys.stderr)
+            sys.stderr.flush()
+            info["spawned_at"] = time.perf_counter()
+
+            process = await asyncio.create_subprocess_exec(
+                python_cmd,
+                str(worker_path),
+                stdin=asyncio.subprocess.PIPE,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+                env=env,
+                limit=IPC_LINE_LIMIT,
+            )
+
+        print(f"[WorkerBridge] Worker process spawned, pid={process.pid}", file=sys.stderr)
         sys.stderr.flush()
-
-        self.stdout_task = asyncio.create_task(self._consume_output())
-        asyncio.create_task(self._consume_stderr())
-
-    async def _consume_output(self):
-        assert self.process and self.process.stdout
+        return process
+
+    async def _consume_output(self, process, ready_event: asyncio.Event, info: dict):
+        """
+        读取一个 Worker 的输出并分发。滚动重启时新旧 Worker 各有一个读取任务，
+        回复按 request_id / session_id 分发，与来自哪个进程无关
+        """
+        assert process.stdout
         print(f"[WorkerBridge] _consume_output started, reading worker stdout...", file=sys.stderr)
         sys.stderr.flush()
-        async for line in self.process.stdout:
+        async for line in process.stdout:
             line = line.decode("utf-8", errors="ignore").strip()
             if not line:
                 continue
@@ -207,22 +663,36 @@ class WorkerBridge:
                 continue
 
             if payload.get("status") == "ready":
-                print(f"[WorkerBridge] Received READY signal from worker!", file=sys.stderr)
+                info["startup"] = {
+                    **(payload.get("startup") or {}),
+                    "spawn_to_ready_ms": round((time.perf_counter() - info["spawned_at"]) * 1000, 1),
+                }
+                if process is self.process:
+                    self.startup = info["startup"]
+                print(f"[WorkerBridge] Received READY signal from worker! startup={info['startup']}", file=sys.stderr)
                 sys.stderr.flush()
-                self.ready_event.set()
+                ready_event.set()
+                continue
+
+            if self.message_hook is not None and await self.message_hook(payload):
                 continue
 
             request_id = payload.get("request_id")
             session_id = payload.get("session_id")
 
+            # batch_segment 是中间结果，不能结束对应的 HTTP 请求
+            if request_id and payload.get("type") == "batch_segment":
+                queue = self.progress_queues.get(request_id)
+                if queue is not None:
+                    queue.put_nowait(payload)
             # Resolve pending HTTP requests
-            if request_id and request_id in self.pending_requests:
+            elif request_id and request_id in self.pending_requests:
                 fut = self.pending_requests.pop(request_id)
                 if not fut.done():
                     fut.set_result(payload)
 
             # Fan-out to websocket clients
-            if session_id and session_id in self.ws_clients:
+            if session_id and session_id in self.ws_clients and payload.get("type") not in INTERNAL_MESSAGE_TYPES:
                 ws = self.ws_clients[session_id]
                 try:
                     await ws.send_json(payload)
@@ -230,16 +700,17 @@ class WorkerBridge:
                     # websocket already closed
                     pass
         
-        # stdout 结束，说明进程已退出
+        # stdout 结束，说明进程已退出；当前 Worker 退出时清除 ready，下次 ensure_ready() 会重新拉起
         print(f"[WorkerBridge] Worker stdout closed (process exited)", file=sys.stderr)
-        if self.process:
-            print(f"[WorkerBridge] Process returncode={self.process.returncode}", file=sys.stderr)
+        print(f"[WorkerBridge] Process pid={process.pid} returncode={process.returncode}", file=sys.stderr)
         sys.stderr.flush()
+        if process is self.process:
+            self.ready_event.clear()
 
-    async def _consume_stderr(self):
-        if not self.process or not self.process.stderr:
+    async def _consume_stderr(self, process):
+        if not process.stderr:
             return
-        async for line in self.process.stderr:
+        async for line in process.stderr:
             sys.stderr.write(line.decode("utf-8", errors="ignore"))
             sys.stderr.flush()
 
@@ -262,20 +733,30 @@ class WorkerBridge:
             raise RuntimeError("ASR worker did not become ready in time") from exc
 
     async def stop(self):
-        if self.process:
-            # 进程可能已提前退出，先检查 returncode，避免重复 terminate 触发 ProcessLookupError
-            if self.process.returncode is None:
+        await self._stop_worker()
+        if self.zygote is not None:
+            await self.zygote.stop()
+            self.zygote = None
+
+    @staticmethod
+    async def _terminate(process):
+        # 进程可能已提前退出，先检查 returncode，避免重复 terminate 触发 ProcessLookupError
+        if process.returncode is None:
+            try:
+                process.terminate()
+            except ProcessLookupError:
+                pass
+            try:
+                await asyncio.wait_for(process.wait(), timeout=10)
+            except asyncio.TimeoutError:
                 try:
-                    self.process.terminate()
+                    process.kill()
                 except ProcessLookupError:
                     pass
-                try:
-                    await asyncio.wait_for(self.process.wait(), timeout=10)
-                except asyncio.TimeoutError:
-                    try:
-                        self.process.kill()
-                    except ProcessLookupError:
-                        pass
+
+    async def _stop_worker(self):
+        if self.process:
+            await self._terminate(self.process)
         if self.stdout_task:
             self.stdout_task.cancel()
         self.process = None
@@ -283,11 +764,24 @@ class WorkerBridge:
         self.ready_event.clear()
 
     async def send(self, payload: dict):
-        if not self.process or not self.process.stdin:
+        """会话消息：迁移期间先暂存，切换到新 Worker 后按原顺序补发"""
+        session_id = payload.get("session_id")
+        if payload.get("type") == "streaming_chunk" and session_id:
+            self.active_sessions.add(session_id)
+        elif payload.get("type") == "reset_session":
+            self.active_sessions.discard(session_id)
+        if self.held_payloads is not None:
+            self.held_payloads.append(payload)
+            return
+        await self._write(payload)
+
+    async def _write(self, payload: dict, process=None):
+        process = process or self.process
+        if not process or not process.stdin:
             raise RuntimeError("Worker process is not running")
         data = json.dumps(payload, ensure_ascii=False) + "\n"
-        self.process.stdin.write(data.encode("utf-8"))
-        await self.process.stdin.drain()
+        process.stdin.write(data.encode("utf-8"))
+        await process.stdin.drain()
 
     async def force_commit(self, session_id: str):
         await self.send({"type": "force_commit", "session_id": session_id})
@@ -301,29 +795,263 @@ class WorkerBridge:
     def unbind_ws(self, session_id: str):
         self.ws_clients.pop(session_id, None)
 
-    async def request_transcribe(self, audio_path: str, timeout: float = 300.0):
+    async def request(
+        self, payload: dict, timeout: float, progress: Optional[asyncio.Queue] = None, process=None
+    ) -> dict:
+        """
+        发送带 request_id 的请求，并等待 worker 返回同一 request_id 的响应
+        progress 不为空时，worker 推送的中间结果（batch_segment）会放入该队列
+        process 不为空时发给指定的 Worker 进程（滚动重启时发给尚未切换的替换 Worker）
+        """
         request_id = str(uuid4())
         fut: asyncio.Future = asyncio.get_event_loop().create_future()
         self.pending_requests[request_id] = fut
-
-        await self.send(
-            {
-                "type": "batch_file",
-                "request_id": request_id,
-                "audio_path": audio_path,
+        if progress is not None:
+            self.progress_queues[request_id] = progress
+        try:
+            await self._write({**payload, "request_id": request_id}, process=process)
+            return await asyncio.wait_for(fut, timeout=timeout)
+        finally:
+            self.pending_requests.pop(request_id, None)
+            self.progress_queues.pop(request_id, None)
+
+    async def request_transcribe(
+        self, audio_path: str, timeout: float = 300.0, progress: Optional[asyncio.Queue] = None
+    ):
+        return await self.request({"type": "batch_file", "audio_path": audio_path}, timeout=timeout, progress=progress)
+
+    async def restart_worker(self, timeout: float = 300) -> dict:
+        """
+        滚动重启（会话不丢上下文）：
+        1. 拉起替换 Worker 并等待 ready，期间旧 Worker 照常服务
+        2. 暂停转发会话消息，逐个活跃会话从旧 Worker 做快照（export_session remove=false）并导入新 Worker
+        3. 全部导入成功才切换到新 Worker；旧 Worker 关闭 stdin，处理完已排队的请求后自行退出，
+           其中的会话副本随进程一起丢弃
+        4. 补发暂停期间暂存的消息
+        任一会话导出 / 导入失败或超时则放弃切换：结束新 Worker，会话仍由旧 Worker 继续服务，抛 RuntimeError
+        会话只在第 2 步暂停，时长取决于会话数和快照大小（主要是未成句的音频）
+        """
+        if self.engine != "funasr":
+            raise RuntimeError(f"session migration is not supported by engine '{self.engine}'")
+        async with self.restart_lock:
+            await self.ensure_ready()
+            old_process, old_task = self.process, self.stdout_task
+            info = {"spawned_at": time.perf_counter()}
+            new_ready = asyncio.Event()
+            try:
+                new_process = await self._spawn_process(info)
+            except asyncio.TimeoutError as exc:
+                raise RuntimeError("replacement ASR worker could not be forked in time") from exc
+            new_task = asyncio.create_task(self._consume_output(new_process, new_ready, info))
+            asyncio.create_task(self._consume_stderr(new_process))
+            try:
+                await asyncio.wait_for(new_ready.wait(), timeout=timeout)
+            except asyncio.TimeoutError as exc:
+                await self._terminate(new_process)
+                raise RuntimeError("replacement ASR worker did not become ready in time") from exc
+
+            paused_at = time.perf_counter()
+            self.held_payloads = []
+            held: List[dict] = []
+            switched = False
+            migrated: List[str] = []
+            failed: Dict[str, str] = {}
+            try:
+                for session_id in sorted(self.active_sessions | set(self.ws_clients)):
+                    try:
+                        reply = await self.request(
+                            {"type": "export_session", "session_id": session_id, "remove": False},
+                            timeout=MIGRATION_TIMEOUT,
+                        )
+                        if reply.get("status") != "success":
+                            failed[session_id] = reply.get("error") or "export failed"
+                            continue
+                        if reply.get("snapshot") is None:
+                            # 旧 Worker 里没有这个会话（还没收到音频或已重置），无需迁移
+                            continue
+                        reply = await self.request(
+                            {"type": "import_session", "session_id": session_id, "snapshot": reply["snapshot"]},
+                            timeout=MIGRATION_TIMEOUT,
+                            process=new_process,
+                        )
+                    except asyncio.TimeoutError:
+                        failed[session_id] = f"no reply within {MIGRATION_TIMEOUT:g}s"
+                        continue
+                    if reply.get("status") == "success":
+                        migrated.append(session_id)
+                    else:
+                        failed[session_id] = reply.get("error") or "import failed"
+
+                if failed:
+                    raise RuntimeError(f"session migration failed, keeping the current worker: {failed}")
+
+                self.process, self.stdout_task = new_process, new_task
+                self.spawned_at, self.startup = info["spawned_at"], info.get("startup")
+                switched = True
+            finally:
+                try:
+                    if switched:
+                        asyncio.create_task(self._retire(old_process, old_task))
+                    else:
+                        await self._terminate(new_process)
+                finally:
+                    held, self.held_payloads = self.held_payloads, None
+                    for payload in held:
+                        await self._write(payload)
+            pause_ms = round((time.perf_counter() - paused_at) * 1000, 1)
+
+            result = {
+                "old_pid": old_process.pid if old_process else None,
+                "new_pid": new_process.pid,
+                "migrated": migrated,
+                "pause_ms": pause_ms,
+                "held_messages": len(held),
+                "startup": self.startup,
             }
+            print(f"[WorkerBridge] Rolling restart done: {result}", file=sys.stderr)
+            sys.stderr.flush()
+            return result
+
+    async def _retire(self, process, stdout_task: Optional[asyncio.Task], timeout: float = 60):
+        """让被替换的 Worker 读到 stdin EOF 后自行退出，超时再强制结束"""
+        if process is None:
+            return
+        try:
+            if process.stdin.can_write_eof():
+                process.stdin.write_eof()
+            else:
+                process.stdin.close()
+        except (OSError, RuntimeError):
+            pass
+        try:
+            await asyncio.wait_for(process.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            await self._terminate(process)
+        if stdout_task:
+            stdout_task.cancel()
+
+    async def request_metrics(self, timeout: float = 5.0) -> dict:
+        """查询 worker 内部指标；不支持 get_metrics 的 worker 返回错误信息而不是抛异常"""
+        try:
+            payload = await self.request({"type": "get_metrics"}, timeout=timeout)
+        except asyncio.TimeoutError:
+            return {"error": "worker did not answer get_metrics in time"}
+        if payload.get("status") == "success" and "metrics" in payload:
+            return payload["metrics"]
+        return {"error": payload.get("error") or "metrics not supported by worker"}
+
+    async def collect_metrics(self) -> dict:
+        return {
+            "engine": self.engine,
+            "model": self.model,
+            "worker": {
+                "pid": self.process.pid if self.process else None,
+                "ready": self.ready_event.is_set(),
+                "sessions": len(self.ws_clients),
+                "startup": self.startup,
+                "memory": read_process_memory(self.process.pid if self.process else None),
+                "threads": THREAD_BUDGET.assignment(self.budget_key) if self.budget_key is not None else None,
+                "zygote": self.zygote.describe() if self.zygote else None,
+            },
+            "worker_metrics": await self.request_metrics(),
+        }
+
+
+class HybridWorkerBridge:
+    """
+    hybrid 引擎：组合两个 worker，对外接口与 WorkerBridge 一致
+
+    - 本地 FunASR（FUNASR_WORKER_ROLE=pass1）：只加载 VAD + 流式模型，实时输出 partial
+    - 云端 SiliconFlow：接收 Pass 1 VAD 切好的整句（streaming_segment）出终稿；
+      云端熔断时由 SiliconFlow worker 拉起本地 Pass 2 兜底，离线模型只在那时才加载
+    """
+
+    def __init__(self, model: str):
+        self.engine = "hybrid"
+        self.model = model
+        self.local = WorkerBridge(
+            "funasr", model, extra_env={"FUNASR_WORKER_ROLE": "pass1"}, message_hook=self._on_local_message
+        )
+        # 断句已由本地 VAD 完成，云端 worker 默认不再加载自己的 FSMN-VAD
+        self.cloud = WorkerBridge(
+            "siliconflow", model, extra_env={"SF_USE_FUNASR_VAD": os.environ.get("SF_USE_FUNASR_VAD", "0")}
         )
-        return await asyncio.wait_for(fut, timeout=timeout)
+        self.segments_forwarded = 0
+
+    async def _on_local_message(self, payload: dict) -> bool:
+        if payload.get("type") != "segment_audio":
+            return False
+        try:
+            await self.cloud.send(
+                {
+                    "type": "streaming_segment",
+                    "session_id": payload.get("session_id"),
+                    "request_id": payload.get("request_id", "default"),
+                    "audio_data": payload.get("audio_data"),
+                    "trigger": payload.get("trigger"),
+                }
+            )
+            self.segments_forwarded += 1
+        except RuntimeError as exc:
+            print(f"[HybridBridge] Dropping segment, cloud worker unavailable: {exc}", file=sys.stderr)
+        return True
+
+    async def ensure_ready(self):
+        await asyncio.gather(self.local.ensure_ready(), self.cloud.ensure_ready())
+
+    async def stop(self):
+        await asyncio.gather(self.local.stop(), self.cloud.stop())
+
+    async def send(self, payload: dict):
+        await self.local.send(payload)
+
+    async def force_commit(self, session_id: str):
+        # Pass 1 切出当前句 -> segment_audio -> 云端
+        await self.local.force_commit(session_id)
+
+    async def reset_session(self, session_id: str):
+        await self.local.reset_session(session_id)
+        await self.cloud.reset_session(session_id)
+
+    def bind_ws(self, session_id: str, ws: WebSocket):
+        self.local.bind_ws(session_id, ws)
+        self.cloud.bind_ws(session_id, ws)
+
+    def unbind_ws(self, session_id: str):
+        self.local.unbind_ws(session_id)
+        self.cloud.unbind_ws(session_id)
+
+    async def request_transcribe(
+        self, audio_path: str, timeout: float = 300.0, progress: Optional[asyncio.Queue] = None
+    ):
+        return await self.cloud.request_transcribe(audio_path, timeout=timeout, progress=progress)
+
+    async def restart_worker(self) -> dict:
+        # 只有本地 Pass 1 持有流式会话状态；云端 Worker 的会话只有待上传的整句，不做迁移
+        return await self.local.restart_worker()
+
+    async def collect_metrics(self) -> dict:
+        local, cloud = await asyncio.gather(self.local.collect_metrics(), self.cloud.collect_metrics())
+        return {
+            "engine": self.engine,
+            "model": self.model,
+            "segments_forwarded": self.segments_forwarded,
+            "local": local,
+            "cloud": cloud,
+        }
 
 
 app = FastAPI()
-bridge: Optional[WorkerBridge] = None
+bridge: Optional[Union[WorkerBridge, HybridWorkerBridge]] = None
 
 
 @app.on_event("startup")
 async def startup():
     global bridge
-    bridge = WorkerBridge(engine=DEFAULT_ENGINE, model=DEFAULT_MODEL)
+    if DEFAULT_ENGINE == "hybrid":
+        bridge = HybridWorkerBridge(model=DEFAULT_MODEL)
+    else:
+        bridge = WorkerBridge(engine=DEFAULT_ENGINE, model=DEFAULT_MODEL)
     await bridge.ensure_ready()
 
 
@@ -338,8 +1066,64 @@ async def health():
     return {"status": "ok", "engine": DEFAULT_ENGINE, "model": DEFAULT_MODEL}
 
 
+@app.get("/metrics")
+async def metrics():
+    if not bridge:
+        raise HTTPException(status_code=500, detail="ASR bridge not initialized")
+    payload = await bridge.collect_metrics()
+    payload["thread_budget"] = THREAD_BUDGET.describe() if THREAD_BUDGET is not None else None
+    return JSONResponse(payload)
+
+
+@app.post("/workers/restart")
+async def restart_worker():
+    """滚动重启 Worker，活跃会话迁移到新 Worker（见 WorkerBridge.restart_worker）"""
+    if not bridge:
+        raise HTTPException(status_code=500, detail="ASR bridge not initialized")
+    try:
+        return JSONResponse(await bridge.restart_worker())
+    except RuntimeError as exc:
+        raise HTTPException(status_code=409, detail=str(exc))
+
+
+def _remove_file(path: str):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+async def _stream_transcribe(tmp_path: str):
+    """NDJSON 流：先逐条输出 batch_segment（按完成顺序），最后输出完整结果"""
+    progress: asyncio.Queue = asyncio.Queue()
+    task = asyncio.create_task(bridge.request_transcribe(tmp_path, progress=progress))
+    try:
+        while True:
+            getter = asyncio.ensure_future(progress.get())
+            done, _ = await asyncio.wait({getter, task}, return_when=asyncio.FIRST_COMPLETED)
+            if getter in done:
+                yield json.dumps(getter.result(), ensure_ascii=False) + "\n"
+                continue
+            getter.cancel()
+            break
+        while not progress.empty():
+            yield json.dumps(progress.get_nowait(), ensure_ascii=False) + "\n"
+        try:
+            result = task.result()
+        except asyncio.TimeoutError:
+            result = {"status": "error", "error": "transcription timed out"}
+        except Exception as exc:
+            # 响应头已经发出，不能再改状态码：以错误行结束流，而不是直接断开连接
+            result = {"status": "error", "error": str(exc) or exc.__class__.__name__}
+        yield json.dumps(result, ensure_ascii=False) + "\n"
+    finally:
+        if not task.done():
+            task.cancel()
+        _remove_file(tmp_path)
+
+
 @app.post("/transcribe")
-async def transcribe(file: UploadFile = File(...)):
+async def transcribe(file: UploadFile = File(...), stream: bool = False):
     if not bridge:
         raise HTTPException(status_code=500, detail="ASR bridge not initialized")
 
@@ -349,14 +1133,15 @@ async def transcribe(file: UploadFile = File(...)):
         tmp.write(content)
         tmp_path = tmp.name
 
+    if stream:
+        # 分块转写的 worker（siliconflow）会推送中间结果，其他 worker 只输出最后一行
+        return StreamingResponse(_stream_transcribe(tmp_path), media_type="application/x-ndjson")
+
     try:
         result = await bridge.request_transcribe(tmp_path)
         return JSONResponse(result)
     finally:
-        try:
-            os.remove(tmp_path)
-        except OSError:
-            pass
+        _remove_file(tmp_path)
 
 
 @app.websocket("/ws/transcribe")
@@ -21,12 +21,19 @@ hiddenimports = [
     'fastapi.applications',
     'starlette.websockets',
     'ctranslate2',
+    'httpx',
+    'h2',
     'onnxruntime.capi.onnxruntime_pybind11_state',
+    # Worker 脚本之间共用的模块（Worker 由 runpy 按路径运行，脚本目录不在 sys.path 上）
+    'cloud_resilience',
+    'cpu_affinity',
+    'load_controller',
+    'synth_voice',
 ] + collect_submodules('onnxruntime.capi') + collect_submodules('funasr')
 
 a = Analysis(
     ['../main.py'],
-    pathex=[project_root],
+    pathex=[project_root, asr_dir],
     binaries=[],
     datas=datas,
     hiddenimports=hiddenimports,
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+FunASR（AutoModel）Worker torch 运行时配置对比基准
+
+对每个 FUNASR_RUNTIME_PROFILE（default / fast / int8）启动 src/asr/asr_funasr_worker.py：
+- 读取 ready 消息的 startup 字段：模型加载耗时、预热耗时、加载 / 预热后的常驻内存
+- 尽可能快地喂入 --seconds 秒音频（最后一块带 is_final），关闭 stdin 等 Worker 处理完退出，
+  实时率 RTF = 处理耗时 / 音频时长
+- Linux 上轮询 /proc/<pid>/status 记录运行期间的峰值常驻内存
+
+用法：
+    python scripts/bench-funasr-profiles.py --audio sample.wav --seconds 120
+    python scripts/bench-funasr-profiles.py --audio sample.wav --profiles fast,int8 --cpu-threads 2
+"""
+
+import argparse
+import base64
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+import wave
+
+import numpy as np
+
+from synth_voice import synth_voiced_pcm16
+
+WORKER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src", "asr", "asr_funasr_worker.py")
+
+
+def load_audio(path: str, sample_rate: int, seconds: float) -> np.ndarray:
+    """读取 16-bit WAV 并循环拼接到指定时长；不提供文件时生成合成信号（识别结果无意义，仅用于看耗时）"""
+    total = int(seconds * sample_rate)
+    if path:
+        with wave.open(path, "rb") as wf:
+            if wf.getsampwidth() != 2 or wf.getframerate() != sample_rate:
+                raise SystemExit(f"{path}: need 16-bit {sample_rate}Hz WAV")
+            channels = wf.getnchannels()
+            audio = np.frombuffer(wf.readframes(wf.getnframes()), dtype=np.int16)
+        if channels > 1:
+            audio = audio.reshape(-1, channels)[:, 0]
+    else:
+        print("Warning: no --audio given, using synthetic voiced signal", file=sys.stderr)
+        audio = synth_voiced_pcm16(30, sample_rate)
+    reps = int(np.ceil(total / max(1, len(audio))))
+    return np.tile(audio, reps)[:total]
+
+
+def read_rss_mb(pid: int):
+    try:
+        with open(f"/proc/{pid}/status", encoding="ascii", errors="ignore") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        return None
+    return None
+
+
+def run(profile: str, audio: np.ndarray, args) -> dict:
+    env = {
+        **os.environ,
+        "FUNASR_RUNTIME_PROFILE": profile,
+        "ASR_SAMPLE_RATE": str(args.sample_rate),
+        "PYTHONUNBUFFERED": "1",
+    }
+    if args.cpu_threads > 0:
+        env["ASR_CPU_THREADS"] = str(args.cpu_threads)
+    proc = subprocess.Popen(
+        [sys.executable, WORKER],
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL if not args.verbose else None,
+        env=env,
+        text=True,
+        bufsize=1,
+    )
+    startup = None
+    for line in proc.stdout:
+        try:
+            msg = json.loads(line)
+        except ValueError:
+            continue
+        if msg.get("status") == "fatal":
+            raise SystemExit(f"[{profile}] worker failed: {msg.get('error')}")
+        if msg.get("status") == "ready":
+            startup = msg.get("startup") or {}
+            break
+    if startup is None:
+        raise SystemExit(f"[{profile}] worker exited before ready")
+
+    counts = {"partial": 0, "sentence_complete": 0}
+
+    def drain_stdout():
+        for line in proc.stdout:
+            try:
+                msg = json.loads(line)
+            except ValueError:
+                continue
+            if msg.get("type") in counts:
+                counts[msg["type"]] += 1
+
+    reader = threading.Thread(target=drain_stdout, daemon=True)
+    reader.start()
+
+    peak_rss = [read_rss_mb(proc.pid)]
+
+    def sample_rss():
+        while proc.poll() is None:
+            rss = read_rss_mb(proc.pid)
+            if rss is not None:
+                peak_rss.append(rss)
+            time.sleep(0.2)
+
+    sampler = threading.Thread(target=sample_rss, daemon=True)
+    sampler.start()
+
+    chunk = int(args.sample_rate * args.chunk_ms / 1000)
+    t0 = time.perf_counter()
+    for pos in range(0, len(audio), chunk):
+        proc.stdin.write(json.dumps({
+            "type": "streaming_chunk",
+            "session_id": "bench",
+            "audio_data": base64.b64encode(audio[pos:pos + chunk].tobytes()).decode("ascii"),
+            "is_final": pos + chunk >= len(audio),
+        }) + "\n")
+    proc.stdin.close()
+    proc.wait()
+    elapsed = time.perf_counter() - t0
+    reader.join(timeout=5)
+    sampler.join(timeout=5)
+
+    rss = startup.get("rss_mb") or {}
+    peaks = [value for value in peak_rss if value is not None]
+    return {
+        "rtf": elapsed / (len(audio) / args.sample_rate),
+        "load_ms": startup.get("model_load_ms"),
+        "warmup": startup.get("warmup") or {},
+        "rss_load": rss.get("model_load"),
+        "rss_peak": max(peaks) if peaks else None,
+        "threads": (startup.get("profile") or {}).get("torch_threads"),
+        **counts,
+    }
+
+
+def fmt(value, spec: str) -> str:
+    return format(value, spec) if isinstance(value, (int, float)) else "-"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="FunASR AutoModel worker runtime profile benchmark")
+    parser.add_argument("--audio", help="16-bit WAV 文件（不填则使用合成信号）")
+    parser.add_argument("--seconds", type=float, default=60.0)
+    parser.add_argument("--profiles", default="default,fast,int8")
+    parser.add_argument("--cpu-threads", type=int, default=0, help="传给 ASR_CPU_THREADS，决定 fast / int8 的 torch 线程数；0 = 不设置（CPU 核数）")
+    parser.add_argument("--chunk-ms", type=float, default=200.0)
+    parser.add_argument("--sample-rate", type=int, default=16000)
+    parser.add_argument("--verbose", action="store_true", help="显示 Worker 日志")
+    args = parser.parse_args()
+
+    audio = load_audio(args.audio, args.sample_rate, args.seconds)
+    print(
+        f"{'profile':>8} {'threads':>7} {'load ms':>8} {'stream warm':>11} {'punc warm':>9} "
+        f"{'RSS load':>9} {'RSS peak':>9} {'RTF':>6} {'sentences':>9}"
+    )
+    for profile in [p for p in args.profiles.split(",") if p]:
+        row = run(profile, audio, args)
+        print(
+            f"{profile:>8} {fmt(row['threads'], 'd'):>7} {fmt(row['load_ms'], '.0f'):>8} "
+            f"{fmt(row['warmup'].get('stream_ms'), '.0f'):>11} {fmt(row['warmup'].get('punc_ms'), '.0f'):>9} "
+            f"{fmt(row['rss_load'], '.0f'):>9} {fmt(row['rss_peak'], '.0f'):>9} {row['rtf']:>6.3f} "
+            f"{row['sentence_complete']:>9}"
+        )
+    print("RSS in MB. RTF = processing time / audio duration (audio fed as fast as possible).")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
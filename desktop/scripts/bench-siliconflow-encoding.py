@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+SiliconFlow 上传编码基准
+
+对比各上传格式（与 asr_siliconflow_worker.py 中的编码器一致）的：
+- 编码耗时（直接从 int16 编码）
+- 上传体积
+- 不同上行带宽下的 "编码 + 上传" 总耗时
+
+用法：
+    python scripts/bench-siliconflow-encoding.py
+    python scripts/bench-siliconflow-encoding.py --audio sample.wav --uplinks 0.5,1,2,5
+"""
+
+import argparse
+import io
+import sys
+import time
+import wave
+
+import numpy as np
+import soundfile as sf
+
+from synth_voice import synth_voiced_pcm16
+
+FORMATS = {
+    # name: (soundfile format, subtype)；wav 使用标准库 wave，与 Worker 一致
+    "wav": None,
+    "flac": ("FLAC", "PCM_16"),
+    "opus": ("OGG", "OPUS"),
+    "mp3": ("MP3", "MPEG_LAYER_III"),
+}
+
+
+def encode(name: str, pcm: np.ndarray, sample_rate: int) -> bytes:
+    spec = FORMATS[name]
+    buf = io.BytesIO()
+    if spec is None:
+        with wave.open(buf, "wb") as wf:
+            wf.setnchannels(1)
+            wf.setsampwidth(2)
+            wf.setframerate(sample_rate)
+            wf.writeframes(pcm.tobytes())
+    else:
+        sf.write(buf, pcm, sample_rate, format=spec[0], subtype=spec[1])
+    return buf.getvalue()
+
+
+def load_audio(path: str, sample_rate: int, seconds: float) -> np.ndarray:
+    if path:
+        audio, sr = sf.read(path, dtype="int16", always_2d=True)
+        if sr != sample_rate:
+            print(f"Warning: {path} is {sr}Hz, encoding at file rate")
+        return np.ascontiguousarray(audio[:, 0])
+    # 合成类语音信号，比纯正弦更接近真实压缩率；停顿更密，接近单个 VAD 段内的音节节奏
+    return synth_voiced_pcm16(seconds, sample_rate, pause_hz=2.5, pause_threshold=-0.2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SiliconFlow upload encoding benchmark")
+    parser.add_argument("--audio", help="16-bit WAV 文件（不填则使用合成音频）")
+    parser.add_argument("--seconds", type=float, default=3.0, help="合成音频时长（典型 VAD 段长度）")
+    parser.add_argument("--sample-rate", type=int, default=16000)
+    parser.add_argument("--uplinks", default="0.5,1,2,5,20", help="上行带宽列表（Mbps）")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    pcm = load_audio(args.audio, args.sample_rate, args.seconds)
+    duration = len(pcm) / args.sample_rate
+    uplinks = [float(x) for x in args.uplinks.split(",") if x]
+    print(f"Audio: {duration:.2f}s, raw PCM {len(pcm) * 2 / 1024:.1f} KB")
+
+    header = f"{'format':>6} {'size KB':>8} {'ratio':>6} {'enc ms':>7}" + "".join(f" {u:>6.1f}Mb" for u in uplinks)
+    print(header)
+    for name in FORMATS:
+        try:
+            payload = encode(name, pcm, args.sample_rate)
+        except Exception as exc:
+            print(f"{name:>6} unavailable: {exc}")
+            continue
+        t0 = time.perf_counter()
+        for _ in range(args.repeat):
+            encode(name, pcm, args.sample_rate)
+        encode_ms = (time.perf_counter() - t0) * 1000 / args.repeat
+        totals = [encode_ms + len(payload) * 8 / (u * 1e6) * 1000 for u in uplinks]
+        print(
+            f"{name:>6} {len(payload) / 1024:>8.1f} {len(pcm) * 2 / len(payload):>6.2f} {encode_ms:>7.2f}"
+            + "".join(f" {t:>6.0f}ms" for t in totals)
+        )
+    print("Columns per uplink = encode + upload time for one segment (excluding RTT).")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
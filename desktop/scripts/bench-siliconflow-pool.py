@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+SiliconFlow 连接池延迟基准
+
+在本地启动一个模拟的 /v1/audio/transcriptions 服务，对比：
+- cold:   每个请求新建连接（等价于旧实现的裸 requests.post）
+- pooled: httpx.AsyncClient 连接池 + keep-alive（当前 Worker 实现）
+
+模拟服务在每条新连接建立时额外等待 --handshake-ms，用于近似真实网络下
+DNS + TCP + TLS 握手的开销；每个请求再等待 --asr-ms 模拟云端识别耗时。
+
+用法：
+    python scripts/bench-siliconflow-pool.py --requests 50 --handshake-ms 150 --asr-ms 300
+    python scripts/bench-siliconflow-pool.py --url https://api.siliconflow.cn/v1/audio/transcriptions
+"""
+
+import argparse
+import asyncio
+import io
+import json
+import statistics
+import sys
+import threading
+import time
+import wave
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def make_wav(seconds: float = 2.0, sample_rate: int = 16000) -> bytes:
+    """生成一段静音 WAV（只关心上传体积）"""
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(sample_rate)
+        wf.writeframes(b"\x00\x00" * int(seconds * sample_rate))
+    return buf.getvalue()
+
+
+def start_mock_server(handshake_ms: float, asr_ms: float):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def _reply(self, status: int, body: bytes):
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_HEAD(self):
+            self.send_response(200)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            self.rfile.read(length)
+            time.sleep(asr_ms / 1000.0)
+            self._reply(200, json.dumps({"text": "模拟识别结果"}).encode("utf-8"))
+
+    class Server(ThreadingHTTPServer):
+        daemon_threads = True
+
+        def finish_request(self, request, client_address):
+            # 每条新连接只付一次"握手"成本，keep-alive 复用时不再付
+            time.sleep(handshake_ms / 1000.0)
+            super().finish_request(request, client_address)
+
+    server = Server(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host, port = server.server_address
+    return server, f"http://{host}:{port}/v1/audio/transcriptions"
+
+
+def summarize(name: str, latencies):
+    ordered = sorted(latencies)
+    p = lambda q: ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000
+    print(
+        f"{name:>8}: n={len(ordered)} mean={statistics.mean(ordered) * 1000:.0f}ms "
+        f"p50={p(0.5):.0f}ms p90={p(0.9):.0f}ms p99={p(0.99):.0f}ms"
+    )
+
+
+async def run_cold(url: str, wav: bytes, n: int, interval: float):
+    import httpx
+
+    latencies = []
+    for _ in range(n):
+        t0 = time.perf_counter()
+        async with httpx.AsyncClient(timeout=30) as client:
+            resp = await client.post(url, data={"model": "mock"}, files={"file": ("chunk.wav", wav, "audio/wav")})
+            resp.raise_for_status()
+        latencies.append(time.perf_counter() - t0)
+        await asyncio.sleep(interval)
+    return latencies
+
+
+async def run_pooled(url: str, wav: bytes, n: int, interval: float, http2: bool):
+    import httpx
+
+    latencies = []
+    async with httpx.AsyncClient(timeout=30, http2=http2) as client:
+        # 预热：对应 Worker 启动时的 warmup()
+        await client.request("HEAD", url)
+        for _ in range(n):
+            t0 = time.perf_counter()
+            resp = await client.post(url, data={"model": "mock"}, files={"file": ("chunk.wav", wav, "audio/wav")})
+            resp.raise_for_status()
+            latencies.append(time.perf_counter() - t0)
+            await asyncio.sleep(interval)
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SiliconFlow connection pool latency benchmark")
+    parser.add_argument("--url", help="目标地址（不填则启动本地模拟服务）")
+    parser.add_argument("--requests", type=int, default=30)
+    parser.add_argument("--interval", type=float, default=0.2, help="两次请求之间的间隔（秒）")
+    parser.add_argument("--handshake-ms", type=float, default=150.0)
+    parser.add_argument("--asr-ms", type=float, default=300.0)
+    parser.add_argument("--seconds", type=float, default=2.0, help="每段音频时长")
+    parser.add_argument("--http2", action="store_true", help="pooled 模式启用 HTTP/2（需要 h2 且服务端支持）")
+    args = parser.parse_args()
+
+    url = args.url
+    server = None
+    if not url:
+        server, url = start_mock_server(args.handshake_ms, args.asr_ms)
+        print(f"Mock server: {url} (handshake={args.handshake_ms}ms, asr={args.asr_ms}ms)")
+
+    wav = make_wav(args.seconds)
+    cold = asyncio.run(run_cold(url, wav, args.requests, args.interval))
+    pooled = asyncio.run(run_pooled(url, wav, args.requests, args.interval, args.http2))
+
+    summarize("cold", cold)
+    summarize("pooled", pooled)
+    saved = (statistics.mean(cold) - statistics.mean(pooled)) * 1000
+    print(f"Mean saving per request: {saved:.0f}ms")
+
+    if server:
+        server.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Whisper 跨会话批量解码吞吐基准
+
+对每个会话数 N，分别以逐个解码（ASR_BATCH_SIZE=1）和批量解码（ASR_BATCH_SIZE=--batch-size）
+启动 src/asr/asr_worker.py，交错喂入 N 路音频（每路 --seconds 秒，尽可能快），
+最后发送 get_metrics 并等待回复，统计：
+- 吞吐：每秒处理的音频秒数（所有会话合计）
+- 平均批大小、单次解码耗时
+
+用法：
+    python scripts/bench-whisper-batching.py --audio sample.wav --sessions 1,2,4,8
+    python scripts/bench-whisper-batching.py --audio sample.wav --model small --batch-size 8 --gather-ms 50
+"""
+
+import argparse
+import base64
+import json
+import os
+import subprocess
+import sys
+import time
+import wave
+
+import numpy as np
+
+from synth_voice import synth_voiced_pcm16
+
+WORKER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src", "asr", "asr_worker.py")
+
+
+def load_audio(path: str, sample_rate: int, seconds: float) -> np.ndarray:
+    """读取 16-bit WAV 并循环拼接到指定时长；不提供文件时生成合成信号（Whisper 会输出无意义文本，仅用于看耗时）"""
+    total = int(seconds * sample_rate)
+    if path:
+        with wave.open(path, "rb") as wf:
+            if wf.getsampwidth() != 2 or wf.getframerate() != sample_rate:
+                raise SystemExit(f"{path}: need 16-bit {sample_rate}Hz WAV")
+            channels = wf.getnchannels()
+            audio = np.frombuffer(wf.readframes(wf.getnframes()), dtype=np.int16)
+        if channels > 1:
+            audio = audio.reshape(-1, channels)[:, 0]
+    else:
+        print("Warning: no --audio given, using synthetic voiced signal", file=sys.stderr)
+        audio = synth_voiced_pcm16(30, sample_rate)
+    reps = int(np.ceil(total / max(1, len(audio))))
+    return np.tile(audio, reps)[:total]
+
+
+def run(sessions: int, batch_size: int, audio: np.ndarray, args) -> dict:
+    env = {
+        **os.environ,
+        "ASR_STREAMING_POLICY": "local_agreement",
+        "ASR_BATCH_SIZE": str(batch_size),
+        "ASR_BATCH_GATHER_MS": str(args.gather_ms),
+        "ASR_MODEL": args.model,
+        "ASR_SAMPLE_RATE": str(args.sample_rate),
+    }
+    proc = subprocess.Popen(
+        [sys.executable, WORKER],
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL if not args.verbose else None,
+        env=env,
+        text=True,
+        bufsize=1,
+    )
+
+    def wait_for(predicate):
+        for line in proc.stdout:
+            try:
+                msg = json.loads(line)
+            except ValueError:
+                continue
+            if msg.get("status") == "fatal":
+                raise SystemExit(f"worker failed: {msg.get('error')}")
+            if predicate(msg):
+                return msg
+        raise SystemExit("worker exited unexpectedly")
+
+    wait_for(lambda m: m.get("status") == "ready")
+    chunk = int(args.sample_rate * args.chunk_ms / 1000)
+    # 各会话从音频的不同位置开始，避免批内窗口完全相同
+    shift = len(audio) // max(1, sessions)
+    streams = [np.roll(audio, i * shift) for i in range(sessions)]
+
+    t0 = time.perf_counter()
+    for pos in range(0, len(audio), chunk):
+        for i, stream in enumerate(streams):
+            proc.stdin.write(json.dumps({
+                "type": "streaming_chunk",
+                "session_id": f"bench-{i}",
+                "audio_data": base64.b64encode(stream[pos:pos + chunk].tobytes()).decode("ascii"),
+            }) + "\n")
+        proc.stdin.flush()
+    proc.stdin.write(json.dumps({"type": "get_metrics", "request_id": "bench"}) + "\n")
+    proc.stdin.flush()
+    metrics = wait_for(lambda m: m.get("request_id") == "bench")["metrics"]
+    elapsed = time.perf_counter() - t0
+    proc.stdin.close()
+    proc.wait(timeout=30)
+
+    audio_sec = sessions * len(audio) / args.sample_rate
+    return {
+        "throughput": audio_sec / elapsed,
+        "elapsed": elapsed,
+        "avg_batch_size": metrics.get("avg_batch_size"),
+        "decode_ms_p50": metrics.get("decode_ms_p50"),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Whisper cross-session batched decoding throughput benchmark")
+    parser.add_argument("--audio", help="16-bit WAV 文件（不填则使用合成信号）")
+    parser.add_argument("--seconds", type=float, default=60.0, help="每个会话的音频时长")
+    parser.add_argument("--sessions", default="1,2,4,8", help="会话数列表")
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--gather-ms", type=float, default=30.0)
+    parser.add_argument("--chunk-ms", type=float, default=200.0)
+    parser.add_argument("--model", default=os.environ.get("ASR_MODEL", "base"))
+    parser.add_argument("--sample-rate", type=int, default=16000)
+    parser.add_argument("--verbose", action="store_true", help="显示 Worker 日志")
+    args = parser.parse_args()
+
+    audio = load_audio(args.audio, args.sample_rate, args.seconds)
+    print(f"{'sessions':>8} {'serial x':>9} {'batched x':>10} {'speedup':>8} {'avg batch':>10} {'serial ms':>10} {'batch ms':>9}")
+    for sessions in [int(x) for x in args.sessions.split(",") if x]:
+        serial = run(sessions, 1, audio, args)
+        batched = run(sessions, args.batch_size, audio, args)
+        print(
+            f"{sessions:>8} {serial['throughput']:>9.2f} {batched['throughput']:>10.2f} "
+            f"{batched['throughput'] / serial['throughput']:>7.2f}x {batched['avg_batch_size'] or 1:>10} "
+            f"{serial['decode_ms_p50']:>10} {batched['decode_ms_p50']:>9}"
+        )
+    print("Throughput = audio seconds processed per wall second across all sessions (x real time).")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
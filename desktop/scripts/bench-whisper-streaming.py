@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Whisper 流式策略实时率基准
+
+启动 src/asr/asr_worker.py 子进程，把一段长音频（默认 10 分钟）按 --chunk-ms 切块、
+尽可能快地喂给 Worker，每喂完一分钟音频发送一次 get_metrics 并等待回复
+（Worker 按顺序处理 stdin，回复到达即代表这一分钟的音频已全部处理完）。
+
+每分钟的实时率 RTF = 处理这一分钟音频的耗时 / 60 秒：
+- local_agreement：单次解码长度有上限，RTF 应基本保持平稳
+- full：每块重新识别整个缓冲，RTF 随缓冲增长直到 ASR_BUFFER_SECONDS 封顶
+
+用法：
+    python scripts/bench-whisper-streaming.py --audio sample.wav --minutes 10
+    python scripts/bench-whisper-streaming.py --audio sample.wav --policies local_agreement --model small
+"""
+
+import argparse
+import base64
+import json
+import os
+import subprocess
+import sys
+import time
+import wave
+
+import numpy as np
+
+from synth_voice import synth_voiced_pcm16
+
+WORKER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src", "asr", "asr_worker.py")
+
+
+def load_audio(path: str, sample_rate: int, minutes: float) -> np.ndarray:
+    """读取 16-bit WAV 并循环拼接到指定时长；不提供文件时生成合成信号（Whisper 会输出无意义文本，仅用于看耗时）"""
+    total = int(minutes * 60 * sample_rate)
+    if path:
+        with wave.open(path, "rb") as wf:
+            if wf.getsampwidth() != 2 or wf.getframerate() != sample_rate:
+                raise SystemExit(f"{path}: need 16-bit {sample_rate}Hz WAV")
+            channels = wf.getnchannels()
+            audio = np.frombuffer(wf.readframes(wf.getnframes()), dtype=np.int16)
+        if channels > 1:
+            audio = audio.reshape(-1, channels)[:, 0]
+    else:
+        print("Warning: no --audio given, using synthetic voiced signal", file=sys.stderr)
+        audio = synth_voiced_pcm16(30, sample_rate)
+    reps = int(np.ceil(total / max(1, len(audio))))
+    return np.tile(audio, reps)[:total]
+
+
+def run_policy(policy: str, audio: np.ndarray, args) -> list:
+    env = {**os.environ, "ASR_STREAMING_POLICY": policy, "ASR_MODEL": args.model, "ASR_SAMPLE_RATE": str(args.sample_rate)}
+    proc = subprocess.Popen(
+        [sys.executable, WORKER],
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL if not args.verbose else None,
+        env=env,
+        text=True,
+        bufsize=1,
+    )
+    counts = {"partial": 0, "sentence_complete": 0}
+
+    def wait_for(predicate):
+        for line in proc.stdout:
+            try:
+                msg = json.loads(line)
+            except ValueError:
+                continue
+            if msg.get("status") == "fatal":
+                raise SystemExit(f"worker failed: {msg.get('error')}")
+            if msg.get("type") in counts:
+                counts[msg["type"]] += 1
+            if predicate(msg):
+                return msg
+        raise SystemExit("worker exited unexpectedly")
+
+    wait_for(lambda m: m.get("status") == "ready")
+    chunk = int(args.sample_rate * args.chunk_ms / 1000)
+    minute = 60 * args.sample_rate
+    rows = []
+    for index, offset in enumerate(range(0, len(audio), minute)):
+        block = audio[offset:offset + minute]
+        t0 = time.perf_counter()
+        for pos in range(0, len(block), chunk):
+            proc.stdin.write(json.dumps({
+                "type": "streaming_chunk",
+                "session_id": "bench",
+                "audio_data": base64.b64encode(block[pos:pos + chunk].tobytes()).decode("ascii"),
+            }) + "\n")
+        proc.stdin.write(json.dumps({"type": "get_metrics", "request_id": f"m{index}"}) + "\n")
+        proc.stdin.flush()
+        metrics = wait_for(lambda m: m.get("request_id") == f"m{index}")["metrics"]
+        elapsed = time.perf_counter() - t0
+        rows.append({
+            "minute": index + 1,
+            "rtf": elapsed / (len(block) / args.sample_rate),
+            "decode_ms_p50": metrics.get("decode_ms_p50"),
+            "window_sec_max": metrics.get("window_sec_max"),
+            **counts,
+        })
+        print(
+            f"[{policy}] minute {index + 1}: rtf={rows[-1]['rtf']:.3f} "
+            f"decode_p50={metrics.get('decode_ms_p50')}ms window_max={metrics.get('window_sec_max')}s",
+            file=sys.stderr,
+        )
+    proc.stdin.close()
+    proc.wait(timeout=30)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Whisper streaming policy real-time factor benchmark")
+    parser.add_argument("--audio", help="16-bit WAV 文件，循环拼接到 --minutes（不填则使用合成信号）")
+    parser.add_argument("--minutes", type=float, default=10.0)
+    parser.add_argument("--chunk-ms", type=float, default=200.0, help="每个 streaming_chunk 的时长")
+    parser.add_argument("--model", default=os.environ.get("ASR_MODEL", "base"))
+    parser.add_argument("--sample-rate", type=int, default=16000)
+    parser.add_argument("--policies", default="local_agreement,full")
+    parser.add_argument("--verbose", action="store_true", help="显示 Worker 日志")
+    args = parser.parse_args()
+
+    audio = load_audio(args.audio, args.sample_rate, args.minutes)
+    results = {policy: run_policy(policy, audio, args) for policy in args.policies.split(",") if policy}
+
+    print(f"{'minute':>6}" + "".join(f" {policy:>16}" for policy in results))
+    for i in range(max(len(rows) for rows in results.values())):
+        print(f"{i + 1:>6}" + "".join(
+            f" {rows[i]['rtf']:>16.3f}" if i < len(rows) else f" {'-':>16}" for rows in results.values()
+        ))
+    for policy, rows in results.items():
+        first, last = rows[0]["rtf"], rows[-1]["rtf"]
+        print(
+            f"{policy}: first={first:.3f} last={last:.3f} growth={last / first if first else 0:.2f}x "
+            f"sentences={rows[-1]['sentence_complete']} partials={rows[-1]['partial']}"
+        )
+    print("RTF < 1 means the policy keeps up with real time on this machine.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
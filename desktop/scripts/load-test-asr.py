@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+ASR 桥接服务负载测试
+
+模拟 N 个并发会话，通过 /ws/transcribe 按实时速率推送音频，统计端到端延迟：
+从一句话最后一块音频发出，到收到对应 sentence_complete 的时间。
+
+音频默认是合成的"说话 + 停顿"序列（每句 0.5~4 秒，停顿 0.7~1.5 秒，保证 Worker 能断开相邻句），
+也可以用 --audio 指定 16-bit WAV。
+结束时会读取 /metrics，打印 Worker 内部指标（对冲、连接池、短段合并等）。
+
+--spawn 模式会自动启动 scripts/mock-cloud-asr.py 和 backend/main.py（指向模拟服务），
+可离线调优云端 Worker 参数，例如：
+
+    python scripts/load-test-asr.py --spawn siliconflow --sessions 8 --duration 60 \\
+        --mock-args "--latency bimodal:200,2500,0.1 --error-rate 0.02"
+    SF_HEDGE_PERCENTILE=0.8 python scripts/load-test-asr.py --spawn siliconflow --sessions 8
+    python scripts/load-test-asr.py --url http://127.0.0.1:8000 --sessions 4   # 压测已启动的服务
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import shlex
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+import wave
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import numpy as np
+import websockets
+
+SCRIPTS_DIR = Path(__file__).resolve().parent
+DESKTOP_DIR = SCRIPTS_DIR.parent
+
+
+def free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def synth_conversation(seconds: float, sample_rate: int, seed: int) -> Tuple[np.ndarray, List[Tuple[float, float]]]:
+    """合成会话音频，返回 (int16 PCM, [(句子开始秒, 句子结束秒)])"""
+    rng = np.random.default_rng(seed)
+    parts, utterances, pos = [], [], 0.0
+    while pos < seconds:
+        silence = rng.uniform(0.7, 1.5)
+        parts.append(np.zeros(int(silence * sample_rate), dtype=np.int16))
+        pos += silence
+        dur = rng.uniform(0.5, 4.0)
+        t = np.arange(int(dur * sample_rate)) / sample_rate
+        f0 = rng.uniform(120, 240) + 30 * np.sin(2 * np.pi * 0.8 * t)
+        phase = 2 * np.pi * np.cumsum(f0) / sample_rate
+        voiced = sum(np.sin(k * phase) / k for k in range(1, 6)) * 5000
+        parts.append(np.clip(voiced, -32768, 32767).astype(np.int16))
+        utterances.append((pos, pos + dur))
+        pos += dur
+    parts.append(np.zeros(int(1.5 * sample_rate), dtype=np.int16))
+    return np.concatenate(parts), utterances
+
+
+def load_wav(path: str, sample_rate: int) -> Tuple[np.ndarray, List[Tuple[float, float]]]:
+    """读取 WAV，并用能量粗略标出句子区间（用于计算延迟）"""
+    with wave.open(path, "rb") as wf:
+        if wf.getsampwidth() != 2 or wf.getframerate() != sample_rate:
+            raise ValueError(f"{path}: need 16-bit PCM at {sample_rate}Hz")
+        audio = np.frombuffer(wf.readframes(wf.getnframes()), dtype=np.int16)
+        if wf.getnchannels() > 1:
+            audio = audio.reshape(-1, wf.getnchannels())[:, 0]
+    frame = int(0.03 * sample_rate)
+    n = len(audio) // frame
+    rms = np.sqrt(np.mean(audio[: n * frame].astype(np.float32).reshape(n, frame) ** 2, axis=1))
+    utterances, start, quiet = [], None, 0
+    for i, value in enumerate(rms):
+        if value >= 300:
+            start = i if start is None else start
+            quiet = 0
+        elif start is not None:
+            quiet += 1
+            if quiet * 0.03 >= 0.5:
+                utterances.append((start * 0.03, (i - quiet + 1) * 0.03))
+                start, quiet = None, 0
+    if start is not None:
+        utterances.append((start * 0.03, n * 0.03))
+    return np.ascontiguousarray(audio), utterances
+
+
+class SessionResult:
+    def __init__(self):
+        self.latencies: List[float] = []
+        self.finals = 0
+        self.partials = 0
+        self.errors = 0
+        self.unmatched = 0
+        self.missing = 0
+
+
+async def run_session(base_ws: str, index: int, args) -> SessionResult:
+    if args.audio:
+        audio, utterances = load_wav(args.audio, args.sample_rate)
+    else:
+        audio, utterances = synth_conversation(args.duration, args.sample_rate, seed=args.seed + index)
+    result = SessionResult()
+    chunk = int(args.sample_rate * args.chunk_ms / 1000)
+    session_id = f"load-{index}-{int(time.time())}"
+    pending_ends: List[float] = []  # 已发出、尚未收到结果的句子结束时刻（wall clock）
+
+    # 启动错峰，避免所有会话同一时刻断句
+    await asyncio.sleep(random.uniform(0, args.chunk_ms / 1000.0))
+    async with websockets.connect(f"{base_ws}/ws/transcribe?session_id={session_id}", max_size=None) as ws:
+
+        async def sender():
+            t0 = time.time()
+            next_utt = 0
+            for pos in range(0, len(audio), chunk):
+                await ws.send(audio[pos:pos + chunk].tobytes())
+                audio_t = (pos + chunk) / float(args.sample_rate)
+                while next_utt < len(utterances) and utterances[next_utt][1] <= audio_t:
+                    pending_ends.append(time.time())
+                    next_utt += 1
+                # 按实时速率发送（--speed 可加速）
+                delay = t0 + audio_t / args.speed - time.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            await ws.send(json.dumps({"type": "force_commit"}))
+
+        async def receiver():
+            async for raw in ws:
+                msg = json.loads(raw)
+                now = time.time()
+                if msg.get("type") == "partial_result":
+                    result.partials += 1
+                elif msg.get("type") == "sentence_complete":
+                    result.finals += 1
+                    # 合并上传的结果一次覆盖多句
+                    for _ in range(len(msg.get("segment_seqs") or [None])):
+                        if pending_ends and pending_ends[0] <= now:
+                            result.latencies.append(now - pending_ends.pop(0))
+                        else:
+                            result.unmatched += 1
+                elif msg.get("status") == "error":
+                    result.errors += 1
+                    if pending_ends:
+                        pending_ends.pop(0)
+
+        recv_task = asyncio.create_task(receiver())
+        await sender()
+        # 等待剩余结果
+        deadline = time.time() + args.drain
+        while pending_ends and time.time() < deadline:
+            await asyncio.sleep(0.1)
+        recv_task.cancel()
+        result.missing = len(pending_ends)
+    return result
+
+
+def fetch_json(url: str) -> Optional[dict]:
+    try:
+        with urllib.request.urlopen(url, timeout=10) as resp:
+            return json.loads(resp.read().decode("utf-8"))
+    except Exception as exc:
+        print(f"Failed to fetch {url}: {exc}", file=sys.stderr)
+        return None
+
+
+def wait_http(url: str, timeout: float, proc: Optional[subprocess.Popen] = None):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if proc is not None and proc.poll() is not None:
+            raise RuntimeError(f"process exited early with code {proc.returncode}")
+        try:
+            urllib.request.urlopen(url, timeout=2).close()
+            return
+        except Exception:
+            time.sleep(0.3)
+    raise RuntimeError(f"{url} not ready after {timeout}s")
+
+
+def spawn_stack(engine: str, mock_args: str, log_file):
+    """启动模拟云服务 + 指向它的桥接服务，返回 (base_url, mock_url, [进程])"""
+    mock_port, bridge_port = free_port(), free_port()
+    mock_url = f"http://127.0.0.1:{mock_port}"
+    mock = subprocess.Popen(
+        [sys.executable, str(SCRIPTS_DIR / "mock-cloud-asr.py"), "--port", str(mock_port), *shlex.split(mock_args)],
+        stdout=log_file, stderr=log_file,
+    )
+    wait_http(f"{mock_url}/", 30, mock)
+
+    env = dict(os.environ)
+    env.update({
+        "ASR_ENGINE": engine,
+        "ASR_PORT": str(bridge_port),
+        "SILICONFLOW_API_URL": f"{mock_url}/v1/audio/transcriptions",
+        "SF_HEALTH_URL": f"{mock_url}/",
+        "BAIDU_WS_URL": f"ws://127.0.0.1:{mock_port}/realtime_asr",
+        "BAIDU_TOKEN_URL": f"{mock_url}/oauth/2.0/token",
+    })
+    for key, value in (("BAIDU_APP_ID", "10000"), ("BAIDU_API_KEY", "mock"), ("BAIDU_SECRET_KEY", "mock")):
+        env.setdefault(key, value)
+    bridge = subprocess.Popen(
+        [sys.executable, str(DESKTOP_DIR / "backend" / "main.py")], env=env, stdout=log_file, stderr=log_file
+    )
+    base_url = f"http://127.0.0.1:{bridge_port}"
+    wait_http(f"{base_url}/health", 300, bridge)
+    return base_url, mock_url, [bridge, mock]
+
+
+def summarize(results: List[SessionResult], elapsed: float):
+    latencies = sorted(l * 1000 for r in results for l in r.latencies)
+    pick = lambda q: latencies[min(len(latencies) - 1, int(q * len(latencies)))] if latencies else float("nan")
+    finals = sum(r.finals for r in results)
+    print(f"\nSessions: {len(results)}  wall time: {elapsed:.1f}s")
+    print(
+        f"Finals: {finals}  partials: {sum(r.partials for r in results)}  errors: {sum(r.errors for r in results)}  "
+        f"missing: {sum(r.missing for r in results)}  unmatched: {sum(r.unmatched for r in results)}"
+    )
+    if latencies:
+        print(
+            f"End-to-end latency (utterance end -> sentence_complete): n={len(latencies)} "
+            f"p50={pick(0.5):.0f}ms p90={pick(0.9):.0f}ms p99={pick(0.99):.0f}ms max={latencies[-1]:.0f}ms"
+        )
+
+
+async def run_all(base_url: str, args) -> List[SessionResult]:
+    base_ws = base_url.replace("http://", "ws://").replace("https://", "wss://")
+    results = await asyncio.gather(
+        *(run_session(base_ws, i, args) for i in range(args.sessions)), return_exceptions=True
+    )
+    ok = []
+    for i, res in enumerate(results):
+        if isinstance(res, Exception):
+            print(f"Session {i} failed: {res!r}", file=sys.stderr)
+        else:
+            ok.append(res)
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ASR bridge load test")
+    parser.add_argument("--url", help="已运行的桥接服务地址，如 http://127.0.0.1:8000")
+    parser.add_argument("--spawn", choices=["siliconflow", "baidu"], help="自动启动模拟云服务 + 桥接服务")
+    parser.add_argument("--mock-args", default="", help="传给 mock-cloud-asr.py 的参数")
+    parser.add_argument("--sessions", type=int, default=4)
+    parser.add_argument("--duration", type=float, default=30.0, help="每个会话的合成音频时长（秒）")
+    parser.add_argument("--audio", help="16-bit WAV，替代合成音频")
+    parser.add_argument("--chunk-ms", type=int, default=200)
+    parser.add_argument("--speed", type=float, default=1.0, help="推送速率倍数（1 = 实时）")
+    parser.add_argument("--drain", type=float, default=30.0, help="发送结束后等待剩余结果的秒数")
+    parser.add_argument("--sample-rate", type=int, default=16000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--log", default=os.devnull, help="--spawn 时子进程日志文件")
+    args = parser.parse_args()
+
+    if not args.url and not args.spawn:
+        parser.error("either --url or --spawn is required")
+
+    procs: List[subprocess.Popen] = []
+    mock_url = None
+    log_file = open(args.log, "w")
+    try:
+        base_url = args.url
+        if args.spawn:
+            base_url, mock_url, procs = spawn_stack(args.spawn, args.mock_args, log_file)
+            print(f"Spawned {args.spawn} bridge at {base_url} (mock cloud at {mock_url})")
+
+        t0 = time.time()
+        results = asyncio.run(run_all(base_url.rstrip("/"), args))
+        summarize(results, time.time() - t0)
+
+        metrics = fetch_json(f"{base_url.rstrip('/')}/metrics")
+        if metrics:
+            print("\nWorker metrics:")
+            print(json.dumps(metrics.get("worker_metrics", metrics), ensure_ascii=False, indent=2))
+        if mock_url:
+            print("\nMock cloud stats:")
+            print(json.dumps(fetch_json(f"{mock_url}/mock/stats"), ensure_ascii=False, indent=2))
+    finally:
+        for proc in procs:
+            proc.terminate()
+            try:
+                proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+        log_file.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
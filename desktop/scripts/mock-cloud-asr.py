@@ -0,0 +1,316 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+云端 ASR 本地模拟服务（SiliconFlow + 百度实时语音）
+
+用于在没有 API Key / 外网的情况下压测云端 Worker，调优对冲、连接池与短段合并参数。
+
+提供的接口：
+- POST /v1/audio/transcriptions      SiliconFlow 兼容（multipart: file, model），返回 {"text": ...}
+- GET/POST /oauth/2.0/token          百度鉴权，返回固定 access_token
+- WS   /realtime_asr                 百度实时识别协议：START -> 二进制 PCM -> FINISH，
+                                     按音频能量断句，推送 MID_TEXT / FIN_TEXT
+- GET  /mock/stats                   注入的延迟、错误、限流统计
+- HEAD/GET /                         健康检查（Worker 连接预热/保活使用）
+
+故障注入：
+- --latency    识别延迟分布：fixed:300 / uniform:100,500 / lognormal:300,0.5（中位数 ms, sigma）
+               / bimodal:150,2000,0.1（快, 慢, 慢请求概率，模拟长尾）
+- --error-rate 请求失败概率（HTTP 500 / WS err_no=-3005 后断开）
+- --rate-limit 每秒允许的请求数（令牌桶，超出返回 429 / WS 拒绝连接）
+- --max-concurrency 同时处理的请求 / WS 会话上限（超出返回 429 / WS 拒绝连接）
+
+Worker 指向本服务：
+    SILICONFLOW_API_URL=http://127.0.0.1:8790/v1/audio/transcriptions SF_HEALTH_URL=http://127.0.0.1:8790/
+    BAIDU_WS_URL=ws://127.0.0.1:8790/realtime_asr BAIDU_TOKEN_URL=http://127.0.0.1:8790/oauth/2.0/token
+
+用法：
+    python scripts/mock-cloud-asr.py --port 8790 --latency bimodal:200,2500,0.1 --error-rate 0.02
+"""
+
+import argparse
+import asyncio
+import io
+import json
+import random
+import sys
+import threading
+import time
+import uuid
+from typing import Callable, List
+
+import numpy as np
+import uvicorn
+from fastapi import FastAPI, File, Form, UploadFile, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, Response
+
+
+def parse_latency(spec: str) -> Callable[[], float]:
+    """解析延迟分布描述，返回采样函数（单位：秒）"""
+    kind, _, raw = spec.partition(":")
+    args = [float(x) for x in raw.split(",") if x] if raw else []
+    kind = kind.strip().lower()
+    if kind == "fixed":
+        ms = args[0] if args else 0.0
+        return lambda: ms / 1000.0
+    if kind == "uniform":
+        lo, hi = args
+        return lambda: random.uniform(lo, hi) / 1000.0
+    if kind == "lognormal":
+        median, sigma = args
+        return lambda: median * random.lognormvariate(0.0, sigma) / 1000.0
+    if kind == "bimodal":
+        fast, slow, p_slow = args
+        return lambda: (slow if random.random() < p_slow else fast) * random.uniform(0.8, 1.2) / 1000.0
+    raise ValueError(f"Unknown latency spec: {spec}")
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.capacity = max(1.0, burst)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def try_acquire(self) -> bool:
+        if self.rate <= 0:
+            return True
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1.0:
+                self.tokens -= 1.0
+                return True
+            return False
+
+
+class MockStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {
+            "http_requests": 0,
+            "http_ok": 0,
+            "ws_sessions": 0,
+            "ws_fin_texts": 0,
+            "ws_mid_texts": 0,
+            "errors_injected": 0,
+            "throttled": 0,
+        }
+        self.latencies: List[float] = []
+
+    def incr(self, key: str, n: int = 1):
+        with self.lock:
+            self.counters[key] += n
+
+    def record_latency(self, seconds: float):
+        with self.lock:
+            self.latencies.append(seconds * 1000.0)
+            if len(self.latencies) > 10000:
+                del self.latencies[:5000]
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            ordered = sorted(self.latencies)
+            counters = dict(self.counters)
+        pick = lambda q: round(ordered[min(len(ordered) - 1, int(q * len(ordered)))], 1) if ordered else None
+        return {**counters, "injected_latency_ms": {"p50": pick(0.5), "p90": pick(0.9), "p99": pick(0.99)}}
+
+
+def audio_seconds(data: bytes) -> float:
+    """估算上传音频时长：能解码就用 soundfile，否则按 16k/16bit PCM 估算"""
+    try:
+        import soundfile as sf
+
+        info = sf.info(io.BytesIO(data))
+        return info.frames / float(info.samplerate)
+    except Exception:
+        return max(0.0, (len(data) - 44) / 32000.0)
+
+
+def create_app(args) -> FastAPI:
+    app = FastAPI()
+    latency = parse_latency(args.latency)
+    bucket = TokenBucket(args.rate_limit, args.burst or args.rate_limit)
+    stats = MockStats()
+    state = {"active": 0}
+
+    def admit() -> bool:
+        if args.max_concurrency and state["active"] >= args.max_concurrency:
+            stats.incr("throttled")
+            return False
+        if not bucket.try_acquire():
+            stats.incr("throttled")
+            return False
+        return True
+
+    def should_fail() -> bool:
+        if random.random() < args.error_rate:
+            stats.incr("errors_injected")
+            return True
+        return False
+
+    @app.api_route("/", methods=["GET", "HEAD"])
+    async def root():
+        return Response(status_code=200)
+
+    @app.get("/mock/stats")
+    async def mock_stats():
+        return JSONResponse({**stats.snapshot(), "active": state["active"]})
+
+    @app.api_route("/oauth/2.0/token", methods=["GET", "POST"])
+    async def token():
+        return {"access_token": "mock-token", "expires_in": 2592000, "scope": "audio_voice_assistant_get"}
+
+    @app.post("/v1/audio/transcriptions")
+    async def transcriptions(file: UploadFile = File(...), model: str = Form("mock")):
+        stats.incr("http_requests")
+        if not admit():
+            return JSONResponse({"code": 50603, "message": "Request was rejected due to rate limiting"}, status_code=429)
+        state["active"] += 1
+        try:
+            data = await file.read()
+            delay = latency()
+            stats.record_latency(delay)
+            await asyncio.sleep(delay)
+            if should_fail():
+                return JSONResponse({"code": 50500, "message": "mock injected failure"}, status_code=500)
+            stats.incr("http_ok")
+            seconds = audio_seconds(data)
+            return {"text": args.text.format(seconds=seconds, model=model)}
+        finally:
+            state["active"] -= 1
+
+    @app.websocket("/realtime_asr")
+    async def realtime_asr(websocket: WebSocket):
+        await websocket.accept()
+        sn = websocket.query_params.get("sn") or uuid.uuid4().hex
+        stats.incr("ws_sessions")
+
+        async def send(payload: dict):
+            try:
+                await websocket.send_text(json.dumps({"err_no": 0, "err_msg": "OK", "sn": sn, "log_id": random.randint(1, 1 << 31), **payload}, ensure_ascii=False))
+            except Exception:
+                pass
+
+        if not admit():
+            await send({"err_no": -3101, "err_msg": "mock rate limited", "type": "FIN_TEXT", "result": ""})
+            await websocket.close()
+            return
+
+        state["active"] += 1
+        frame_sec = 0.02
+        audio_pos = 0.0  # 已接收音频时长（秒）
+        speech_start = None
+        last_voice = 0.0
+        last_mid = 0.0
+        sentence_idx = 0
+        pending: List[asyncio.Task] = []
+        closed = asyncio.Event()
+
+        async def emit_final(start: float, end: float, idx: int):
+            delay = latency()
+            stats.record_latency(delay)
+            await asyncio.sleep(delay)
+            if closed.is_set():
+                return
+            if should_fail():
+                await send({"err_no": -3005, "err_msg": "asr server internal error", "type": "FIN_TEXT", "result": ""})
+                closed.set()
+                try:
+                    await websocket.close()
+                except Exception:
+                    pass
+                return
+            stats.incr("ws_fin_texts")
+            await send({
+                "type": "FIN_TEXT",
+                "result": args.text.format(seconds=end - start, model="baidu") + f"#{idx}",
+                "start_time": int(start * 1000),
+                "end_time": int(end * 1000),
+            })
+
+        def finish_sentence():
+            nonlocal speech_start, sentence_idx
+            sentence_idx += 1
+            pending.append(asyncio.create_task(emit_final(speech_start, last_voice, sentence_idx)))
+            speech_start = None
+
+        try:
+            while not closed.is_set():
+                message = await websocket.receive()
+                if message["type"] == "websocket.disconnect":
+                    break
+                if message.get("text"):
+                    frame = json.loads(message["text"])
+                    if frame.get("type") == "FINISH":
+                        if speech_start is not None:
+                            finish_sentence()
+                        await asyncio.gather(*pending, return_exceptions=True)
+                        break
+                    continue
+                data = message.get("bytes")
+                if not data:
+                    continue
+                pcm = np.frombuffer(data[: len(data) // 2 * 2], dtype=np.int16).astype(np.float32)
+                step = max(1, int(frame_sec * args.sample_rate))
+                for i in range(0, len(pcm), step):
+                    frame = pcm[i:i + step]
+                    audio_pos += len(frame) / float(args.sample_rate)
+                    voiced = frame.size and float(np.sqrt(np.mean(frame ** 2))) >= args.speech_rms
+                    if voiced:
+                        if speech_start is None:
+                            speech_start = audio_pos
+                            last_mid = audio_pos
+                        last_voice = audio_pos
+                    if speech_start is not None and audio_pos - last_mid >= args.mid_interval_ms / 1000.0:
+                        last_mid = audio_pos
+                        stats.incr("ws_mid_texts")
+                        await send({"type": "MID_TEXT", "result": "模拟" * max(1, int((audio_pos - speech_start) * 3))})
+                    if speech_start is not None and audio_pos - last_voice >= args.fin_silence_ms / 1000.0:
+                        finish_sentence()
+        except (WebSocketDisconnect, RuntimeError):
+            pass
+        finally:
+            state["active"] -= 1
+            for task in pending:
+                if not task.done():
+                    task.cancel()
+            try:
+                await websocket.close()
+            except Exception:
+                pass
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local mock for SiliconFlow / Baidu realtime ASR")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8790)
+    parser.add_argument("--latency", default="lognormal:300,0.4", help="识别延迟分布（见文件头说明）")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="每秒请求数上限，0 不限")
+    parser.add_argument("--burst", type=float, default=0.0, help="令牌桶容量，默认等于 rate-limit")
+    parser.add_argument("--max-concurrency", type=int, default=0, help="并发上限，0 不限")
+    parser.add_argument("--text", default="模拟识别结果{seconds:.1f}秒", help="返回文本模板，可用 {seconds} {model}")
+    parser.add_argument("--sample-rate", type=int, default=16000)
+    parser.add_argument("--speech-rms", type=float, default=300.0, help="WS 断句的能量阈值（int16 量程）")
+    parser.add_argument("--mid-interval-ms", type=float, default=400.0)
+    parser.add_argument("--fin-silence-ms", type=float, default=600.0)
+    args = parser.parse_args()
+
+    parse_latency(args.latency)  # 启动前校验
+    print(
+        f"[Mock ASR] http://{args.host}:{args.port} latency={args.latency} error_rate={args.error_rate} "
+        f"rate_limit={args.rate_limit} max_concurrency={args.max_concurrency}",
+        file=sys.stderr,
+    )
+    uvicorn.run(create_app(args), host=args.host, port=args.port, log_level="warning")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,329 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+FunASR Worker 滚动重启 / zygote / 共享权重 端到端检查
+
+启动桥接服务（默认 ASR_ZYGOTE=1），N 个会话通过 /ws/transcribe 按实时速率推送合成的"说话 + 停顿"音频，
+推送过程中调用 POST /workers/restart（可多次），检查：
+- zygote：Worker 由模板进程 fork（startup.fork），重启后 zygote 不变、新 Worker 同样是 fork 出来的
+- 共享权重：FUNASR_SHARED_WEIGHTS 生效时模型确实从外置权重加载，并打印 Worker / zygote 的 PSS 与共享内存；
+  zygote 模式下 fork 出的 Worker 独占内存应远小于 zygote
+- 迁移：每次重启换了新 pid，已在推送的会话全部出现在 migrated 中，旧 Worker 随后退出
+- 不丢结果：重启后各会话继续收到 partial 和 sentence_complete，每句都有结果（missing=0），
+  没有 error，桥接层内部消息（session_snapshot / session_imported）不会发到客户端
+
+全部通过返回 0，否则返回 1。例如：
+
+    python scripts/test-rolling-restart.py --sessions 2 --duration 30 --restarts 2
+    FUNASR_SHARED_WEIGHTS=0 python scripts/test-rolling-restart.py --no-zygote   # 对比普通启动
+    python scripts/test-rolling-restart.py --url http://127.0.0.1:8000           # 检查已启动的服务
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import numpy as np
+import websockets
+
+SCRIPTS_DIR = Path(__file__).resolve().parent
+DESKTOP_DIR = SCRIPTS_DIR.parent
+INTERNAL_TYPES = {"session_snapshot", "session_imported"}
+
+
+def free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def synth_conversation(seconds: float, sample_rate: int, seed: int) -> Tuple[np.ndarray, List[Tuple[float, float]]]:
+    """合成会话音频，返回 (int16 PCM, [(句子开始秒, 句子结束秒)])"""
+    rng = np.random.default_rng(seed)
+    parts, utterances, pos = [], [], 0.0
+    while pos < seconds:
+        # 停顿要明显长于 Worker 的断句静音（默认 3 x 200ms），否则相邻两句可能按块对齐后被并成一句
+        silence = rng.uniform(1.0, 1.8)
+        parts.append(np.zeros(int(silence * sample_rate), dtype=np.int16))
+        pos += silence
+        dur = rng.uniform(0.8, 3.0)
+        t = np.arange(int(dur * sample_rate)) / sample_rate
+        f0 = rng.uniform(120, 240) + 30 * np.sin(2 * np.pi * 0.8 * t)
+        phase = 2 * np.pi * np.cumsum(f0) / sample_rate
+        voiced = sum(np.sin(k * phase) / k for k in range(1, 6)) * 5000
+        parts.append(np.clip(voiced, -32768, 32767).astype(np.int16))
+        utterances.append((pos, pos + dur))
+        pos += dur
+    parts.append(np.zeros(int(1.5 * sample_rate), dtype=np.int16))
+    return np.concatenate(parts), utterances
+
+
+def fetch_json(url: str, method: str = "GET", timeout: float = 30) -> Tuple[int, Optional[dict]]:
+    request = urllib.request.Request(url, method=method)
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as resp:
+            return resp.status, json.loads(resp.read().decode("utf-8"))
+    except urllib.error.HTTPError as exc:
+        body = exc.read().decode("utf-8", errors="ignore")
+        return exc.code, {"detail": body}
+    except Exception as exc:
+        return 0, {"detail": repr(exc)}
+
+
+def wait_http(url: str, timeout: float, proc: Optional[subprocess.Popen] = None):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if proc is not None and proc.poll() is not None:
+            raise RuntimeError(f"process exited early with code {proc.returncode}")
+        try:
+            urllib.request.urlopen(url, timeout=2).close()
+            return
+        except Exception:
+            time.sleep(0.3)
+    raise RuntimeError(f"{url} not ready after {timeout}s")
+
+
+def pid_alive(pid: int) -> bool:
+    return os.path.exists(f"/proc/{pid}")
+
+
+class SessionLog:
+    def __init__(self, session_id: str):
+        self.session_id = session_id
+        self.partials: List[float] = []  # 收到时刻
+        self.finals: List[float] = []
+        self.errors: List[dict] = []
+        self.leaked: List[str] = []
+        self.missing = 0
+        self.started = False  # 已发出第一块音频（重启时应被迁移）
+
+
+async def run_session(base_ws: str, log: SessionLog, seed: int, args):
+    audio, utterances = synth_conversation(args.duration, args.sample_rate, seed)
+    chunk = int(args.sample_rate * args.chunk_ms / 1000)
+    pending_ends: List[float] = []
+    async with websockets.connect(f"{base_ws}/ws/transcribe?session_id={log.session_id}", max_size=None) as ws:
+
+        async def receiver():
+            async for raw in ws:
+                msg = json.loads(raw)
+                now = time.time()
+                msg_type = msg.get("type")
+                if msg_type in INTERNAL_TYPES:
+                    log.leaked.append(msg_type)
+                elif msg.get("status") == "error":
+                    log.errors.append(msg)
+                elif msg_type in ("partial", "partial_result"):
+                    log.partials.append(now)
+                elif msg_type == "sentence_complete":
+                    log.finals.append(now)
+                    for _ in range(len(msg.get("segment_seqs") or [None])):
+                        if pending_ends and pending_ends[0] <= now:
+                            pending_ends.pop(0)
+
+        recv_task = asyncio.create_task(receiver())
+        t0 = time.time()
+        next_utt = 0
+        for pos in range(0, len(audio), chunk):
+            await ws.send(audio[pos:pos + chunk].tobytes())
+            log.started = True
+            audio_t = (pos + chunk) / float(args.sample_rate)
+            while next_utt < len(utterances) and utterances[next_utt][1] <= audio_t:
+                pending_ends.append(time.time())
+                next_utt += 1
+            delay = t0 + audio_t - time.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+        await ws.send(json.dumps({"type": "force_commit"}))
+        deadline = time.time() + args.drain
+        while pending_ends and time.time() < deadline:
+            await asyncio.sleep(0.1)
+        recv_task.cancel()
+        log.missing = len(pending_ends)
+
+
+async def run_restarts(base_url: str, logs: List[SessionLog], args) -> List[Tuple[float, int, dict]]:
+    """在推送过程中均匀地调用 POST /workers/restart，返回 [(调用时刻, HTTP 状态, 响应)]"""
+    results = []
+    t0 = time.time()
+    for i in range(args.restarts):
+        at = t0 + args.duration * (i + 1) / (args.restarts + 1)
+        await asyncio.sleep(max(0.0, at - time.time()))
+        active = sorted(log.session_id for log in logs if log.started)
+        called_at = time.time()
+        status, reply = await asyncio.to_thread(fetch_json, f"{base_url}/workers/restart", "POST", 120)
+        reply = reply or {}
+        reply["_expected_sessions"] = active
+        print(
+            f"Restart #{i + 1}: HTTP {status} pid {reply.get('old_pid')} -> {reply.get('new_pid')} "
+            f"migrated={reply.get('migrated')} pause={reply.get('pause_ms')}ms held={reply.get('held_messages')}"
+        )
+        results.append((called_at, status, reply))
+    return results
+
+
+def describe_worker(metrics: dict) -> dict:
+    worker = metrics.get("worker") or {}
+    startup = worker.get("startup") or {}
+    zygote = worker.get("zygote") or {}
+    return {
+        "pid": worker.get("pid"),
+        "fork": startup.get("fork"),
+        "shared_weights": startup.get("shared_weights"),
+        "memory": worker.get("memory"),
+        "zygote_pid": zygote.get("pid"),
+        "zygote_memory": zygote.get("memory"),
+    }
+
+
+class Checks:
+    def __init__(self):
+        self.failed = 0
+
+    def check(self, ok: bool, label: str, detail: str = ""):
+        print(f"  [{'PASS' if ok else 'FAIL'}] {label}{(' - ' + detail) if detail else ''}")
+        if not ok:
+            self.failed += 1
+
+
+def fmt_memory(memory: Optional[dict]) -> str:
+    if not memory:
+        return "n/a"
+    return f"pss={memory.get('pss_mb')}MB private={memory.get('private_mb')}MB shared={memory.get('shared_mb')}MB"
+
+
+async def run_all(base_url: str, args) -> Tuple[List[SessionLog], List[Tuple[float, int, dict]]]:
+    base_ws = base_url.replace("http://", "ws://").replace("https://", "wss://")
+    tag = int(time.time())
+    logs = [SessionLog(f"restart-{i}-{tag}") for i in range(args.sessions)]
+    sessions = [run_session(base_ws, log, args.seed + i, args) for i, log in enumerate(logs)]
+    results = await asyncio.gather(run_restarts(base_url, logs, args), *sessions, return_exceptions=True)
+    for res in results[1:]:
+        if isinstance(res, Exception):
+            print(f"Session failed: {res!r}", file=sys.stderr)
+    if isinstance(results[0], Exception):
+        raise results[0]
+    return logs, results[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="FunASR worker rolling restart / zygote / shared weights check")
+    parser.add_argument("--url", help="已运行的桥接服务地址（不填则自动启动 backend/main.py）")
+    parser.add_argument("--no-zygote", action="store_true", help="自动启动时不开启 ASR_ZYGOTE")
+    parser.add_argument("--sessions", type=int, default=2)
+    parser.add_argument("--duration", type=float, default=20.0, help="每个会话的合成音频时长（秒）")
+    parser.add_argument("--restarts", type=int, default=1, help="推送期间的滚动重启次数")
+    parser.add_argument("--chunk-ms", type=int, default=200)
+    parser.add_argument("--drain", type=float, default=20.0, help="推送结束后等待剩余结果的秒数")
+    parser.add_argument("--sample-rate", type=int, default=16000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--log", default=os.devnull, help="自动启动时桥接服务的日志文件")
+    args = parser.parse_args()
+
+    bridge = None
+    log_file = open(args.log, "w")
+    try:
+        base_url = (args.url or "").rstrip("/")
+        if not args.url:
+            port = free_port()
+            zygote = "0" if args.no_zygote else "1"
+            env = dict(os.environ, ASR_ENGINE="funasr", ASR_PORT=str(port), ASR_ZYGOTE=zygote)
+            bridge = subprocess.Popen(
+                [sys.executable, str(DESKTOP_DIR / "backend" / "main.py")], env=env, stdout=log_file, stderr=log_file
+            )
+            base_url = f"http://127.0.0.1:{port}"
+            wait_http(f"{base_url}/health", 300, bridge)
+            print(f"Spawned funasr bridge at {base_url} (ASR_ZYGOTE={zygote})")
+
+        _, metrics = fetch_json(f"{base_url}/metrics")
+        before = describe_worker(metrics or {})
+        # 自动启动时按参数判断是否应走 zygote；检查已有服务时以 /metrics 里是否有 zygote 为准
+        zygote = not args.no_zygote if bridge is not None else before["zygote_pid"] is not None
+        shared = before["shared_weights"] or {}
+        print(f"Worker pid={before['pid']} fork={before['fork']}")
+        print(f"Shared weights: enabled={shared.get('enabled')} models={shared.get('models')}")
+        print(f"Worker memory: {fmt_memory(before['memory'])}")
+        if before["zygote_pid"]:
+            print(f"Zygote pid={before['zygote_pid']} memory: {fmt_memory(before['zygote_memory'])}")
+
+        logs, restarts = asyncio.run(run_all(base_url, args))
+
+        _, metrics = fetch_json(f"{base_url}/metrics")
+        after = describe_worker(metrics or {})
+        print(f"After restart: worker pid={after['pid']} memory: {fmt_memory(after['memory'])}")
+
+        checks = Checks()
+        print("\nChecks:")
+        if zygote:
+            checks.check(bool(before["fork"]), "initial worker forked from zygote", str(before["fork"]))
+            checks.check(bool(after["fork"]), "replacement worker forked from zygote", str(after["fork"]))
+            checks.check(
+                before["zygote_pid"] is not None and before["zygote_pid"] == after["zygote_pid"],
+                "zygote survives restarts", f"{before['zygote_pid']} -> {after['zygote_pid']}",
+            )
+            # 模型都在 zygote 里加载，fork 出的 Worker 独占内存应远小于 zygote（新增一个 Worker 的边际成本）
+            # （与 Worker 共享的页不再计入 zygote 的 private，这里和 zygote 的 pss 比）
+            worker_private = (after["memory"] or {}).get("private_mb")
+            zygote_pss = (after["zygote_memory"] or {}).get("pss_mb")
+            if worker_private is not None and zygote_pss:
+                checks.check(
+                    worker_private < zygote_pss / 2, "forked worker shares the zygote's memory",
+                    f"worker private={worker_private}MB, zygote pss={zygote_pss}MB",
+                )
+        if shared.get("enabled"):
+            checks.check(bool(shared.get("models")), "models loaded from shared external weights", str(shared.get("models")))
+
+        for i, (_, status, reply) in enumerate(restarts, 1):
+            checks.check(status == 200, f"restart #{i} succeeded", f"HTTP {status} {reply.get('detail', '')}".strip())
+            if status != 200:
+                continue
+            checks.check(reply.get("new_pid") != reply.get("old_pid"), f"restart #{i} replaced the worker")
+            missing = sorted(set(reply["_expected_sessions"]) - set(reply.get("migrated") or []))
+            checks.check(not missing, f"restart #{i} migrated all active sessions", f"not migrated: {missing}" if missing else "")
+            if bridge is not None and reply.get("old_pid"):
+                deadline = time.time() + 10
+                while pid_alive(reply["old_pid"]) and time.time() < deadline:
+                    time.sleep(0.2)
+                checks.check(not pid_alive(reply["old_pid"]), f"restart #{i} retired the old worker", f"pid {reply['old_pid']}")
+        if restarts:
+            checks.check(after["pid"] == restarts[-1][2].get("new_pid"), "bridge serves the last replacement worker")
+
+        last_restart = restarts[-1][0] if restarts else 0.0
+        for log in logs:
+            label = log.session_id
+            checks.check(log.missing == 0, f"{label}: every utterance got a sentence", f"missing={log.missing}")
+            checks.check(not log.errors, f"{label}: no errors", str(log.errors[:1]) if log.errors else "")
+            checks.check(not log.leaked, f"{label}: no internal messages leaked", str(sorted(set(log.leaked))))
+            checks.check(
+                any(t > last_restart for t in log.partials), f"{label}: partials continue after restart",
+                f"partials={len(log.partials)}",
+            )
+            checks.check(
+                any(t > last_restart for t in log.finals), f"{label}: sentences continue after restart",
+                f"sentences={len(log.finals)}",
+            )
+
+        print(f"\n{'FAILED' if checks.failed else 'OK'}: {checks.failed} check(s) failed")
+        return 1 if checks.failed else 0
+    finally:
+        if bridge is not None:
+            bridge.terminate()
+            try:
+                bridge.wait(timeout=15)
+            except subprocess.TimeoutExpired:
+                bridge.kill()
+        log_file.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -11,6 +11,21 @@ FunASR Worker with Streaming Recognition
 3. 中文标点符号优化
 4. 混合分句策略
 
+标点与分句在后台线程进行：流式路径只做识别并立即发送原文 partial，然后为会话登记标点请求；
+每个会话只保留最新一次请求（latest-wins），取出时才截取最新的不稳定原文，
+标点完成后异步发送带标点的 partial 或 sentence_complete，partial 延迟与标点模型耗时无关
+
+启动预热（ASR_WARMUP，默认开启）：发送 ready 之前用合成音频 / 固定文本把流式模型和标点模型各跑一遍，
+ready 消息的 startup 字段带回导入 / 各模型加载 / 预热耗时（毫秒）
+
+torch 运行时配置（FUNASR_RUNTIME_PROFILE，默认 fast）：
+- default：torch 默认设置，加载 fa-zh 时间戳模型（旧行为）
+- fast：识别与标点调用包在 torch.inference_mode() 中；torch 线程数 = ASR_CPU_THREADS（主进程分配的线程预算），未分配时用 CPU 核数；
+  不加载未被使用的 fa-zh 时间戳模型
+- int8：在 fast 基础上对流式模型和标点模型的 Linear 层做动态 INT8 量化
+FUNASR_TORCH_THREADS / FUNASR_QUANTIZE_LINEAR / FUNASR_TIMESTAMP_MODEL 可单独覆盖；
+生效的配置与导入 / 加载 / 预热后的常驻内存随 startup 字段返回，各配置对比见 scripts/bench-funasr-profiles.py
+
 IPC 协议：
 - 输入：streaming_chunk, batch_file, reset_session, force_commit
 - 输出：
@@ -19,17 +34,23 @@ IPC 协议：
 """
 
 import base64
+import contextlib
 import json
 import math
 import os
 import sys
+import threading
 import time
 import traceback
 from dataclasses import dataclass, field
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple
 
+_import_started = time.perf_counter()
 import numpy as np
 from funasr import AutoModel
+IMPORT_MS = round((time.perf_counter() - _import_started) * 1000, 1)
+
+from synth_voice import synth_voiced_clip
 
 # ==============================================================================
 # OS 级别的文件描述符重定向
@@ -40,12 +61,16 @@ os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
 sys.stdout = sys.stderr
 
 
+_ipc_lock = threading.Lock()  # 主线程与标点线程都会发消息
+
+
 def send_ipc_message(data):
     """发送 JSON 消息到 Node.js"""
     try:
         json_str = json.dumps(data, ensure_ascii=False)
-        ipc_channel.write(json_str + "\n")
-        ipc_channel.flush()
+        with _ipc_lock:
+            ipc_channel.write(json_str + "\n")
+            ipc_channel.flush()
     except Exception as exc:
         sys.stderr.write(f"[IPC Error] Failed to send: {exc}\n")
         sys.stderr.flush()
@@ -57,6 +82,46 @@ def send_ipc_message(data):
 os.environ["CUDA_VISIBLE_DEVICES"] = "-1"
 os.environ.setdefault("TQDM_DISABLE", "1")
 
+# torch 运行时配置：torch_threads 0 = 不设置（torch 默认），-1 = ASR_CPU_THREADS，未分配时 CPU 核数
+RUNTIME_PROFILES = {
+    "default": {"inference_mode": False, "torch_threads": 0, "quantize_linear": False, "timestamp_model": True},
+    "fast": {"inference_mode": True, "torch_threads": -1, "quantize_linear": False, "timestamp_model": False},
+    "int8": {"inference_mode": True, "torch_threads": -1, "quantize_linear": True, "timestamp_model": False},
+}
+
+
+def _env_flag(name: str, default: bool) -> bool:
+    value = os.environ.get(name)
+    if value is None or not value.strip():
+        return default
+    return value.strip().lower() not in {"0", "false", "no", "off"}
+
+
+def resolve_runtime_profile() -> Dict:
+    """FUNASR_RUNTIME_PROFILE 选定的配置，叠加单项环境变量覆盖"""
+    name = os.environ.get("FUNASR_RUNTIME_PROFILE", "fast").strip().lower()
+    if name not in RUNTIME_PROFILES:
+        sys.stderr.write(f"[FunASR Worker] Unknown FUNASR_RUNTIME_PROFILE={name}, using fast\n")
+        sys.stderr.flush()
+        name = "fast"
+    profile = {"name": name, **RUNTIME_PROFILES[name]}
+    try:
+        profile["torch_threads"] = int(os.environ.get("FUNASR_TORCH_THREADS", profile["torch_threads"]))
+    except ValueError:
+        pass
+    profile["quantize_linear"] = _env_flag("FUNASR_QUANTIZE_LINEAR", profile["quantize_linear"])
+    profile["timestamp_model"] = _env_flag("FUNASR_TIMESTAMP_MODEL", profile["timestamp_model"])
+    if profile["torch_threads"] < 0:
+        try:
+            budget = int(os.environ.get("ASR_CPU_THREADS", "0") or 0)
+        except ValueError:
+            budget = 0
+        profile["torch_threads"] = budget if budget > 0 else max(1, os.cpu_count() or 2)
+    return profile
+
+
+RUNTIME_PROFILE = resolve_runtime_profile()
+
 HF_HOME = os.environ.get("HF_HOME")
 DEFAULT_CACHE_DIR = os.path.join(HF_HOME, "hub") if HF_HOME else os.path.expanduser("~/.cache/huggingface/hub")
 CACHE_DIR = os.environ.get("ASR_CACHE_DIR") or DEFAULT_CACHE_DIR
@@ -93,10 +158,17 @@ MAX_SENTENCE_SECONDS = float(os.environ.get("MAX_SENTENCE_SECONDS", "20"))  # 
 SEGMENT_GAP_THRESHOLD = float(os.environ.get("SEGMENT_GAP_THRESHOLD", "1.2"))  # 从0.5提高到1.2
 
 # 【优化】标点添加策略配置 - 降低延迟，提升响应速度
-PUNC_DEBOUNCE_INTERVAL = float(os.environ.get("PUNC_DEBOUNCE_INTERVAL", "0.3"))  # 从0.8降至0.3秒
+PUNC_DEBOUNCE_INTERVAL = float(os.environ.get("PUNC_DEBOUNCE_INTERVAL", "0.3"))  # 同一会话两次标点的最小间隔（秒）
 MIN_CHARS_FOR_PUNC = int(os.environ.get("MIN_CHARS_FOR_PUNC", "3"))  # 从6降至3个字符
 PUNC_CONTEXT_SENTENCES = int(os.environ.get("PUNC_CONTEXT_SENTENCES", "2"))  # 保留多少个已完成句子作为上下文
 
+# 启动预热
+WARMUP = os.environ.get("ASR_WARMUP", "1").lower() not in {"0", "false", "no"}
+WARMUP_SECONDS = float(os.environ.get("ASR_WARMUP_SECONDS", "3"))
+WARMUP_PUNC_TEXT = "今天的会议先到这里我们明天再继续讨论 see you tomorrow"
+
+STARTUP: Dict = {"import_ms": IMPORT_MS}  # 启动各阶段耗时（毫秒），随 ready 消息返回
+
 
 @dataclass
 class SentenceBuffer:
@@ -130,6 +202,10 @@ class SessionState:
     raw_text_buffer: str = ""  # 原始未加标点的文本缓冲
     stable_punctuated_text: str = ""  # 已稳定的标点化文本（最后一个句末标点之前）
     unstable_raw_text: str = ""  # 不稳定的原始文本（最后一个句末标点之后）
+    # 最近一次后台标点的输入原文与结果：新原文到达时显示文本沿用已标点的前缀
+    punctuated_raw: str = ""
+    punctuated_text: str = ""
+    epoch: int = 0  # reset 时递增，标点线程据此丢弃过期结果
 
     def append_audio(self, samples: np.ndarray):
         """累积音频数据"""
@@ -171,6 +247,30 @@ class SessionState:
         self.raw_text_buffer = ""
         self.stable_punctuated_text = ""
         self.unstable_raw_text = ""
+        self.punctuated_raw = ""
+        self.punctuated_text = ""
+        self.epoch += 1
+
+    def display_text(self) -> str:
+        """当前句的显示文本：已标点的前缀 + 之后新识别的原文"""
+        if self.punctuated_raw and self.unstable_raw_text.startswith(self.punctuated_raw):
+            tail = self.unstable_raw_text[len(self.punctuated_raw):]
+            return f"{self.stable_punctuated_text}{self.punctuated_text}{tail}"
+        return f"{self.stable_punctuated_text}{self.unstable_raw_text}"
+
+    def restart_sentence(self, tail: str, start_time: float):
+        """提交句子后开始新句；标点期间新识别的原文（tail）留给下一句"""
+        self.current_sentence = SentenceBuffer(text=tail, start_time=start_time if tail else 0.0)
+        self.last_partial_text = ""
+        self.raw_text_buffer = tail
+        self.stable_punctuated_text = ""
+        self.unstable_raw_text = tail
+        self.punctuated_raw = ""
+        self.punctuated_text = ""
+        self.last_punc_time = 0.0
+
+
+SESSION_LOCK = threading.Lock()  # 主线程与标点线程共享会话状态
 
 
 def decode_audio_chunk(audio_b64: str) -> np.ndarray:
@@ -255,6 +355,65 @@ def split_by_sentence_end(text: str) -> Tuple[List[str], str]:
     return sentences, remaining
 
 
+def elapsed_ms(started: float) -> float:
+    return round((time.perf_counter() - started) * 1000, 1)
+
+
+def current_rss_mb() -> Optional[float]:
+    """当前进程常驻内存（MB）；非 Linux 平台退回峰值 RSS"""
+    try:
+        with open("/proc/self/status", encoding="ascii", errors="ignore") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    try:
+        import resource
+
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+    except (ImportError, AttributeError):
+        return None
+
+
+def apply_torch_threads(profile: Dict):
+    """按配置设置 torch 线程数；inter-op 只留 1 个（模型逐个调用，不需要算子间并行）"""
+    threads = profile["torch_threads"]
+    if threads <= 0:
+        return
+    import torch
+
+    torch.set_num_threads(threads)
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        pass  # 已有并行任务运行过后不能再修改
+    sys.stderr.write(f"[FunASR Worker] torch threads: intra-op={threads}, inter-op={torch.get_num_interop_threads()}\n")
+    sys.stderr.flush()
+
+
+def inference_context():
+    """模型调用的上下文：开启 inference_mode 时不记录 autograd 信息（线程局部，每次调用都要进入）"""
+    if not RUNTIME_PROFILE["inference_mode"]:
+        return contextlib.nullcontext()
+    import torch
+
+    return torch.inference_mode()
+
+
+def quantize_linear_layers(model: AutoModel, label: str):
+    """对 AutoModel 内部 torch 模型的 Linear 层做动态 INT8 量化，失败时保留原模型"""
+    import torch
+
+    try:
+        model.model = torch.ao.quantization.quantize_dynamic(model.model, {torch.nn.Linear}, dtype=torch.qint8)
+        sys.stderr.write(f"[FunASR Worker] {label}: Linear layers quantized to INT8\n")
+    except Exception as exc:
+        sys.stderr.write(f"[FunASR Worker] {label}: INT8 quantization failed, keeping float weights: {exc}\n")
+    sys.stderr.flush()
+
+
 def load_funasr_models() -> Tuple[AutoModel, AutoModel, AutoModel]:
     """加载 FunASR 模型
     
@@ -270,31 +429,48 @@ def load_funasr_models() -> Tuple[AutoModel, AutoModel, AutoModel]:
     sys.stderr.write(f"[FunASR Worker] Chunk stride: {FUNASR_STRIDE_SAMPLES} samples ({FUNASR_STRIDE_SAMPLES/SAMPLE_RATE*1000:.0f}ms)\n")
     sys.stderr.flush()
 
+    load_timings = STARTUP.setdefault("model_load", {})
     try:
         # 流式识别模型 - 使用 FunASR 官方注册名称，内部会映射到 ModelScope 仓库
         # 【重要】指定 model_revision="v2.0.4" 与 Demo 保持一致
         sys.stderr.write("[FunASR Worker] Loading streaming ASR model: paraformer-zh-streaming (v2.0.4)\n")
+        started = time.perf_counter()
         stream_model = AutoModel(
             model="paraformer-zh-streaming",
             model_revision="v2.0.4",
         )
+        load_timings["stream_ms"] = elapsed_ms(started)
         sys.stderr.write("[FunASR Worker] Streaming model loaded\n")
 
         # 标点符号模型
         sys.stderr.write("[FunASR Worker] Loading punctuation model: ct-punc (v2.0.4)\n")
+        started = time.perf_counter()
         punc_model = AutoModel(
             model="ct-punc",
             model_revision="v2.0.4",
         )
+        load_timings["punc_ms"] = elapsed_ms(started)
         sys.stderr.write("[FunASR Worker] Punctuation model loaded\n")
 
-        # 时间戳预测模型（可选）
+        if RUNTIME_PROFILE["quantize_linear"]:
+            started = time.perf_counter()
+            quantize_linear_layers(stream_model, "Streaming model")
+            quantize_linear_layers(punc_model, "Punctuation model")
+            STARTUP["quantize_ms"] = elapsed_ms(started)
+
+        # 时间戳预测模型（可选）：当前流程不使用，fast / int8 配置下不加载
+        if not RUNTIME_PROFILE["timestamp_model"]:
+            sys.stderr.write("[FunASR Worker] Timestamp model skipped (FUNASR_TIMESTAMP_MODEL=0)\n")
+            sys.stderr.flush()
+            return stream_model, punc_model, None
         try:
             sys.stderr.write("[FunASR Worker] Loading timestamp model: fa-zh (v2.0.4)\n")
+            started = time.perf_counter()
             ts_model = AutoModel(
                 model="fa-zh",
                 model_revision="v2.0.4",
             )
+            load_timings["timestamp_ms"] = elapsed_ms(started)
             sys.stderr.write("[FunASR Worker] Timestamp model loaded\n")
         except Exception as e:
             sys.stderr.write(f"[FunASR Worker] Timestamp model load failed (optional): {e}\n")
@@ -310,6 +486,33 @@ def load_funasr_models() -> Tuple[AutoModel, AutoModel, AutoModel]:
         raise
 
 
+def build_warmup_clip(seconds: float) -> np.ndarray:
+    """预热片段：带基频起伏和停顿的合成浊音（-1~1 float32）"""
+    return synth_voiced_clip(seconds, SAMPLE_RATE)
+
+
+def warm_up(stream_model: AutoModel, punc_model: AutoModel) -> Dict[str, float]:
+    """
+    ready 之前按实际调用方式跑一遍流式识别（一次性 cache，按步长切块）和标点，返回各模型耗时（毫秒）。
+    两个调用内部都会吞掉异常，预热失败不影响启动
+    """
+    if not WARMUP:
+        return {}
+    clip = build_warmup_clip(WARMUP_SECONDS)
+    timings: Dict[str, float] = {}
+
+    started = time.perf_counter()
+    cache: Dict = {}
+    for i in range(0, len(clip), FUNASR_STRIDE_SAMPLES):
+        funasr_streaming_recognition(clip[i:i + FUNASR_STRIDE_SAMPLES], stream_model, cache)
+    timings["stream_ms"] = elapsed_ms(started)
+
+    started = time.perf_counter()
+    apply_punctuation(WARMUP_PUNC_TEXT, punc_model)
+    timings["punc_ms"] = elapsed_ms(started)
+    return timings
+
+
 def funasr_streaming_recognition(
     audio_array: np.ndarray,
     model: AutoModel,
@@ -323,14 +526,15 @@ def funasr_streaming_recognition(
     """
     try:
         # FunASR 流式识别调用
-        results = model.generate(
-            input=audio_array,
-            cache=cache,
-            is_final=is_final,
-            chunk_size=CHUNK_SIZE_LIST,
-            encoder_chunk_look_back=ENCODER_LOOK_BACK,
-            decoder_chunk_look_back=DECODER_LOOK_BACK,
-        )
+        with inference_context():
+            results = model.generate(
+                input=audio_array,
+                cache=cache,
+                is_final=is_final,
+                chunk_size=CHUNK_SIZE_LIST,
+                encoder_chunk_look_back=ENCODER_LOOK_BACK,
+                decoder_chunk_look_back=DECODER_LOOK_BACK,
+            )
 
         # 提取文本
         chunk_text = ""
@@ -356,7 +560,8 @@ def apply_punctuation(text: str, model: AutoModel) -> str:
         return text
 
     try:
-        response = model.generate(input=text.strip())
+        with inference_context():
+            response = model.generate(input=text.strip())
         if response and isinstance(response, list) and len(response) > 0:
             if isinstance(response[0], dict):
                 punctuated_text = response[0].get("text", "") or response[0].get("value", "")
@@ -458,6 +663,7 @@ def handle_streaming_chunk(
     punc_model: AutoModel,
     data: Dict,
     sessions_cache: Dict[str, SessionState],
+    punctuation: Optional["PunctuationStage"] = None,
 ):
     """
     【核心修复】按照固定 stride 大小处理流式音频
@@ -466,6 +672,7 @@ def handle_streaming_chunk(
     1. 累积音频数据到缓冲区
     2. 按照 FUNASR_STRIDE_SAMPLES (9600 samples = 600ms) 切分
     3. 每个 chunk 依次送入模型，维护 cache 连续性
+    4. 只做识别：标点、分句由 PunctuationStage 在后台完成
     """
     request_id = data.get("request_id", "default")
     session_id = data.get("session_id", request_id)
@@ -538,7 +745,7 @@ def handle_streaming_chunk(
         return
 
     # =========================================================================
-    # 分句处理逻辑
+    # 分句处理逻辑：标点与分句交给后台标点线程，这里只更新原文并发送原文 partial
     # =========================================================================
     chunk_start_time_ms = (state.processed_samples - len(samples)) / SAMPLE_RATE * 1000
     chunk_end_time_ms = state.processed_samples / SAMPLE_RATE * 1000
@@ -554,11 +761,9 @@ def handle_streaming_chunk(
         sentence_start_time_sec = chunk_start_time_ms / 1000
         state.current_sentence.start_time = sentence_start_time_sec
 
-    # 【优化1】立即更新显示文本（原始文本），不等待标点化
-    # 让UI能够实时显示任何识别到的内容
-    state.current_sentence.text = f"{state.stable_punctuated_text}{state.unstable_raw_text}"
+    # 立即更新显示文本，不等待标点化：已标点的前缀沿用上一次后台结果，之后是新识别的原文
+    state.current_sentence.text = state.display_text()
     
-    # 【优化2】先发送partial消息显示原始文本
     current_buffer = state.current_sentence.text
     if current_buffer:
         incremental = extract_incremental_text(state.last_partial_text, current_buffer).strip()
@@ -578,180 +783,264 @@ def handle_streaming_chunk(
             sys.stderr.flush()
             state.last_partial_text = current_buffer
 
-    # 【优化3】异步标点化 - 检查是否需要添加标点（防抖）
-    current_time = time.time()
-    should_punctuate = (
-        len(state.unstable_raw_text) >= MIN_CHARS_FOR_PUNC and
-        (current_time - state.last_punc_time) >= PUNC_DEBOUNCE_INTERVAL
-    )
-    
-    # 4. 如果满足条件，只对不稳定区域（新文本）添加标点
-    if should_punctuate:
-        # 使用增量标点化，保留上下文
-        new_punctuated = apply_incremental_punctuation(
-            state.stable_punctuated_text,
-            state.unstable_raw_text,
-            punc_model,
-            context_sentences=PUNC_CONTEXT_SENTENCES
-        )
-        
-        # 更新当前显示文本
-        state.current_sentence.text = f"{state.stable_punctuated_text}{new_punctuated}"
-        state.last_punc_time = current_time
-        
-        sys.stderr.write(
-            f"[FunASR Worker] 🔤 Incremental punctuation: "
-            f"stable={len(state.stable_punctuated_text)} chars, "
-            f"new_raw={len(state.unstable_raw_text)} chars, "
-            f"new_punc={len(new_punctuated)} chars\n"
-        )
-        sys.stderr.flush()
-        
-        # 【优化4】标点化后再次发送partial更新，优化显示效果
-        incremental_punc = extract_incremental_text(state.last_partial_text, state.current_sentence.text).strip()
-        if incremental_punc:
-            send_ipc_message({
-                "request_id": request_id,
-                "session_id": session_id,
-                "type": "partial",
-                "text": incremental_punc,
-                "full_text": state.current_sentence.text,
-                "timestamp": timestamp_ms,
-                "is_final": is_final,
-                "status": "success",
-                "language": "zh",
-            })
-            sys.stderr.write(f"[FunASR Worker] 📝 PARTIAL (punctuated): \"{incremental_punc[:30]}...\"\n")
-            sys.stderr.flush()
-            state.last_partial_text = state.current_sentence.text
-    
-    # 3. 对当前文本进行分句检查
-    text_for_split = state.current_sentence.text
-    
-    # 如果文本还未标点化，临时标点化用于分句判断
-    if not should_punctuate and len(state.unstable_raw_text) >= MIN_CHARS_FOR_PUNC:
-        temp_punctuated = apply_incremental_punctuation(
-            state.stable_punctuated_text,
-            state.unstable_raw_text,
-            punc_model,
-            context_sentences=PUNC_CONTEXT_SENTENCES
-        )
-        text_for_split = f"{state.stable_punctuated_text}{temp_punctuated}"
-    
-    # 4. 分句：从标点化的文本中提取完整句子
-    complete_sentences, remaining_text = split_by_sentence_end(text_for_split)
-    sentences_to_commit = [s for s in complete_sentences if len(s.strip()) >= MIN_SENTENCE_CHARS]
-
-    # 超过最大句子时长或结束块时强制提交
-    sentence_duration = 0.0
-    if sentence_start_time_sec:
-        sentence_duration = (chunk_end_time_ms / 1000) - sentence_start_time_sec
-    should_force_commit = sentence_duration >= MAX_SENTENCE_SECONDS or is_final
-
-    deferred_text = ""
-    commit_ready = []
-    for sentence in sentences_to_commit:
-        sentence_text = sentence.strip()
-        if not sentence_text:
-            continue
-        if (
-            len(sentence_text) < MIN_AUTO_COMMIT_CHARS
-            and not should_force_commit
-            and not is_final
-        ):
-            deferred_text += sentence_text
-            continue
-        commit_ready.append(sentence_text)
-
-    # 5. 提交完整句子
-    if commit_ready:
-        commit_start_time_sec = sentence_start_time_sec or (chunk_start_time_ms / 1000)
-        for sentence_text in commit_ready:
-            # 【优化】对最终提交的句子重新标点化，确保准确性
-            final_sentence = apply_punctuation(sentence_text, punc_model)
-            
-            start_ms = int(commit_start_time_sec * 1000)
-            send_ipc_message({
-                "request_id": request_id,
-                "session_id": session_id,
-                "type": "sentence_complete",
-                "text": final_sentence,
-                "timestamp": timestamp_ms,
-                "is_final": is_final,
-                "status": "success",
-                "language": "zh",
-                "audio_duration": audio_duration,
-                "start_time": start_ms,
-            })
-            sys.stderr.write(f"[FunASR Worker] 🎯 SENTENCE_COMPLETE: \"{final_sentence[:50]}...\"\n")
-            sys.stderr.flush()
-            state.completed_sentences.append(final_sentence)
-            commit_start_time_sec = chunk_end_time_ms / 1000
-        
-        # 【关键修复】提交后清空所有缓冲区，重新开始
-        # 由于分句逻辑基于标点化文本，无法准确映射回原始文本
-        # 因此提交后清空，避免重复处理
-        state.unstable_raw_text = ""
-        state.raw_text_buffer = ""
-        state.stable_punctuated_text = ""
-        state.current_sentence.text = ""
-        state.last_partial_text = ""
-        state.last_punc_time = 0.0
-        state.current_sentence.start_time = 0.0
-        
-        sys.stderr.write(f"[FunASR Worker] ✅ Buffers cleared after commit\n")
-        sys.stderr.flush()
+    # 超过最大句子时长或结束块时，标点线程处理这次请求时强制提交
+    sentence_duration = (chunk_end_time_ms / 1000) - sentence_start_time_sec
+    commit = None
+    if is_final:
+        commit = "final_chunk"
+    elif sentence_duration >= MAX_SENTENCE_SECONDS:
+        commit = "timeout"
+
+    if punctuation is not None and (commit or len(state.unstable_raw_text) >= MIN_CHARS_FOR_PUNC):
+        punctuation.submit(session_id, PuncRequest(
+            request_id=request_id,
+            timestamp_ms=timestamp_ms,
+            is_final=is_final,
+            audio_duration=audio_duration,
+            chunk_start_ms=chunk_start_time_ms,
+            chunk_end_ms=chunk_end_time_ms,
+            commit=commit,
+        ))
+
+
+# ==============================================================================
+# 后台标点：latest-wins 请求 + 取出时截取原文
+# ==============================================================================
+
+@dataclass
+class PuncRequest:
+    """会话的待处理标点请求：新原文到达时替换旧请求，而不是排队"""
+    request_id: str
+    timestamp_ms: int
+    is_final: bool
+    audio_duration: float
+    chunk_start_ms: float  # 最近一个音频块在会话时间轴上的起止（毫秒）
+    chunk_end_ms: float
+    commit: Optional[str] = None  # 需要提交句子时的 trigger：timeout / final_chunk / silence_timeout
+
+
+@dataclass
+class PuncJob:
+    """标点线程取出请求时的会话快照"""
+    session_id: str
+    state: SessionState
+    epoch: int
+    stable: str
+    raw: str
+    sentence_start: float
+    request: PuncRequest
+
+
+def emit_sentence(job: PuncJob, text: str, start_ms: int, is_final: bool, audio_duration: float,
+                  trigger: Optional[str] = None):
+    message = {
+        "request_id": job.request.request_id,
+        "session_id": job.session_id,
+        "type": "sentence_complete",
+        "text": text,
+        "timestamp": job.request.timestamp_ms,
+        "is_final": is_final,
+        "status": "success",
+        "language": "zh",
+        "audio_duration": audio_duration,
+        "start_time": start_ms,
+    }
+    if trigger:
+        message["trigger"] = trigger
+    send_ipc_message(message)
+    sys.stderr.write(f"[FunASR Worker] 🎯 SENTENCE_COMPLETE ({trigger or 'punctuation'}): \"{text[:50]}...\"\n")
+    sys.stderr.flush()
+    job.state.completed_sentences.append(text)
+
+
+def finish_punctuation(job: PuncJob, text: str, finals: List[str], deferred_text: str, remaining_text: str):
+    """
+    持锁应用标点结果：提交句子，或发送带标点的 partial。
+    job.raw 之后新识别的原文（tail）不在本次标点范围内，原样保留
+    """
+    state = job.state
+    request = job.request
+    tail = state.unstable_raw_text[len(job.raw):]
+    state.last_punc_time = time.time()
+    sentence_start = job.sentence_start or request.chunk_start_ms / 1000
+
+    if request.commit == "silence_timeout":
+        start_ms = int(job.sentence_start * 1000) if job.sentence_start else request.timestamp_ms
+        emit_sentence(job, text.strip(), start_ms, True, 0, trigger="silence_timeout")
+        state.restart_sentence(tail, request.chunk_end_ms / 1000)
         return
-    
-    # 6. 更新当前句子缓冲区
-    state.current_sentence.text = f"{deferred_text}{remaining_text}".strip()
+
+    if finals:
+        commit_start = sentence_start
+        for final_sentence in finals:
+            emit_sentence(job, final_sentence, int(commit_start * 1000), request.is_final, request.audio_duration)
+            commit_start = request.chunk_end_ms / 1000
+        carry = ""
+        if request.commit and remaining_text.strip():
+            # 强制提交时最后一个句末标点之后的部分一并提交
+            emit_sentence(job, remaining_text.strip(), int(commit_start * 1000), request.is_final,
+                          request.audio_duration, trigger=request.commit)
+        else:
+            # 分句基于标点化文本，无法准确映射回原始文本：最后一个句末标点之后的部分去掉分句标点后作为原文留给下一句
+            carry = "".join(c for c in remaining_text if c not in CLAUSE_PUNCTUATION)
+        state.restart_sentence(f"{carry}{tail}", request.chunk_end_ms / 1000)
+        return
+
+    if request.commit and job.raw:
+        # 超时或最终块：整段强制提交
+        start_ms = int(job.sentence_start * 1000) if job.sentence_start else int(request.chunk_start_ms)
+        emit_sentence(job, text.strip(), start_ms, request.is_final, request.audio_duration, trigger=request.commit)
+        state.restart_sentence(tail, request.chunk_end_ms / 1000)
+        return
+
+    # 带标点的 partial
+    state.punctuated_raw = job.raw
+    state.punctuated_text = text[len(job.stable):]
+    state.current_sentence.text = state.display_text()
     state.current_sentence.last_update_time = time.time()
+    incremental = extract_incremental_text(state.last_partial_text, state.current_sentence.text).strip()
+    if incremental:
+        send_ipc_message({
+            "request_id": request.request_id,
+            "session_id": job.session_id,
+            "type": "partial",
+            "text": incremental,
+            "full_text": state.current_sentence.text,
+            "timestamp": request.timestamp_ms,
+            "is_final": request.is_final,
+            "status": "success",
+            "language": "zh",
+        })
+        sys.stderr.write(f"[FunASR Worker] 📝 PARTIAL (punctuated): \"{incremental[:30]}...\"\n")
+        sys.stderr.flush()
+        state.last_partial_text = state.current_sentence.text
 
-    if state.current_sentence.text:
+    if f"{deferred_text}{remaining_text}".strip():
         if deferred_text:
-            state.current_sentence.start_time = sentence_start_time_sec or (chunk_start_time_ms / 1000)
+            state.current_sentence.start_time = sentence_start
         else:
-            state.current_sentence.start_time = chunk_end_time_ms / 1000
+            state.current_sentence.start_time = request.chunk_end_ms / 1000
     else:
         state.current_sentence.start_time = 0.0
 
-    # 7. 强制提交（超时或最终块）
-    if should_force_commit and state.unstable_raw_text:
-        # 【优化】对不稳定区域重新标点化，确保最终准确性
-        final_unstable = apply_incremental_punctuation(
-            state.stable_punctuated_text,
-            state.unstable_raw_text,
-            punc_model,
+
+class PunctuationStage:
+    """
+    后台标点线程：
+    - 每个会话只保留一个待处理请求，新请求到达时合并（记为 superseded），需要提交的 trigger 不会被覆盖
+    - 取出请求时才截取会话最新的不稳定原文；同一会话两次标点间隔不小于 PUNC_DEBOUNCE_INTERVAL，需要提交的请求不等待
+    - 模型调用在锁外进行；会话在标点期间被 reset（epoch 变化）时结果直接丢弃
+    """
+
+    def __init__(self, punc_model: AutoModel, sessions_cache: Dict[str, SessionState]):
+        self.punc_model = punc_model
+        self.sessions_cache = sessions_cache
+        self.cond = threading.Condition(SESSION_LOCK)
+        self.pending: Dict[str, PuncRequest] = {}
+        self.busy = False
+        self.runs = 0
+        self.superseded = 0
+        self.stale = 0
+        threading.Thread(target=self._run, name="punctuation", daemon=True).start()
+
+    def submit(self, session_id: str, request: PuncRequest):
+        """登记标点请求（调用方持有 SESSION_LOCK）"""
+        previous = self.pending.get(session_id)
+        if previous is not None:
+            self.superseded += 1
+            request.commit = request.commit or previous.commit
+            request.is_final = request.is_final or previous.is_final
+        self.pending[session_id] = request
+        self.cond.notify()
+
+    def discard(self, session_id: str):
+        self.pending.pop(session_id, None)
+
+    def drain(self):
+        """等待所有已登记的请求处理完（调用方持有 SESSION_LOCK）"""
+        while self.pending or self.busy:
+            self.cond.wait(0.05)
+
+    def _take(self) -> Optional[PuncJob]:
+        """持锁等待下一个到期的请求并截取快照"""
+        while True:
+            now = time.time()
+            wait = None
+            for session_id, request in list(self.pending.items()):
+                state = self.sessions_cache.get(session_id)
+                if state is None:
+                    del self.pending[session_id]
+                    continue
+                due_at = now if request.commit else state.last_punc_time + PUNC_DEBOUNCE_INTERVAL
+                if due_at <= now:
+                    del self.pending[session_id]
+                    return PuncJob(
+                        session_id=session_id,
+                        state=state,
+                        epoch=state.epoch,
+                        stable=state.stable_punctuated_text,
+                        raw=state.unstable_raw_text,
+                        sentence_start=state.current_sentence.start_time,
+                        request=request,
+                    )
+                wait = due_at - now if wait is None else min(wait, due_at - now)
+            self.cond.wait(wait)
+
+    def _punctuate(self, job: PuncJob) -> Tuple[str, List[str], str, str]:
+        """锁外执行：标点、分句，并对要提交的句子重新标点"""
+        new_punctuated = apply_incremental_punctuation(
+            job.stable,
+            job.raw,
+            self.punc_model,
             context_sentences=PUNC_CONTEXT_SENTENCES
         )
-        final_text = f"{state.stable_punctuated_text}{final_unstable}".strip()
-        
-        start_ms = int(sentence_start_time_sec * 1000) if sentence_start_time_sec else int(chunk_start_time_ms)
-        send_ipc_message({
-            "request_id": request_id,
-            "session_id": session_id,
-            "type": "sentence_complete",
-            "text": final_text,
-            "timestamp": timestamp_ms,
-            "is_final": is_final,
-            "status": "success",
-            "language": "zh",
-            "audio_duration": audio_duration,
-            "start_time": start_ms,
-            "trigger": "timeout" if not is_final else "final_chunk",
-        })
-        sys.stderr.write(f"[FunASR Worker] 🎯 FORCE_COMMIT: \"{final_text[:50]}...\"\n")
-        sys.stderr.flush()
-        state.completed_sentences.append(final_text)
-        state.current_sentence = SentenceBuffer()
-        state.last_partial_text = ""
-        state.raw_text_buffer = ""
-        state.stable_punctuated_text = ""
-        state.unstable_raw_text = ""
-        state.last_punc_time = 0.0
-        return
+        text = f"{job.stable}{new_punctuated}"
+        if job.request.commit == "silence_timeout":
+            return text, [], "", ""
+
+        complete_sentences, remaining_text = split_by_sentence_end(text)
+        force = job.request.commit is not None
+        deferred_text = ""
+        finals = []
+        for sentence in complete_sentences:
+            sentence_text = sentence.strip()
+            if len(sentence_text) < MIN_SENTENCE_CHARS:
+                continue
+            if len(sentence_text) < MIN_AUTO_COMMIT_CHARS and not force:
+                deferred_text += sentence_text
+                continue
+            # 【优化】对最终提交的句子重新标点化，确保准确性
+            finals.append(apply_punctuation(sentence_text, self.punc_model))
+        return text, finals, deferred_text, remaining_text
 
-    # 注意：partial消息已经在前面发送过了（第545-587行区域），这里不再重复发送
+    def _run(self):
+        while True:
+            with self.cond:
+                job = self._take()
+                self.busy = True
+            try:
+                if job.request.commit == "silence_timeout" and len(job.raw) < MIN_SENTENCE_CHARS:
+                    sys.stderr.write("[FunASR Worker] force_commit: text too short or empty\n")
+                    sys.stderr.flush()
+                    result = None
+                else:
+                    result = self._punctuate(job) if job.raw else None
+                with self.cond:
+                    self.runs += 1
+                    if result is None:
+                        pass
+                    elif self.sessions_cache.get(job.session_id) is not job.state or job.state.epoch != job.epoch:
+                        self.stale += 1
+                    else:
+                        finish_punctuation(job, *result)
+            except Exception as exc:
+                sys.stderr.write(f"[FunASR Worker] Punctuation stage error: {exc}\n")
+                sys.stderr.write(traceback.format_exc())
+                sys.stderr.flush()
+            finally:
+                with self.cond:
+                    self.busy = False
+                    self.cond.notify_all()
 
 
 def handle_batch_file(stream_model: AutoModel, punc_model: AutoModel, data: Dict):
@@ -793,8 +1082,8 @@ def handle_batch_file(stream_model: AutoModel, punc_model: AutoModel, data: Dict
         })
 
 
-def handle_force_commit(data: Dict, sessions_cache: Dict[str, SessionState], punc_model: AutoModel):
-    """强制提交当前句子"""
+def handle_force_commit(data: Dict, sessions_cache: Dict[str, SessionState], punctuation: PunctuationStage):
+    """强制提交当前句子：交给标点线程，与同一会话之前的标点请求合并"""
     request_id = data.get("request_id", "default")
     session_id = data.get("session_id", request_id)
 
@@ -807,59 +1096,49 @@ def handle_force_commit(data: Dict, sessions_cache: Dict[str, SessionState], pun
         sys.stderr.flush()
         return
 
-    # 【优化】使用不稳定区域，增量标点化确保准确性
-    if state.unstable_raw_text and len(state.unstable_raw_text) >= MIN_SENTENCE_CHARS:
-        final_unstable = apply_incremental_punctuation(
-            state.stable_punctuated_text,
-            state.unstable_raw_text,
-            punc_model,
-            context_sentences=PUNC_CONTEXT_SENTENCES
-        )
-        final_text = f"{state.stable_punctuated_text}{final_unstable}".strip()
-        
-        timestamp_ms = int(time.time() * 1000)
-        start_ms = int(state.current_sentence.start_time * 1000) if state.current_sentence.start_time else timestamp_ms
-        sys.stderr.write(f"[FunASR Worker] 🎯 FORCE_COMMIT (silence): \"{final_text[:50]}...\"\n")
-        sys.stderr.flush()
-        send_ipc_message({
-            "request_id": request_id,
-            "session_id": session_id,
-            "type": "sentence_complete",
-            "text": final_text,
-            "timestamp": timestamp_ms,
-            "is_final": True,
-            "status": "success",
-            "trigger": "silence_timeout",
-            "language": "zh",
-            "start_time": start_ms,
-            "audio_duration": 0,
-        })
-
-        # 记录已提交句子
-        state.completed_sentences.append(final_text)
-
-        # 重置状态
-        state.current_sentence = SentenceBuffer()
-        state.last_partial_text = ""
-        state.raw_text_buffer = ""
-        state.stable_punctuated_text = ""
-        state.unstable_raw_text = ""
-        state.last_punc_time = 0.0
-    else:
+    if not state.unstable_raw_text or len(state.unstable_raw_text) < MIN_SENTENCE_CHARS:
         sys.stderr.write(f"[FunASR Worker] force_commit: text too short or empty\n")
         sys.stderr.flush()
+        return
+
+    end_ms = state.processed_samples / SAMPLE_RATE * 1000
+    punctuation.submit(session_id, PuncRequest(
+        request_id=request_id,
+        timestamp_ms=int(time.time() * 1000),
+        is_final=True,
+        audio_duration=0,
+        chunk_start_ms=end_ms,
+        chunk_end_ms=end_ms,
+        commit="silence_timeout",
+    ))
 
 
 def main():
     try:
-        sys.stderr.write("[FunASR Worker] Starting FunASR Worker...\n")
+        sys.stderr.write(f"[FunASR Worker] Starting FunASR Worker... runtime profile: {RUNTIME_PROFILE}\n")
         sys.stderr.flush()
+        STARTUP["profile"] = RUNTIME_PROFILE
+        STARTUP["rss_mb"] = {"import": current_rss_mb()}
+        apply_torch_threads(RUNTIME_PROFILE)
 
         # 加载模型
         stream_model, punc_model, ts_model = load_funasr_models()
+        STARTUP["model_load_ms"] = round(sum(STARTUP["model_load"].values()), 1)
+        STARTUP["rss_mb"]["model_load"] = current_rss_mb()
+
+        started = time.perf_counter()
+        STARTUP["warmup"] = warm_up(stream_model, punc_model)
+        STARTUP["warmup_ms"] = elapsed_ms(started)
+        STARTUP["rss_mb"]["warmup"] = current_rss_mb()
+        sys.stderr.write(
+            f"[FunASR Worker] Startup: import={STARTUP['import_ms']}ms load={STARTUP['model_load_ms']}ms "
+            f"warmup={STARTUP['warmup_ms']}ms {STARTUP['warmup']} rss={STARTUP['rss_mb']}MB\n"
+        )
+        sys.stderr.flush()
 
         sessions_cache: Dict[str, SessionState] = {}
-        send_ipc_message({"status": "ready"})
+        punctuation = PunctuationStage(punc_model, sessions_cache)
+        send_ipc_message({"status": "ready", "startup": STARTUP})
 
         sys.stderr.write("[FunASR Worker] Ready and waiting for input...\n")
         sys.stderr.flush()
@@ -867,6 +1146,13 @@ def main():
         while True:
             line = sys.stdin.readline()
             if not line:
+                with SESSION_LOCK:
+                    punctuation.drain()
+                sys.stderr.write(
+                    f"[FunASR Worker] Punctuation stage: runs={punctuation.runs} "
+                    f"superseded={punctuation.superseded} stale={punctuation.stale}\n"
+                )
+                sys.stderr.flush()
                 break
             try:
                 data = json.loads(line)
@@ -881,19 +1167,28 @@ def main():
             if request_type == "reset_session":
                 sys.stderr.write(f"[FunASR Worker] Resetting session: {session_id}\n")
                 sys.stderr.flush()
-                sessions_cache.pop(session_id, None)
+                with SESSION_LOCK:
+                    state = sessions_cache.pop(session_id, None)
+                    if state is not None:
+                        state.epoch += 1  # 正在进行的标点结果作废
+                    punctuation.discard(session_id)
                 continue
 
             if request_type == "force_commit":
-                handle_force_commit(data, sessions_cache, punc_model)
+                with SESSION_LOCK:
+                    handle_force_commit(data, sessions_cache, punctuation)
                 continue
 
             if request_type == "streaming_chunk":
-                handle_streaming_chunk(stream_model, punc_model, data, sessions_cache)
+                with SESSION_LOCK:
+                    handle_streaming_chunk(stream_model, punc_model, data, sessions_cache, punctuation)
                 continue
 
             if request_type == "batch_file" or "audio_path" in data:
-                handle_batch_file(stream_model, punc_model, data)
+                # 标点模型不在两个线程里同时调用：等标点线程空闲后持锁处理
+                with SESSION_LOCK:
+                    punctuation.drain()
+                    handle_batch_file(stream_model, punc_model, data)
                 continue
 
             send_ipc_message({
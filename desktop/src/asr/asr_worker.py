@@ -11,8 +11,31 @@ ASR Worker with Hybrid Sentence Segmentation
 3. 增量文本提取 - 只输出新识别的部分
 4. 智能分句 - 基于标点和语义边界
 
+流式策略（ASR_STREAMING_POLICY）：
+- local_agreement（默认）：LocalAgreement-n。新音频累积到 ASR_MIN_NEW_AUDIO 才解码，
+  只提交连续 n 次假设一致的前缀（按词时间戳），成句后裁掉已提交的音频，
+  单次解码不超过 ASR_STREAM_WINDOW_SECONDS，实时率不随会话时长增长；
+  多个会话同时就绪的窗口在 ASR_BATCH_GATHER_MS 内凑成一批（最多 ASR_BATCH_SIZE），一次批量解码；
+  解码在后台线程进行，每个会话只保留最新一次解码请求（latest-wins），取出时才截取缓冲，
+  解码期间被 reset / 强制提交的会话结果直接丢弃，过载时延迟有上限而不是越积越多
+
+VAD 预门控（ASR_VAD_GATE）：每个音频块先做分帧能量检测，上次解码后没有新语音就不解码；
+语音结束超过 ASR_VAD_HANGOVER_MS 的静音不进入缓冲，只听不说时几乎不占 CPU
+
+启动自动调优（ASR_AUTOTUNE=1）：首次启动时在内置合成片段上测量 compute_type × 线程数的解码耗时，
+按 CPU 型号 + 模型缓存最快组合，之后启动直接套用；ASR_AUTOTUNE=force 重新测量，
+显式设置的 ASR_COMPUTE_TYPE / ASR_CPU_THREADS 不参与调优。结果随 ready 消息返回
+
+启动预热（ASR_WARMUP，默认开启）：发送 ready 之前用 ASR_WARMUP_SECONDS 秒合成音频把逐个解码与批量解码路径各跑一遍，
+首个真实请求不再承担 CTranslate2 内存分配、VAD 模型加载等一次性开销；
+ready 消息的 startup 字段带回导入 / 自动调优 / 模型加载 / 预热各阶段耗时（毫秒）
+
+负载自适应质量阶梯（ASR_QUALITY_LADDER，默认 beam 5 → 2 → 1 贪心）：按各会话实时率之和与排队延迟
+降级 / 回升流式解码的 beam size，当前档位随 partial / sentence_complete 与 get_metrics 返回
+- full：旧实现，每个音频块都重新识别整个缓冲（最长 ASR_BUFFER_SECONDS）
+
 IPC 协议：
-- 输入：streaming_chunk, batch_file, reset_session, force_commit
+- 输入：streaming_chunk, batch_file, reset_session, force_commit, get_metrics
 - 输出：
   - partial: 实时字幕（增量文本）
   - sentence_complete: 完整句子（触发存库）
@@ -20,17 +43,28 @@ IPC 协议：
 
 import base64
 import json
+import math
 import os
+import platform
 import re
 import sys
+import subprocess
+import threading
 import time
 import traceback
 from collections import deque
 from dataclasses import dataclass, field
 from typing import Deque, Dict, List, Optional, Tuple
 
+Word = Tuple[float, float, str]  # (开始秒, 结束秒, 文本)，时间为会话音频时间轴
+
+_import_started = time.perf_counter()
 import numpy as np
 from faster_whisper import WhisperModel
+IMPORT_MS = round((time.perf_counter() - _import_started) * 1000, 1)
+
+from load_controller import LoadController
+from synth_voice import synth_voiced_clip
 
 # ==============================================================================
 # 核心修复：OS 级别的文件描述符重定向
@@ -41,12 +75,16 @@ os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
 sys.stdout = sys.stderr
 
 
+_ipc_lock = threading.Lock()  # 主线程与解码线程都会发消息
+
+
 def send_ipc_message(data):
     """发送 JSON 消息到 Node.js"""
     try:
         json_str = json.dumps(data, ensure_ascii=False)
-        ipc_channel.write(json_str + "\n")
-        ipc_channel.flush()
+        with _ipc_lock:
+            ipc_channel.write(json_str + "\n")
+            ipc_channel.flush()
     except Exception as exc:
         sys.stderr.write(f"[IPC Error] Failed to send: {exc}\n")
         sys.stderr.flush()
@@ -103,6 +141,22 @@ MAX_BUFFER_SECONDS = float(os.environ.get("ASR_BUFFER_SECONDS", "30"))  # 最大
 LOOKBACK_SECONDS = float(os.environ.get("ASR_LOOKBACK_SECONDS", "1.0"))  # 提交句子后保留的音频时长（秒）
 MIN_DECODE_SAMPLES = int(0.4 * 16000) # 最小解码采样数
 
+# LocalAgreement 流式策略
+STREAMING_POLICY = os.environ.get("ASR_STREAMING_POLICY", "local_agreement").strip().lower()
+AGREEMENT_N = max(1, int(os.environ.get("ASR_AGREEMENT_N", "2")))  # 连续 n 次假设一致的前缀才提交
+STREAM_WINDOW_SECONDS = float(os.environ.get("ASR_STREAM_WINDOW_SECONDS", "12"))  # 单次解码的最长音频
+PROMPT_CONTEXT_CHARS = 100  # 拼接到 prompt 末尾的已提交上文长度
+BATCH_SIZE = max(1, int(os.environ.get("ASR_BATCH_SIZE", "4")))  # 跨会话批量解码的最大窗口数，1 = 逐个解码
+BATCH_GATHER_MS = float(os.environ.get("ASR_BATCH_GATHER_MS", "30"))  # 首个窗口就绪后等待其他会话凑批的最长时间
+
+# VAD 预门控（分帧 RMS 能量）
+VAD_GATE = os.environ.get("ASR_VAD_GATE", "1").lower() not in {"0", "false", "no"}
+RMS_THRESHOLD = float(os.environ.get("ASR_RMS_THRESHOLD", "0.009"))  # 与云端 Worker 相同的能量阈值（-1~1 归一化）
+VAD_HANGOVER_MS = float(os.environ.get("ASR_VAD_HANGOVER_MS", "800"))  # 语音结束后仍送入缓冲的静音时长
+VAD_FRAME_MS = 30
+VAD_MIN_VOICED_FRAMES = 2  # 单帧噪声尖峰不算语音
+VAD_HANGOVER_SAMPLES = int(VAD_HANGOVER_MS * SAMPLE_RATE / 1000)
+
 WINDOW_SAMPLES = int(WINDOW_SECONDS * SAMPLE_RATE)
 MIN_NEW_AUDIO_SAMPLES = int(MIN_NEW_AUDIO_SECONDS * SAMPLE_RATE)
 MAX_BUFFER_SAMPLES = int(MAX_BUFFER_SECONDS * SAMPLE_RATE)
@@ -155,6 +209,33 @@ TEMPERATURE = float(os.environ.get("ASR_TEMPERATURE", "0.0"))
 VAD_FILTER = os.environ.get("ASR_VAD_FILTER", "1").lower() not in {"0", "false", "no"}
 NO_SPEECH_THRESHOLD = float(os.environ.get("ASR_NO_SPEECH_THRESHOLD", "0.6"))
 
+# 启动自动调优
+AUTOTUNE = os.environ.get("ASR_AUTOTUNE", "0").strip().lower()  # 0 关闭 / 1 有缓存用缓存、否则测量 / force 重新测量
+AUTOTUNE_CACHE = os.environ.get("ASR_AUTOTUNE_CACHE") or os.path.join(CACHE_DIR, "whisper-autotune.json")
+AUTOTUNE_BUDGET_SEC = float(os.environ.get("ASR_AUTOTUNE_BUDGET_SEC", "180"))  # 超时即用已测出的最快组合
+AUTOTUNE_COMPUTE_TYPES = ("int8", "int8_float32", "float32")
+AUTOTUNE_CLIP_SECONDS = 8.0
+AUTOTUNE_TOKENS = 48  # 每次测量固定生成的 token 数（屏蔽 EOT），不同精度输出长度不同也能公平比较
+AUTOTUNE_RUNS = 3
+
+# 启动预热
+WARMUP = os.environ.get("ASR_WARMUP", "1").lower() not in {"0", "false", "no"}
+WARMUP_SECONDS = float(os.environ.get("ASR_WARMUP_SECONDS", "3"))
+
+
+def parse_quality_ladder() -> List[int]:
+    """流式解码的 beam size 阶梯，从高到低；只有一档即关闭自适应"""
+    raw = os.environ.get("ASR_QUALITY_LADDER", "").strip()
+    if raw:
+        ladder = [max(1, int(x)) for x in raw.split(",") if x.strip()]
+    else:
+        ladder = [BEAM_SIZE] + [beam for beam in (2, 1) if beam < BEAM_SIZE]
+    return ladder or [BEAM_SIZE]
+
+
+# 负载自适应质量阶梯
+QUALITY_LADDER = parse_quality_ladder()
+
 
 @dataclass
 class SentenceBuffer:
@@ -193,6 +274,21 @@ class SessionState:
     # 完整句子队列
     completed_sentences: List[str] = field(default_factory=list)
 
+    # LocalAgreement 策略状态
+    buffer_offset: float = 0.0  # 音频缓冲起点在会话时间轴上的位置（秒）
+    committed_end: float = 0.0  # 最后一个已提交词的结束时间
+    sentence_words: List[Word] = field(default_factory=list)  # 已提交、尚未成句的词
+    recent_words: Deque[str] = field(default_factory=lambda: deque(maxlen=8))  # 最近提交的词，用于去除重叠
+    hypotheses: Deque[List[Word]] = field(default_factory=deque)  # 最近几次假设中未提交的部分
+    last_partial_text: str = ""
+
+    # VAD 预门控
+    silence_samples: int = 0  # 当前连续静音长度
+    speech_since_decode: bool = False  # 上次解码后是否出现过新语音
+
+    # 缓冲版本：强制提交 / 重置时递增，解码期间版本变化的结果作废
+    epoch: int = 0
+
     def append_samples(self, samples: np.ndarray):
         """添加音频采样点"""
         self.chunks.append(samples)
@@ -202,6 +298,23 @@ class SessionState:
         while self.total_samples > MAX_BUFFER_SAMPLES and self.chunks:
             removed = self.chunks.popleft()
             self.total_samples -= len(removed)
+            self.buffer_offset += len(removed) / SAMPLE_RATE
+            self.last_recognized_samples = max(0, self.last_recognized_samples - len(removed))
+
+    def buffer_seconds(self) -> float:
+        return self.total_samples / SAMPLE_RATE
+
+    def trim_audio(self, until: float):
+        """裁掉会话时间轴 until 之前的音频（已提交部分不再参与解码）"""
+        drop = min(self.total_samples, int((until - self.buffer_offset) * SAMPLE_RATE))
+        if drop <= 0:
+            return
+        audio = self.build_audio()
+        tail = audio[drop:]
+        self.chunks = deque([tail]) if len(tail) else deque()
+        self.total_samples = len(tail)
+        self.buffer_offset += drop / SAMPLE_RATE
+        self.last_recognized_samples = max(0, self.last_recognized_samples - drop)
 
     def get_new_audio_duration(self) -> float:
         """获取自上次识别以来新增的音频时长（秒）"""
@@ -274,6 +387,119 @@ class SessionState:
         self.current_sentence = SentenceBuffer()
         self.sentence_start_time = time.time()
         self.completed_sentences.clear()
+        self.buffer_offset = 0.0
+        self.committed_end = 0.0
+        self.sentence_words = []
+        self.recent_words.clear()
+        self.hypotheses.clear()
+        self.last_partial_text = ""
+        self.silence_samples = 0
+        self.speech_since_decode = False
+        self.epoch += 1
+
+
+class DecodeStats:
+    """流式解码耗时统计（get_metrics 返回），用于观察实时率是否随会话时长增长"""
+
+    def __init__(self):
+        self.decodes = 0
+        self.skipped_decodes = 0
+        self.dropped_audio_sec = 0.0
+        self.batches = 0
+        self.batched_windows = 0
+        self.superseded_requests = 0
+        self.stale_results = 0
+        self.decode_sec = 0.0
+        self.audio_sec = 0.0
+        self._decode_ms: Deque[float] = deque(maxlen=500)
+        self._window_sec: Deque[float] = deque(maxlen=500)
+        self._latency_ms: Deque[float] = deque(maxlen=500)
+
+    def record_audio(self, seconds: float):
+        self.audio_sec += seconds
+
+    def record_decode(self, decode_sec: float, window_sec: float):
+        self.decodes += 1
+        self.decode_sec += decode_sec
+        self._decode_ms.append(decode_sec * 1000)
+        self._window_sec.append(window_sec)
+
+    def record_batch(self, size: int):
+        self.batches += 1
+        self.batched_windows += size
+
+    def record_latency(self, latency_sec: float):
+        """音频就绪（可以解码）到结果处理完的耗时，包含排队等待"""
+        self._latency_ms.append(latency_sec * 1000)
+
+    def snapshot(self) -> dict:
+        decode_ms = sorted(self._decode_ms)
+        windows = sorted(self._window_sec)
+        latency_ms = sorted(self._latency_ms)
+        pick = lambda values, q: round(values[min(len(values) - 1, int(q * len(values)))], 2) if values else None
+        return {
+            "policy": STREAMING_POLICY,
+            "decodes": self.decodes,
+            "skipped_decodes": self.skipped_decodes,
+            "dropped_audio_sec": round(self.dropped_audio_sec, 2),
+            "batches": self.batches,
+            "avg_batch_size": round(self.batched_windows / self.batches, 2) if self.batches else None,
+            "superseded_requests": self.superseded_requests,
+            "stale_results": self.stale_results,
+            "audio_sec": round(self.audio_sec, 2),
+            "decode_sec": round(self.decode_sec, 2),
+            "rtf": round(self.decode_sec / self.audio_sec, 3) if self.audio_sec else None,
+            "decode_ms_p50": pick(decode_ms, 0.5),
+            "decode_ms_p99": pick(decode_ms, 0.99),
+            "window_sec_p50": pick(windows, 0.5),
+            "window_sec_max": windows[-1] if windows else None,
+            "latency_ms_p50": pick(latency_ms, 0.5),
+            "latency_ms_p99": pick(latency_ms, 0.99),
+        }
+
+
+DECODE_STATS = DecodeStats()
+
+# 会话状态、DECODE_STATS 与 LOAD 只在持有该锁时读写：主线程处理每条请求时持有，
+# 解码线程只在截取快照和应用结果时持有（模型推理期间释放）
+SESSION_LOCK = threading.Lock()
+
+
+LOAD = LoadController(QUALITY_LADDER, [f"beam{beam}" if beam > 1 else "greedy" for beam in QUALITY_LADDER])
+
+
+def is_speech(samples: np.ndarray) -> bool:
+    """分帧 RMS 能量检测：至少 VAD_MIN_VOICED_FRAMES 帧超过阈值才算有语音"""
+    frame = int(VAD_FRAME_MS * SAMPLE_RATE / 1000)
+    count = len(samples) // frame
+    if count == 0:
+        return len(samples) > 0 and float(np.sqrt(np.mean(samples ** 2))) >= RMS_THRESHOLD
+    rms = np.sqrt(np.mean(samples[: count * frame].reshape(count, frame) ** 2, axis=1))
+    return int(np.count_nonzero(rms >= RMS_THRESHOLD)) >= min(VAD_MIN_VOICED_FRAMES, count)
+
+
+def gate_samples(state: "SessionState", samples: np.ndarray) -> bool:
+    """
+    VAD 预门控：返回音频块是否进入缓冲。语音与其后 ASR_VAD_HANGOVER_MS 内的静音照常缓存；
+    更长的静音直接丢弃（会话时间轴只计入保留的音频），没有待确认的假设时顺带清空缓冲，
+    之后的解码窗口总是从语音开始
+    """
+    if not VAD_GATE:
+        state.speech_since_decode = True
+        return True
+    if is_speech(samples):
+        state.silence_samples = 0
+        state.speech_since_decode = True
+        return True
+    state.silence_samples += len(samples)
+    tentative = bool(state.hypotheses and state.hypotheses[-1])
+    if state.silence_samples <= VAD_HANGOVER_SAMPLES or tentative:
+        # 尾字还没得到确认时继续缓存静音，下一次解码即可确认（窗口上限兜底）
+        return True
+    DECODE_STATS.dropped_audio_sec += len(samples) / SAMPLE_RATE
+    if STREAMING_POLICY != "full" and state.total_samples:
+        state.trim_audio(state.buffer_offset + state.buffer_seconds())
+    return False
 
 
 def decode_audio_chunk(audio_b64: str) -> np.ndarray:
@@ -363,13 +589,17 @@ def split_by_sentence_end(text: str) -> Tuple[List[str], str]:
     return sentences, remaining
 
 
-def load_model() -> WhisperModel:
+def load_model(
+    compute_type: str = COMPUTE_TYPE,
+    cpu_threads: int = CPU_THREADS,
+    num_workers: int = NUM_WORKERS,
+) -> WhisperModel:
     model_name = resolve_model_name()
     sys.stderr.write(f"[ASR Worker] Loading model: {model_name} (Faster-Whisper)\n")
     sys.stderr.write(
         "[ASR Worker] Device="
-        f"{DEVICE}, compute_type={COMPUTE_TYPE}, cache={CACHE_DIR}, "
-        f"cpu_threads={CPU_THREADS}, workers={NUM_WORKERS}\n"
+        f"{DEVICE}, compute_type={compute_type}, cache={CACHE_DIR}, "
+        f"cpu_threads={cpu_threads}, workers={num_workers}\n"
     )
     sys.stderr.flush()
 
@@ -380,9 +610,9 @@ def load_model() -> WhisperModel:
         model = WhisperModel(
             model_name,
             device=DEVICE,
-            compute_type=COMPUTE_TYPE,
-            cpu_threads=CPU_THREADS,
-            num_workers=NUM_WORKERS,
+            compute_type=compute_type,
+            cpu_threads=cpu_threads,
+            num_workers=num_workers,
         )
         sys.stderr.write("[ASR Worker] Local model loaded successfully\n")
         sys.stderr.flush()
@@ -395,9 +625,9 @@ def load_model() -> WhisperModel:
         model = WhisperModel(
             model_name,
             device=DEVICE,
-            compute_type=COMPUTE_TYPE,
-            cpu_threads=CPU_THREADS,
-            num_workers=NUM_WORKERS,
+            compute_type=compute_type,
+            cpu_threads=cpu_threads,
+            num_workers=num_workers,
         )
         sys.stderr.write("[ASR Worker] Local model directory loaded successfully\n")
         sys.stderr.flush()
@@ -410,10 +640,10 @@ def load_model() -> WhisperModel:
         model = WhisperModel(
             model_name,
             device=DEVICE,
-            compute_type=COMPUTE_TYPE,
+            compute_type=compute_type,
             download_root=CACHE_DIR,
-            cpu_threads=CPU_THREADS,
-            num_workers=NUM_WORKERS,
+            cpu_threads=cpu_threads,
+            num_workers=num_workers,
         )
         sys.stderr.write("[ASR Worker] Model loaded from HuggingFace\n")
         sys.stderr.flush()
@@ -434,10 +664,10 @@ def load_model() -> WhisperModel:
             model = WhisperModel(
                 modelscope_repo,
                 device=DEVICE,
-                compute_type=COMPUTE_TYPE,
+                compute_type=compute_type,
                 download_root=CACHE_DIR,
-                cpu_threads=CPU_THREADS,
-                num_workers=NUM_WORKERS,
+                cpu_threads=cpu_threads,
+                num_workers=num_workers,
             )
             sys.stderr.write("[ASR Worker] Model loaded from ModelScope\n")
             sys.stderr.flush()
@@ -450,10 +680,203 @@ def load_model() -> WhisperModel:
             raise hf_exc
 
 
+# ==============================================================================
+# 启动自动调优：compute_type × 线程数
+# ==============================================================================
+
+def detect_cpu_model() -> str:
+    """CPU 型号（调优缓存的键），取不到时退回 platform 信息"""
+    try:
+        if sys.platform.startswith("linux"):
+            with open("/proc/cpuinfo", encoding="utf-8", errors="ignore") as f:
+                for line in f:
+                    if line.lower().startswith(("model name", "hardware", "cpu model")):
+                        return line.split(":", 1)[1].strip()
+        elif sys.platform == "darwin":
+            return subprocess.check_output(
+                ["sysctl", "-n", "machdep.cpu.brand_string"], text=True, timeout=5
+            ).strip()
+    except Exception:
+        pass
+    return platform.processor() or platform.machine() or "unknown"
+
+
+def default_num_workers(cpu_threads: int) -> int:
+    """与启动时相同的规则：显式设置的 ASR_NUM_WORKERS 优先，否则线程数的一半（1~4）"""
+    if "ASR_NUM_WORKERS" in os.environ:
+        return NUM_WORKERS
+    return max(1, min(4, cpu_threads // 2 or 1))
+
+
+def autotune_candidates() -> List[Tuple[str, int]]:
+    """待测组合：显式设置的环境变量固定不动；默认配置排在最前，保证超时时至少有基线"""
+    if "ASR_COMPUTE_TYPE" in os.environ:
+        compute_types = [COMPUTE_TYPE]
+    else:
+        compute_types = list(AUTOTUNE_COMPUTE_TYPES)
+        try:
+            import ctranslate2
+
+            supported = ctranslate2.get_supported_compute_types("cpu")
+            compute_types = [ct for ct in compute_types if ct in supported] or [COMPUTE_TYPE]
+        except Exception:
+            pass
+    if "ASR_CPU_THREADS" in os.environ:
+        threads = [CPU_THREADS]
+    else:
+        cores = os.cpu_count() or 2
+        threads = sorted({n for n in (2, 4, 8, cores // 2, cores) if 1 <= n <= min(cores, 16)} | {CPU_THREADS})
+    candidates = [(ct, n) for ct in compute_types for n in threads]
+    if (COMPUTE_TYPE, CPU_THREADS) in candidates:
+        candidates.remove((COMPUTE_TYPE, CPU_THREADS))
+        candidates.insert(0, (COMPUTE_TYPE, CPU_THREADS))
+    return candidates
+
+
+def build_calibration_clip(seconds: float = AUTOTUNE_CLIP_SECONDS) -> np.ndarray:
+    """内置校准 / 预热片段：带基频起伏和停顿的合成浊音（-1~1 float32）"""
+    return synth_voiced_clip(seconds, SAMPLE_RATE)
+
+
+def benchmark_model(model: WhisperModel, clip: np.ndarray) -> float:
+    """特征提取 + 编码 + 固定长度 beam search 的耗时中位数（秒），先跑一次预热"""
+    from faster_whisper.audio import pad_or_trim
+    from faster_whisper.tokenizer import Tokenizer
+
+    tokenizer = Tokenizer(
+        model.hf_tokenizer, model.model.is_multilingual, task="transcribe", language=LANGUAGE or "en"
+    )
+    prompt = model.get_prompt(tokenizer, [], without_timestamps=True)
+
+    def run_once() -> float:
+        started = time.perf_counter()
+        features = pad_or_trim(model.feature_extractor(clip)[..., :-1])
+        encoder_output = model.encode(features[np.newaxis])
+        model.model.generate(
+            encoder_output,
+            [prompt],
+            beam_size=BEAM_SIZE,
+            max_length=len(prompt) + AUTOTUNE_TOKENS,
+            suppress_tokens=[tokenizer.eot],
+        )
+        return time.perf_counter() - started
+
+    run_once()
+    timings = sorted(run_once() for _ in range(AUTOTUNE_RUNS))
+    return timings[len(timings) // 2]
+
+
+def load_autotune_cache() -> Dict:
+    try:
+        with open(AUTOTUNE_CACHE, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_autotune_cache(cache: Dict):
+    try:
+        tmp_path = AUTOTUNE_CACHE + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(cache, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, AUTOTUNE_CACHE)
+    except OSError as exc:
+        sys.stderr.write(f"[Worker] Failed to save autotune cache: {exc}\n")
+        sys.stderr.flush()
+
+
+def calibrate(candidates: List[Tuple[str, int]]) -> List[Dict]:
+    """逐个组合加载模型并测量，超过 ASR_AUTOTUNE_BUDGET_SEC 后停止"""
+    import gc
+
+    clip = build_calibration_clip()
+    results = []
+    started = time.time()
+    for compute_type, cpu_threads in candidates:
+        if results and time.time() - started > AUTOTUNE_BUDGET_SEC:
+            sys.stderr.write(f"[Worker] Autotune budget {AUTOTUNE_BUDGET_SEC:.0f}s exhausted, skipping remaining candidates\n")
+            sys.stderr.flush()
+            break
+        model = None
+        try:
+            model = load_model(compute_type=compute_type, cpu_threads=cpu_threads, num_workers=1)
+            seconds = benchmark_model(model, clip)
+        except Exception as exc:
+            sys.stderr.write(f"[Worker] Autotune candidate {compute_type}/{cpu_threads} failed: {exc}\n")
+            sys.stderr.flush()
+            continue
+        finally:
+            del model
+            gc.collect()
+        results.append({"compute_type": compute_type, "cpu_threads": cpu_threads, "decode_ms": round(seconds * 1000, 1)})
+        sys.stderr.write(f"[Worker] Autotune {compute_type} threads={cpu_threads}: {seconds * 1000:.0f}ms\n")
+        sys.stderr.flush()
+    return results
+
+
+def resolve_runtime_config() -> Dict:
+    """
+    决定加载模型用的 compute_type / cpu_threads / num_workers：
+    关闭调优或非 CPU 设备时沿用环境变量与默认规则；否则按 CPU 型号 + 模型查缓存，没有（或 force）则现场测量
+    """
+    config = {
+        "compute_type": COMPUTE_TYPE,
+        "cpu_threads": CPU_THREADS,
+        "num_workers": NUM_WORKERS,
+        "source": "default",
+    }
+    if AUTOTUNE in {"0", "false", "no", "off", ""} or DEVICE != "cpu":
+        return config
+    candidates = autotune_candidates()
+    if len(candidates) < 2:
+        return {**config, "source": "env"}
+
+    cpu_model = detect_cpu_model()
+    key = f"{cpu_model}|{os.cpu_count()}|{resolve_model_name()}|beam{BEAM_SIZE}"
+    cache = load_autotune_cache()
+    entry = cache.get(key)
+    if entry and AUTOTUNE != "force" and (entry.get("compute_type"), entry.get("cpu_threads")) in candidates:
+        source = "cache"
+    else:
+        sys.stderr.write(f"[Worker] Calibrating {len(candidates)} compute_type/thread combinations on {cpu_model}...\n")
+        sys.stderr.flush()
+        results = calibrate(candidates)
+        if not results:
+            return config
+        best = min(results, key=lambda r: r["decode_ms"])
+        baseline = results[0] if (results[0]["compute_type"], results[0]["cpu_threads"]) == (COMPUTE_TYPE, CPU_THREADS) else None
+        entry = {
+            **best,
+            "baseline_ms": baseline["decode_ms"] if baseline else None,
+            "candidates": results,
+            "tuned_at": int(time.time()),
+        }
+        cache[key] = entry
+        save_autotune_cache(cache)
+        source = "calibrated"
+
+    cpu_threads = int(entry["cpu_threads"])
+    sys.stderr.write(
+        f"[Worker] Autotune ({source}): compute_type={entry['compute_type']} cpu_threads={cpu_threads} "
+        f"decode={entry.get('decode_ms')}ms baseline={entry.get('baseline_ms')}ms\n"
+    )
+    sys.stderr.flush()
+    return {
+        "compute_type": entry["compute_type"],
+        "cpu_threads": cpu_threads,
+        "num_workers": default_num_workers(cpu_threads),
+        "source": source,
+        "cpu": cpu_model,
+        "decode_ms": entry.get("decode_ms"),
+        "baseline_ms": entry.get("baseline_ms"),
+    }
+
+
 def transcribe_audio_with_segments(
     model: WhisperModel, 
     audio_source, 
-    initial_prompt: str = None
+    initial_prompt: str = None,
+    beam_size: int = BEAM_SIZE,
 ) -> Tuple[str, List[dict], dict]:
     """
     转录音频并返回 segment 级别的信息
@@ -461,8 +884,8 @@ def transcribe_audio_with_segments(
     """
     segments, info = model.transcribe(
         audio_source,
-        beam_size=BEAM_SIZE,
-        best_of=BEAM_SIZE,
+        beam_size=beam_size,
+        best_of=beam_size,
         language=LANGUAGE,
         temperature=TEMPERATURE,
         vad_filter=VAD_FILTER,
@@ -490,13 +913,550 @@ def transcribe_audio_with_segments(
     return full_text, collected_segments, info
 
 
+def transcribe_words(
+    model: WhisperModel,
+    audio: np.ndarray,
+    initial_prompt: str = None,
+    beam_size: int = BEAM_SIZE,
+) -> Tuple[List[Word], object]:
+    """
+    转录音频并返回词级时间戳（相对 audio 起点），供 LocalAgreement 对齐假设
+    返回: (词列表, info)
+    """
+    segments, info = model.transcribe(
+        audio,
+        beam_size=beam_size,
+        best_of=beam_size,
+        language=LANGUAGE,
+        temperature=TEMPERATURE,
+        vad_filter=VAD_FILTER,
+        condition_on_previous_text=False,
+        initial_prompt=initial_prompt,
+        no_speech_threshold=NO_SPEECH_THRESHOLD,
+        word_timestamps=True,
+    )
+    words: List[Word] = []
+    for segment in segments:
+        for word in segment.words or []:
+            if word.word and word.word.strip():
+                words.append((float(word.start), float(word.end), word.word))
+    return words, info
+
+
+# ==============================================================================
+# LocalAgreement 流式策略
+# ==============================================================================
+
+def _norm_word(text: str) -> str:
+    return text.strip().lower()
+
+
+def _words_text(words: List[Word]) -> str:
+    # faster-whisper 的英文词自带前导空格，中文词没有，直接拼接即可
+    return "".join(w[2] for w in words).strip()
+
+
+def align_hypothesis(state: SessionState, words: List[Word], offset: float) -> List[Word]:
+    """
+    把新假设平移到会话时间轴（offset 为解码窗口起点）：丢弃已提交时间之前的词，
+    并去掉与最近提交的词重复的开头（缓冲里仍保留着部分已提交的音频）
+    """
+    words = [(start + offset, end + offset, text) for start, end, text in words]
+    words = [w for w in words if w[0] > state.committed_end - 0.1]
+    if words and state.recent_words and abs(words[0][0] - state.committed_end) < 1.0:
+        tail = [_norm_word(t) for t in state.recent_words]
+        for n in range(min(len(tail), len(words), 5), 0, -1):
+            if tail[-n:] == [_norm_word(w[2]) for w in words[:n]]:
+                words = words[n:]
+                break
+    return words
+
+
+def agree_prefix(state: SessionState, words: List[Word]) -> List[Word]:
+    """LocalAgreement-n：返回与之前 n-1 次假设一致的最长前缀（待提交），其余部分留作下一次比较"""
+    history = list(state.hypotheses)[-(AGREEMENT_N - 1):] if AGREEMENT_N > 1 else []
+    agreed = 0
+    if len(history) >= AGREEMENT_N - 1:
+        while agreed < len(words) and all(
+            agreed < len(h) and _norm_word(h[agreed][2]) == _norm_word(words[agreed][2]) for h in history
+        ):
+            agreed += 1
+    state.hypotheses = deque([h[agreed:] for h in history] + [words[agreed:]], maxlen=max(1, AGREEMENT_N - 1))
+    return words[:agreed]
+
+
+def _emit_sentence(state: SessionState, ctx: Dict, trigger: Optional[str] = None) -> Optional[float]:
+    """把已提交的词作为完整句子发出；返回句子结束时间（用于裁剪音频），句子过短时不发"""
+    text = _words_text(state.sentence_words)
+    if len(text) < MIN_SENTENCE_CHARS:
+        return None
+    start, end = state.sentence_words[0][0], state.sentence_words[-1][1]
+    sys.stderr.write(f"[Worker] 🎯 SENTENCE_COMPLETE: \"{text[:50]}...\" (session={ctx['session_id']})\n")
+    sys.stderr.flush()
+    message = {
+        "request_id": ctx["request_id"],
+        "session_id": ctx["session_id"],
+        "type": "sentence_complete",
+        "text": text,
+        "timestamp": int(time.time() * 1000),
+        "is_final": ctx["is_final"],
+        "status": "success",
+        "language": ctx["language"],
+        "audio_duration": round(end - start, 2),
+        "quality_step": LOAD.step,
+    }
+    if trigger:
+        message["trigger"] = trigger
+    send_ipc_message(message)
+    state.completed_sentences.append(text)
+    state.sentence_words = []
+    state.last_partial_text = ""
+    return end
+
+
+def commit_words(state: SessionState, words: List[Word], ctx: Dict) -> Optional[float]:
+    """提交稳定的词：遇到句末标点或句子超过 MAX_SENTENCE_SECONDS 即成句；返回最后一句的结束时间"""
+    sentence_end = None
+    for word in words:
+        state.sentence_words.append(word)
+        state.recent_words.append(word[2])
+        state.committed_end = max(state.committed_end, word[1])
+        too_long = word[1] - state.sentence_words[0][0] >= MAX_SENTENCE_SECONDS
+        if word[2].strip()[-1:] in SENTENCE_END_PUNCTUATION or too_long:
+            end = _emit_sentence(state, ctx, "max_duration" if too_long else None)
+            sentence_end = end if end is not None else sentence_end
+    return sentence_end
+
+
+def flush_hypothesis(state: SessionState, ctx: Dict, trigger: Optional[str], until: Optional[float] = None):
+    """
+    不再等待一致：提交最近一次假设的剩余部分并结束当前句子，裁掉已解码的音频。
+    until 为解码窗口的结束时间（解码期间新到的音频还没解码，不能裁掉），默认裁到缓冲末尾
+    """
+    if until is None:
+        until = state.buffer_offset + state.buffer_seconds()
+    if state.hypotheses:
+        commit_words(state, state.hypotheses[-1], ctx)
+    state.hypotheses.clear()
+    _emit_sentence(state, ctx, trigger)
+    state.committed_end = max(state.committed_end, until)
+    state.trim_audio(until)
+
+
+def build_agreement_prompt(state: SessionState) -> str:
+    """固定对话模板 + 缓冲之外的已提交上文（缓冲内的词会被重新解码，不放进 prompt）"""
+    context = "".join(state.completed_sentences[-2:])
+    context += _words_text([w for w in state.sentence_words if w[1] <= state.buffer_offset])
+    prompt = generate_chinese_dialogue_prompt(state.completed_sentences)
+    if context:
+        prompt += "\n" + context[-PROMPT_CONTEXT_CHARS:]
+    return prompt
+
+
+@dataclass
+class DecodeJob:
+    """一次待解码的窗口：解码线程取出请求时的会话快照（批量解码时多个会话的窗口合并成一批）"""
+    request_id: str
+    session_id: str
+    state: SessionState
+    audio: np.ndarray
+    offset: float  # 窗口起点在会话时间轴上的位置（解码期间缓冲可能被裁剪，不能读 state.buffer_offset）
+    prompt: str
+    is_final: bool
+    epoch: int  # 快照时的缓冲版本
+    ready_at: float  # 该会话最早一次未处理的解码请求时间（被后续请求合并时不更新）
+
+    @property
+    def window_end(self) -> float:
+        return self.offset + len(self.audio) / SAMPLE_RATE
+
+
+@dataclass
+class DecodeRequest:
+    """会话的待处理解码请求：新音频到达时合并进已有请求，而不是排队"""
+    request_id: str
+    is_final: bool
+    ready_at: float
+
+
+def prepare_agreement_decode(data: Dict, sessions_cache: Dict[str, SessionState]) -> Optional[DecodeRequest]:
+    """缓存音频块；新音频足够（或 is_final）时返回解码请求，否则返回 None（调用方持有 SESSION_LOCK）"""
+    request_id = data.get("request_id", "default")
+    session_id = data.get("session_id", request_id)
+    audio_data_b64 = data.get("audio_data")
+
+    if not audio_data_b64:
+        send_ipc_message({"request_id": request_id, "error": "No audio_data provided"})
+        return None
+
+    state = sessions_cache.setdefault(session_id, SessionState())
+    samples = decode_audio_chunk(audio_data_b64)
+    DECODE_STATS.record_audio(len(samples) / SAMPLE_RATE)
+    LOAD.record_lag(data)
+    LOAD.record(session_id, audio_sec=len(samples) / SAMPLE_RATE)
+    if gate_samples(state, samples):
+        state.append_samples(samples)
+
+    is_final = bool(data.get("is_final", False))
+    if not is_final and (not state.should_recognize() or state.total_samples < MIN_DECODE_SAMPLES):
+        return None
+    # 没有新语音、也没有等待确认的假设（语音结束后的拖尾静音会再解码一两次，让尾字得到确认）
+    if not is_final and not state.speech_since_decode and not (state.hypotheses and state.hypotheses[-1]):
+        DECODE_STATS.skipped_decodes += 1
+        state.mark_recognized("")
+        return None
+    return DecodeRequest(request_id=request_id, is_final=is_final, ready_at=time.time())
+
+
+def snapshot_decode_job(session_id: str, request: DecodeRequest, state: SessionState) -> Optional[DecodeJob]:
+    """解码线程取出请求时截取会话当前的全部缓冲（调用方持有 SESSION_LOCK）"""
+    audio_array = state.build_audio()
+    if audio_array is None or len(audio_array) == 0:
+        if request.is_final:
+            ctx = {"request_id": request.request_id, "session_id": session_id, "is_final": True, "language": None}
+            flush_hypothesis(state, ctx, None)
+        return None
+    state.mark_recognized("")
+    state.speech_since_decode = False
+    return DecodeJob(
+        request_id=request.request_id,
+        session_id=session_id,
+        state=state,
+        audio=audio_array,
+        offset=state.buffer_offset,
+        prompt=build_agreement_prompt(state),
+        is_final=request.is_final,
+        epoch=state.epoch,
+        ready_at=request.ready_at,
+    )
+
+
+def report_decode_error(job: DecodeJob, exc: Exception):
+    sys.stderr.write(f"[Worker] Streaming decode failed: {exc}\n")
+    sys.stderr.write(traceback.format_exc())
+    sys.stderr.flush()
+    send_ipc_message({
+        "request_id": job.request_id,
+        "session_id": job.session_id,
+        "error": str(exc),
+    })
+
+
+def finish_agreement_decode(job: DecodeJob, words: List[Word], language: Optional[str]):
+    """
+    LocalAgreement 解码后处理：
+    1. 与前几次假设比较，提交一致的前缀
+    2. 句末标点成句后把音频裁到句尾；缓冲超过 ASR_STREAM_WINDOW_SECONDS 时裁到最后提交的词，
+       窗口内始终没有稳定前缀则直接提交当前假设，保证单次解码的音频长度有上限
+    """
+    state = job.state
+    ctx = {
+        "request_id": job.request_id,
+        "session_id": job.session_id,
+        "is_final": job.is_final,
+        "language": language,
+    }
+    committed = agree_prefix(state, align_hypothesis(state, words, job.offset))
+    sentence_end = commit_words(state, committed, ctx)
+
+    if job.is_final:
+        flush_hypothesis(state, ctx, None, until=job.window_end)
+        return
+    if sentence_end is not None:
+        state.trim_audio(sentence_end)
+    if state.buffer_seconds() > STREAM_WINDOW_SECONDS:
+        if state.committed_end > state.buffer_offset:
+            state.trim_audio(state.committed_end)
+        if state.buffer_seconds() > STREAM_WINDOW_SECONDS:
+            sys.stderr.write(f"[Worker] No stable prefix within {STREAM_WINDOW_SECONDS:.0f}s window, flushing (session={job.session_id})\n")
+            sys.stderr.flush()
+            flush_hypothesis(state, ctx, "max_window", until=job.window_end)
+
+    # 实时字幕：已提交部分 + 尚未稳定的假设
+    tentative = _words_text(state.hypotheses[-1]) if state.hypotheses else ""
+    current_text = (_words_text(state.sentence_words) + tentative).strip()
+    if current_text and current_text != state.last_partial_text:
+        send_ipc_message({
+            "request_id": job.request_id,
+            "session_id": job.session_id,
+            "type": "partial",
+            "text": extract_incremental_text(state.last_partial_text, current_text).strip() or current_text,
+            "full_text": current_text,
+            "stable_text": _words_text(state.sentence_words),
+            "timestamp": int(time.time() * 1000),
+            "is_final": False,
+            "status": "success",
+            "language": language,
+            "quality_step": LOAD.step,
+        })
+        state.last_partial_text = current_text
+
+
+class BatchDecoder:
+    """
+    窗口解码：单个窗口走 WhisperModel.transcribe（带 VAD 过滤）；
+    多个会话的窗口用 CTranslate2 的批量接口一次完成编码、生成与词对齐（WhisperModel.transcribe 每次只能处理一路音频）。
+    窗口不超过 30 秒，每个窗口正好是一个 Whisper 输入段；批量路径出错时退回逐个解码。
+    不持有会话锁，只读 DecodeJob 快照
+    """
+
+    def __init__(self, model: WhisperModel):
+        self.model = model
+        self.enabled = BATCH_SIZE > 1 and STREAMING_POLICY != "full" and LANGUAGE is not None
+        self._tokenizer = None
+        if BATCH_SIZE > 1 and LANGUAGE is None:
+            sys.stderr.write("[Worker] Batched decoding needs ASR_LANGUAGE, decoding sessions one by one\n")
+            sys.stderr.flush()
+
+    def decode(self, jobs: List[DecodeJob]) -> Tuple[List[Tuple[Optional[List[Word]], Optional[str], float]], bool]:
+        """
+        返回 ([(词列表, 语言, 解码耗时)], 是否走了批量路径)；词列表为 None 表示该窗口解码失败。
+        批量路径的耗时按窗口均摊；统计由调用方在持锁时记录
+        """
+        if len(jobs) > 1 and self.enabled:
+            started = time.time()
+            try:
+                batch_words = self._decode(jobs)
+            except Exception as exc:
+                sys.stderr.write(f"[Worker] Batched decode failed ({exc}), falling back to serial decoding\n")
+                sys.stderr.write(traceback.format_exc())
+                sys.stderr.flush()
+                self.enabled = False
+            else:
+                share = (time.time() - started) / len(jobs)
+                return [(words, LANGUAGE, share) for words in batch_words], True
+        return [self._decode_one(job) for job in jobs], False
+
+    def _decode_one(self, job: DecodeJob) -> Tuple[Optional[List[Word]], Optional[str], float]:
+        started = time.time()
+        try:
+            words, info = transcribe_words(self.model, job.audio, initial_prompt=job.prompt, beam_size=LOAD.level)
+        except Exception as exc:
+            report_decode_error(job, exc)
+            return None, None, time.time() - started
+        return words, info.language if hasattr(info, "language") else None, time.time() - started
+
+    def _decode(self, jobs: List[DecodeJob]) -> List[List[Word]]:
+        from faster_whisper.audio import pad_or_trim
+        from faster_whisper.tokenizer import Tokenizer
+        from faster_whisper.transcribe import get_suppressed_tokens, merge_punctuations
+
+        model = self.model
+        if self._tokenizer is None:
+            self._tokenizer = Tokenizer(
+                model.hf_tokenizer, model.model.is_multilingual, task="transcribe", language=LANGUAGE
+            )
+        tokenizer = self._tokenizer
+
+        features = np.stack([pad_or_trim(model.feature_extractor(job.audio)[..., :-1]) for job in jobs])
+        encoder_output = model.encode(features)
+        prompts = [
+            model.get_prompt(tokenizer, tokenizer.encode(job.prompt) if job.prompt else [], without_timestamps=True)
+            for job in jobs
+        ]
+        results = model.model.generate(
+            encoder_output,
+            prompts,
+            beam_size=LOAD.level,
+            max_length=model.max_length,
+            suppress_blank=True,
+            suppress_tokens=list(get_suppressed_tokens(tokenizer, [-1])),
+            return_scores=True,
+            return_no_speech_prob=True,
+        )
+
+        text_tokens = []
+        for result in results:
+            sequence = result.sequences_ids[0]
+            avg_logprob = result.scores[0] * len(sequence) / (len(sequence) + 1)
+            # 与 transcribe 相同的静音判定：no_speech 概率高且整体置信度低时丢弃
+            silent = result.no_speech_prob > NO_SPEECH_THRESHOLD and avg_logprob < -1.0
+            text_tokens.append([] if silent else [t for t in sequence if t < tokenizer.eot])
+
+        num_frames = [int(math.ceil(len(job.audio) / SAMPLE_RATE) * model.frames_per_second) for job in jobs]
+        # 空结果用 eot 占位，保持批内下标与 encoder_output 对齐
+        alignments = model.find_alignment(
+            tokenizer, [tokens or [tokenizer.eot] for tokens in text_tokens], encoder_output, num_frames
+        )
+        batch_words: List[List[Word]] = []
+        for tokens, alignment in zip(text_tokens, alignments):
+            if not tokens:
+                batch_words.append([])
+                continue
+            merge_punctuations(alignment, "\"'“¿([{-", "\"'.。,，!！?？:：”)]}、")
+            batch_words.append([
+                (float(word["start"]), float(word["end"]), word["word"])
+                for word in alignment
+                if word["word"].strip()
+            ])
+        return batch_words
+
+    def warm_up(self, audio: np.ndarray):
+        """启动预热：两路相同窗口走一遍批量路径；失败时与运行中一样退回逐个解码"""
+        if not self.enabled:
+            return
+        jobs = [
+            DecodeJob(
+                request_id="warmup",
+                session_id=f"warmup-{i}",
+                state=SessionState(),
+                audio=audio,
+                offset=0.0,
+                prompt="",
+                is_final=False,
+                epoch=0,
+                ready_at=time.time(),
+            )
+            for i in range(2)
+        ]
+        try:
+            self._decode(jobs)
+        except Exception as exc:
+            sys.stderr.write(f"[Worker] Batched warm-up failed ({exc}), decoding sessions one by one\n")
+            sys.stderr.flush()
+            self.enabled = False
+
+
+class DecodeScheduler:
+    """
+    后台解码线程 + 每会话 latest-wins：
+    - 主线程只负责缓存音频并登记解码请求；会话已有待处理请求时合并进去（记为 superseded），不排队
+    - 解码线程取出请求时才截取缓冲，解码的永远是会话的最新状态；多个会话同时待处理时一起批量解码
+    - 结果在 SESSION_LOCK 下应用；解码期间会话被 reset / 强制提交（epoch 变化）的结果丢弃
+    过载时每个会话最多一个解码在进行、一个请求在等待；缓冲满时主线程等待（背压）而不丢未解码的音频
+    """
+
+    def __init__(self, decoder: BatchDecoder, sessions_cache: Dict[str, SessionState]):
+        self.decoder = decoder
+        self.sessions_cache = sessions_cache
+        self.cond = threading.Condition(SESSION_LOCK)
+        self.pending: Dict[str, DecodeRequest] = {}  # 按登记顺序出队，各会话轮流
+        self.busy = False
+        self.thread = threading.Thread(target=self._run, name="decode", daemon=True)
+        self.thread.start()
+
+    def submit(self, session_id: str, request: DecodeRequest):
+        """登记解码请求（调用方持有 SESSION_LOCK）"""
+        current = self.pending.get(session_id)
+        if current is not None:
+            current.request_id = request.request_id
+            current.is_final = current.is_final or request.is_final
+            DECODE_STATS.superseded_requests += 1
+        else:
+            self.pending[session_id] = request
+        self.cond.notify_all()
+
+    def wait_for_room(self, session_id: str, incoming_samples: int):
+        """
+        背压（调用方持有 SESSION_LOCK）：缓冲已满且该会话还有解码在排队/进行时，等这次解码裁掉已提交的音频，
+        而不是让 append_samples 挤掉还没解码的音频；延迟因此以 ASR_BUFFER_SECONDS 为上限
+        """
+        state = self.sessions_cache.get(session_id)
+        while (
+            state is not None
+            and state.total_samples + incoming_samples > MAX_BUFFER_SAMPLES
+            and (session_id in self.pending or self.busy)
+            and self.sessions_cache.get(session_id) is state
+        ):
+            self.cond.wait()
+
+    def discard(self, session_id: str):
+        """会话被重置：丢掉待处理请求（调用方持有 SESSION_LOCK）"""
+        self.pending.pop(session_id, None)
+
+    def drain(self):
+        """等待所有已登记的请求处理完（调用方持有 SESSION_LOCK），用于需要最新识别结果的控制请求"""
+        while self.pending or self.busy:
+            self.cond.wait()
+
+    def _take(self) -> List[DecodeJob]:
+        """凑批并截取快照（持有 SESSION_LOCK）：还有其他会话可能就绪时最多等 ASR_BATCH_GATHER_MS"""
+        while not self.pending:
+            self.cond.wait()
+        limit = BATCH_SIZE if self.decoder.enabled else 1
+        if limit > 1 and len(self.pending) < min(limit, len(self.sessions_cache)):
+            self.cond.wait_for(
+                lambda: len(self.pending) >= min(limit, len(self.sessions_cache)),
+                timeout=BATCH_GATHER_MS / 1000.0,
+            )
+        jobs = []
+        for session_id in list(self.pending)[:limit]:
+            request = self.pending.pop(session_id)
+            state = self.sessions_cache.get(session_id)
+            job = snapshot_decode_job(session_id, request, state) if state is not None else None
+            if job is not None:
+                jobs.append(job)
+        return jobs
+
+    def _idle(self):
+        """解码线程空闲（持有 SESSION_LOCK）：清 busy 并唤醒等待 drain / 背压的线程"""
+        self.busy = False
+        self.cond.notify_all()
+
+    def _run(self):
+        while True:
+            with self.cond:
+                jobs = self._take()
+                if not jobs:
+                    # 取出的请求全被丢弃（会话已重置）：pending 已变，仍要唤醒 drain / wait_for_room
+                    self._idle()
+                    continue
+                self.busy = True
+            try:
+                results, batched = self.decoder.decode(jobs)
+            except Exception as exc:
+                results, batched = [(None, None, 0.0)] * len(jobs), False
+                for job in jobs:
+                    report_decode_error(job, exc)
+            with self.cond:
+                try:
+                    if batched:
+                        DECODE_STATS.record_decode(
+                            sum(result[2] for result in results), max(len(job.audio) for job in jobs) / SAMPLE_RATE
+                        )
+                        DECODE_STATS.record_batch(len(jobs))
+                    for job, (words, language, decode_sec) in zip(jobs, results):
+                        if not batched:
+                            DECODE_STATS.record_decode(decode_sec, len(job.audio) / SAMPLE_RATE)
+                        LOAD.record(job.session_id, decode_sec=decode_sec)
+                        LOAD.record_lag_ms((time.time() - job.ready_at) * 1000)
+                        if words is None:
+                            continue
+                        if self.sessions_cache.get(job.session_id) is not job.state or job.state.epoch != job.epoch:
+                            DECODE_STATS.stale_results += 1
+                            continue
+                        try:
+                            finish_agreement_decode(job, words, language)
+                        except Exception as exc:
+                            report_decode_error(job, exc)
+                        DECODE_STATS.record_latency(time.time() - job.ready_at)
+                finally:
+                    self._idle()
+
+
 def handle_streaming_chunk(
     model: WhisperModel,
     data: Dict,
     sessions_cache: Dict[str, SessionState],
+    scheduler: Optional[DecodeScheduler] = None,
+):
+    if STREAMING_POLICY == "full" or scheduler is None:
+        handle_streaming_chunk_full(model, data, sessions_cache)
+        return
+    session_id = data.get("session_id", data.get("request_id", "default"))
+    scheduler.wait_for_room(session_id, len(data.get("audio_data") or "") * 3 // 8)  # base64 -> int16 采样数
+    request = prepare_agreement_decode(data, sessions_cache)
+    if request is not None:
+        scheduler.submit(session_id, request)
+
+
+def handle_streaming_chunk_full(
+    model: WhisperModel,
+    data: Dict,
+    sessions_cache: Dict[str, SessionState],
 ):
     """
-    处理流式音频块，实现混合分句策略
+    处理流式音频块，实现混合分句策略（ASR_STREAMING_POLICY=full：每块重新识别整个缓冲）
     """
     request_id = data.get("request_id", "default")
     session_id = data.get("session_id", request_id)
@@ -508,7 +1468,11 @@ def handle_streaming_chunk(
 
     state = sessions_cache.setdefault(session_id, SessionState())
     samples = decode_audio_chunk(audio_data_b64)
-    state.append_samples(samples)
+    DECODE_STATS.record_audio(len(samples) / SAMPLE_RATE)
+    LOAD.record_lag(data)
+    LOAD.record(session_id, audio_sec=len(samples) / SAMPLE_RATE)
+    if gate_samples(state, samples):
+        state.append_samples(samples)
 
     is_final = bool(data.get("is_final", False))
     
@@ -518,6 +1482,12 @@ def handle_streaming_chunk(
         sys.stderr.flush()
         return
 
+    # VAD 预门控：上次解码后没有新语音，重新识别只会得到相同结果
+    if not state.speech_since_decode and not is_final:
+        DECODE_STATS.skipped_decodes += 1
+        return
+    state.speech_since_decode = False
+
     audio_array = state.build_audio()
     if audio_array is None or len(audio_array) == 0:
         sys.stderr.write(f"[Worker] No audio to process for session={session_id}\n")
@@ -537,7 +1507,12 @@ def handle_streaming_chunk(
     sys.stderr.write(f"[Worker] Prompt length: {len(initial_prompt)} chars\n")
 
     try:
-        full_text, segments, info = transcribe_audio_with_segments(model, audio_array, initial_prompt=initial_prompt)
+        started = time.time()
+        full_text, segments, info = transcribe_audio_with_segments(
+            model, audio_array, initial_prompt=initial_prompt, beam_size=LOAD.level
+        )
+        DECODE_STATS.record_decode(time.time() - started, audio_duration)
+        LOAD.record(session_id, decode_sec=time.time() - started)
         sys.stderr.write(f"[Worker] Transcription result: text=\"{full_text[:50] if full_text else '(empty)'}...\", segments={len(segments)}\n")
         sys.stderr.flush()
     except Exception as exc:
@@ -629,6 +1604,7 @@ def handle_streaming_chunk(
                 "status": "success",
                 "language": info.language if hasattr(info, "language") else None,
                 "audio_duration": audio_duration,
+                "quality_step": LOAD.step,
             })
             
             # 【优化】记录已提交句子，用于下次 prompt
@@ -664,6 +1640,7 @@ def handle_streaming_chunk(
                 "is_final": is_final,
                 "status": "success",
                 "language": info.language if hasattr(info, "language") else None,
+                "quality_step": LOAD.step,
             })
     
     # 更新状态
@@ -717,6 +1694,13 @@ def handle_force_commit(data: Dict, sessions_cache: Dict[str, SessionState]):
         sys.stderr.write(f"[Worker] No session state found for session={session_id}\n")
         sys.stderr.flush()
         return
+
+    if STREAMING_POLICY != "full":
+        # 静音触发：不再等待假设一致，提交已识别的全部文本
+        ctx = {"request_id": request_id, "session_id": session_id, "is_final": True, "language": None}
+        flush_hypothesis(state, ctx, "silence_timeout")
+        state.epoch += 1
+        return
     
     current_text = state.current_sentence.text.strip()
     sys.stderr.write(f"[Worker] force_commit current_sentence=\"{current_text[:50] if current_text else '(empty)'}...\" len={len(current_text)}\n")
@@ -735,6 +1719,7 @@ def handle_force_commit(data: Dict, sessions_cache: Dict[str, SessionState]):
             "is_final": True,
             "status": "success",
             "trigger": "silence_timeout",
+            "quality_step": LOAD.step,
         })
         
         # 【优化】记录已提交句子
@@ -750,15 +1735,67 @@ def handle_force_commit(data: Dict, sessions_cache: Dict[str, SessionState]):
         sys.stderr.flush()
 
 
+def elapsed_ms(started: float) -> float:
+    return round((time.perf_counter() - started) * 1000, 1)
+
+
+def warm_up(model: WhisperModel, decoder: Optional[BatchDecoder]) -> Dict[str, float]:
+    """
+    ready 之前在合成音频上跑一遍实际会用到的解码路径，返回各路径耗时（毫秒）。
+    预热失败只记日志：首个请求变慢，但不影响启动
+    """
+    if not WARMUP:
+        return {}
+    clip = build_calibration_clip(WARMUP_SECONDS)
+    timings: Dict[str, float] = {}
+    started = time.perf_counter()
+    try:
+        transcribe_words(model, clip, beam_size=LOAD.level)
+        timings["transcribe_ms"] = elapsed_ms(started)
+    except Exception as exc:
+        sys.stderr.write(f"[Worker] Warm-up decode failed: {exc}\n")
+        sys.stderr.flush()
+    if decoder is not None and decoder.enabled:
+        started = time.perf_counter()
+        decoder.warm_up(clip)
+        timings["batch_ms"] = elapsed_ms(started)
+    return timings
+
+
 def main():
     try:
-        model = load_model()
+        started = time.perf_counter()
+        runtime = resolve_runtime_config()
+        startup = {"import_ms": IMPORT_MS, "autotune_ms": elapsed_ms(started)}
+
+        started = time.perf_counter()
+        model = load_model(
+            compute_type=runtime["compute_type"],
+            cpu_threads=runtime["cpu_threads"],
+            num_workers=runtime["num_workers"],
+        )
+        startup["model_load_ms"] = elapsed_ms(started)
+
+        decoder = BatchDecoder(model) if STREAMING_POLICY != "full" else None
+        started = time.perf_counter()
+        startup["warmup"] = warm_up(model, decoder)
+        startup["warmup_ms"] = elapsed_ms(started)
+        sys.stderr.write(
+            f"[Worker] Startup: import={startup['import_ms']}ms autotune={startup['autotune_ms']}ms "
+            f"load={startup['model_load_ms']}ms warmup={startup['warmup_ms']}ms\n"
+        )
+        sys.stderr.flush()
+
         sessions_cache: Dict[str, SessionState] = {}
-        send_ipc_message({"status": "ready"})
+        scheduler = DecodeScheduler(decoder, sessions_cache) if decoder is not None else None
+        send_ipc_message({"status": "ready", "autotune": runtime, "startup": startup})
 
         while True:
             line = sys.stdin.readline()
             if not line:
+                if scheduler is not None:
+                    with SESSION_LOCK:
+                        scheduler.drain()
                 break
             try:
                 data = json.loads(line)
@@ -778,25 +1815,46 @@ def main():
                 sys.stderr.write(f"[Worker] Received request: type={request_type}, session={session_id}\n")
                 sys.stderr.flush()
 
-            if request_type == "reset_session":
-                sys.stderr.write(f"[Worker] Resetting session: {session_id}\n")
-                sys.stderr.flush()
-                sessions_cache.pop(session_id, None)
-                continue
-
-            if request_type == "force_commit":
-                # JS 侧静音检测触发的强制提交
-                handle_force_commit(data, sessions_cache)
-                continue
-
-            if request_type == "streaming_chunk":
-                handle_streaming_chunk(model, data, sessions_cache)
-                continue
-
             if request_type == "batch_file" or "audio_path" in data:
-                handle_batch_file(model, data)
+                if scheduler is not None:
+                    with SESSION_LOCK:
+                        scheduler.drain()
+                handle_batch_file(model, data)  # 不持锁：文件识别期间流式会话照常解码
                 continue
 
+            with SESSION_LOCK:
+                if request_type == "streaming_chunk":
+                    handle_streaming_chunk(model, data, sessions_cache, scheduler)
+                    continue
+
+                # 控制请求依赖之前音频的识别结果，先等已登记的解码处理完
+                if scheduler is not None and request_type != "reset_session":
+                    scheduler.drain()
+
+                if request_type == "reset_session":
+                    sys.stderr.write(f"[Worker] Resetting session: {session_id}\n")
+                    sys.stderr.flush()
+                    state = sessions_cache.pop(session_id, None)
+                    if state is not None:
+                        state.epoch += 1  # 正在进行的解码结果作废
+                    if scheduler is not None:
+                        scheduler.discard(session_id)
+                    continue
+
+                if request_type == "force_commit":
+                    # JS 侧静音检测触发的强制提交
+                    handle_force_commit(data, sessions_cache)
+                    continue
+
+                if request_type == "get_metrics":
+                    send_ipc_message({
+                        "request_id": request_id,
+                        "type": "metrics",
+                        "status": "success",
+                        "metrics": {**DECODE_STATS.snapshot(), **LOAD.snapshot(), "sessions": len(sessions_cache)},
+                    })
+                    continue
+
             send_ipc_message({
                 "request_id": request_id,
                 "error": f"Unknown request type: {request_type}",
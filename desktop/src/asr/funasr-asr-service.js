@@ -200,7 +200,7 @@ class FunASRService {
         });
       }
     } else if (msg.status === 'ready') {
-      logger.log('[FunASR] Worker is ready');
+      logger.log(`[FunASR] Worker is ready${msg.startup ? ` (startup: ${JSON.stringify(msg.startup)})` : ''}`);
       if (this.workerReadyResolver) {
         this.workerReadyResolver();
         this.workerReadyResolver = null;
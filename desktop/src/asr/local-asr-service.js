@@ -152,7 +152,7 @@ class LocalWhisperService {
         });
       }
     } else if (msg.status === 'ready') {
-      logger.log('[LocalWhisper] Worker is ready');
+      logger.log(`[LocalWhisper] Worker is ready${msg.startup ? ` (startup: ${JSON.stringify(msg.startup)})` : ''}`);
     } else if (msg.error) {
       logger.error(`[LocalWhisper] Worker error: ${msg.error}`);
     }